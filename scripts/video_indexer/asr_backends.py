@@ -0,0 +1,52 @@
+# ASR backend registry.
+#
+# Every backend is a factory returning an engine with the same contract:
+#     engine.transcribe(path) -> transcript.Transcript (word / start / end columns)
+#     engine.transcribe_audio(audio, offset=0.0) -> same, for a 16 kHz float32 array
+#
+# Engines are imported lazily, so only the selected backend's package
+# (whisper / stable_whisper / faster_whisper) has to be installed.
+
+ASR_BACKENDS = {}
+
+# openai-whisper, the engine the indexers have always used
+DEFAULT_BACKEND = "whisper"
+
+
+def register_backend(name):
+    """Decorator: register `factory(model_size)` under `name`"""
+    def decorator(factory):
+        ASR_BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+@register_backend("whisper")
+def _openai_whisper(model_size):
+    from fast_asr_engine import ASREngine
+    return ASREngine(model_size=model_size)
+
+
+@register_backend("stable-whisper")
+def _stable_whisper(model_size):
+    from asr_engine import ASREngine
+    return ASREngine(model_size=model_size)
+
+
+@register_backend("faster-whisper")
+def _faster_whisper(model_size):
+    from faster_asr_engine import ASREngine
+    return ASREngine(model_size=model_size)
+
+
+def create_engine(backend=DEFAULT_BACKEND, model_size="medium"):
+    """Instantiate the registered backend `backend`"""
+    if backend not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend}' (available: {', '.join(sorted(ASR_BACKENDS))})")
+    return ASR_BACKENDS[backend](model_size)
+
+
+def add_backend_argument(parser):
+    """Shared --asr-backend flag for the indexer CLIs"""
+    parser.add_argument('--asr-backend', choices=sorted(ASR_BACKENDS), default=DEFAULT_BACKEND,
+                        help=f'ASR engine to transcribe with (default: {DEFAULT_BACKEND})')
@@ -1,7 +1,6 @@
 import stable_whisper
-import tempfile
-import os
-import subprocess
+from audio_stream import stream_audio
+from transcript import Transcript
 
 class ASREngine:
     def __init__(self, model_size="base"):
@@ -10,52 +9,30 @@ class ASREngine:
 
     def transcribe(self, video_path):
         """
-        Transcribes video by extracting audio temporarily.
-        Returns list of word segments: [{'word': str, 'start': float, 'end': float}, ...]
+        Transcribes video by streaming its audio straight into memory.
+        Returns a Transcript (word, start, end columns).
         
         CRITICAL: Original video file is NEVER modified.
         """
         print(f"Transcribing {video_path}...")
         
-        # Extract audio to temporary file
-        temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-        temp_audio_path = temp_audio.name
-        temp_audio.close()
-        
-        try:
-            # Use ffmpeg to extract audio stream (READ-ONLY operation on video)
-            subprocess.run([
-                'ffmpeg', '-i', video_path,
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',  # WAV format
-                '-ar', '16000',  # 16kHz sample rate
-                '-ac', '1',  # Mono
-                temp_audio_path,
-                '-y'  # Overwrite temp file
-            ], check=True, capture_output=True)
-            
-            # Perform ASR on temporary audio
-            # Optimizations for speed:
-            # - language="en": skip auto-detection (saves ~5-10 seconds)
-            # - verbose=False: reduce console output overhead
-            result = self.model.transcribe(
-                temp_audio_path,
-                language="en",  
-                verbose=False
-            )
-            
-            words = []
-            for segment in result.segments:
-                for word_obj in segment.words:
-                    words.append({
-                        'word': word_obj.word.strip(),
-                        'start': word_obj.start,
-                        'end': word_obj.end
-                    })
-            
-            return words
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_audio_path):
-                os.remove(temp_audio_path)
+        # ffmpeg decodes to a pipe (READ-ONLY operation on video), no temp WAV
+        return self.transcribe_audio(stream_audio(video_path))
+
+    def transcribe_audio(self, audio, offset=0.0):
+        """
+        Transcribes an in-memory 16kHz mono float32 array (e.g. one VAD region).
+        `offset` (seconds) shifts all timestamps back onto the original timeline.
+        """
+        # Optimizations for speed:
+        # - language="en": skip auto-detection (saves ~5-10 seconds)
+        # - verbose=False: reduce console output overhead
+        result = self.model.transcribe(audio, language="en", verbose=False)
+        return self._result_to_words(result, offset)
+
+    def _result_to_words(self, result, offset=0.0):
+        words = Transcript()
+        for segment in result.segments:
+            for word_obj in segment.words:
+                words.append(word_obj.word.strip(), word_obj.start + offset, word_obj.end + offset)
+        return words
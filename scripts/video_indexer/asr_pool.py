@@ -0,0 +1,190 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from indexer_shared import load_cached_transcript, save_cached_transcript
+from asr_backends import DEFAULT_BACKEND
+
+# Per-process engine, loaded once by _init_worker and reused for every job
+_worker_engine = None
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def default_threads_per_worker(workers):
+    """Split the machine's cores evenly so N workers don't oversubscribe the CPU"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(backend, model_size, threads):
+    global _worker_engine
+    # Set in the worker only (the parent's environment is left alone). Only the
+    # torch cap below is guaranteed: the env vars reach libraries loaded after
+    # this point (torch, the ASR backend), but numpy was already imported with
+    # this module under spawn, so its BLAS pool keeps its default size
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+    from asr_backends import create_engine
+    _worker_engine = create_engine(backend, model_size=model_size)
+
+
+def _transcribe_job(media_path, extract=None, stream=False):
+    """
+    Runs inside a worker process.
+    `extract` optionally turns the media file into an audio file first
+    (e.g. bilibili_indexer.extract_audio); that audio file is removed afterwards.
+    With `stream`, audio is decoded straight into memory instead (no WAV at all).
+    """
+    if stream:
+        from audio_stream import stream_audio
+        return _worker_engine.transcribe_audio(stream_audio(media_path))
+
+    audio_path = extract(media_path) if extract else media_path
+    if not audio_path:
+        raise Exception("Audio extraction failed")
+    try:
+        return _worker_engine.transcribe(audio_path)
+    finally:
+        if audio_path != media_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+
+def _transcribe_region_job(wav_path, start, end):
+    """Runs inside a worker process: decode one VAD speech region"""
+    from vad import load_region
+    return _worker_engine.transcribe_audio(load_region(wav_path, start, end), offset=start)
+
+
+def _transcribe_audio_job(audio, offset):
+    """Runs inside a worker process: decode one in-memory audio slice"""
+    return _worker_engine.transcribe_audio(audio, offset=offset)
+
+
+class ASRWorkerPool:
+    """
+    Process pool of Whisper workers.
+    Each worker loads the model once at start-up and then pulls media paths
+    from the pool's job queue, so N files are transcribed N-at-a-time.
+    """
+    def __init__(self, workers, model_size="medium", threads_per_worker=None, backend=DEFAULT_BACKEND):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(workers)
+
+        print(f"Starting ASR worker pool ({workers} workers × {self.threads_per_worker} threads, {backend} {model_size})...")
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend, model_size, self.threads_per_worker)
+        )
+
+    def submit(self, media_path, extract=None, stream=False):
+        """Queue one file, returns a Future resolving to the word list"""
+        return self.executor.submit(_transcribe_job, media_path, extract, stream)
+
+    def submit_region(self, wav_path, start, end):
+        """Queue one speech region of a 16 kHz mono WAV (see vad.py)"""
+        return self.executor.submit(_transcribe_region_job, wav_path, start, end)
+
+    def submit_audio(self, audio, offset=0.0):
+        """Queue an in-memory float32 slice (e.g. a VAD region of streamed audio)"""
+        return self.executor.submit(_transcribe_audio_job, audio, offset)
+
+    def transcribe_all(self, media_paths, extract=None, stream=False):
+        """
+        Transcribe many files in parallel.
+        Yields (media_path, words or Exception) in input order.
+        """
+        futures = [(path, self.submit(path, extract, stream)) for path in media_paths]
+        for path, future in futures:
+            try:
+                yield path, future.result()
+            except Exception as e:
+                yield path, e
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _transcribe_jobs_with_vad(pool, media_paths, extract=None, stream=False):
+    """
+    VAD variant of ASRWorkerPool.transcribe_all: files are handled one by one
+    but the speech regions of each file are decoded by all workers at once.
+    """
+    from vad import transcribe_with_vad
+
+    for media_path in media_paths:
+        if stream:
+            from audio_stream import stream_audio
+            try:
+                yield media_path, transcribe_with_vad(stream_audio(media_path), pool=pool)
+            except Exception as e:
+                yield media_path, e
+            continue
+
+        audio_path = extract(media_path) if extract else media_path
+        try:
+            if not audio_path:
+                raise Exception("Audio extraction failed")
+            yield media_path, transcribe_with_vad(audio_path, pool=pool)
+        except Exception as e:
+            yield media_path, e
+        finally:
+            if audio_path and audio_path != media_path and os.path.exists(audio_path):
+                os.remove(audio_path)
+
+
+def transcribe_uncached(jobs, workers, model_size="medium", extract=None, vad=False, backend=DEFAULT_BACKEND,
+                        stream=False):
+    """
+    Fill the transcription cache for every job that has none yet.
+
+    Args:
+        jobs: List of (media_path, video_info) tuples
+        workers: Number of worker processes
+        model_size: Whisper model to load in each worker
+        backend: Registered ASR backend name (see asr_backends.py)
+        extract: Optional picklable callable media_path -> audio_path
+        vad: Split each file into speech regions and decode those in parallel
+        stream: Decode audio in memory (audio_stream.py) instead of using `extract`
+
+    Caches are written through save_cached_transcript in job order, so
+    the result does not depend on which worker finished first.
+
+    Returns:
+        Number of files that failed to transcribe
+    """
+    pending = [job for job in jobs if not load_cached_transcript(job[0], backend, model_size)]
+    if not pending:
+        return 0
+
+    print(f"\n🗣️  Transcribing {len(pending)} file(s) with {workers} ASR workers...")
+    failures = 0
+    with ASRWorkerPool(workers, model_size=model_size, backend=backend) as pool:
+        media_paths = [job[0] for job in pending]
+        if vad:
+            results = _transcribe_jobs_with_vad(pool, media_paths, extract=extract, stream=stream)
+        else:
+            results = pool.transcribe_all(media_paths, extract=extract, stream=stream)
+        for (media_path, info), (_, words) in zip(pending, results):
+            name = os.path.basename(media_path)
+            if isinstance(words, Exception):
+                print(f"  ❌ {name}: {words}")
+                failures += 1
+                continue
+            save_cached_transcript(media_path, words, info, backend, model_size)
+            print(f"  💾 {name}: {len(words)} words")
+    return failures
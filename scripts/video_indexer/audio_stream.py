@@ -0,0 +1,85 @@
+import tempfile
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Bytes pulled from the ffmpeg pipe per read (~16 s of 16 kHz s16le audio)
+READ_CHUNK_BYTES = 1 << 19
+
+
+def probe_duration(path):
+    """Media duration in seconds (via ffprobe), or None"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, check=True
+        )
+        return float(result.stdout.strip())
+    except Exception:
+        return None
+
+
+def stream_audio(media_path, sample_rate=SAMPLE_RATE):
+    """
+    Decode a media file to 16 kHz mono float32 without touching disk.
+
+    ffmpeg writes raw s16le PCM to a pipe; the samples are converted chunk
+    by chunk into a float32 buffer preallocated from the probed duration,
+    so no WAV file and no intermediate full-length int16 copy is created.
+
+    Returns:
+        np.ndarray (float32), ready for ASREngine.transcribe_audio()
+    """
+    duration = probe_duration(media_path)
+    capacity = int((duration or 600) * sample_rate) + sample_rate
+    audio = np.empty(capacity, dtype=np.float32)
+
+    cmd = [
+        'ffmpeg', '-nostdin',
+        '-i', media_path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        '-loglevel', 'error',
+        '-'
+    ]
+    # stderr goes to a file: a pipe nobody reads until stdout ends can fill
+    # up with ffmpeg's messages and block it, and this loop with it
+    errors = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+
+    chunk = bytearray(READ_CHUNK_BYTES)
+    view = memoryview(chunk)
+    pending = b''  # Odd trailing byte between reads
+    filled = 0
+    try:
+        while True:
+            n = proc.stdout.readinto(view)
+            if not n:
+                break
+            data = pending + bytes(view[:n]) if pending else view[:n]
+            usable = len(data) // 2 * 2
+            pending = bytes(data[usable:])
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+
+            if filled + len(samples) > capacity:
+                # Duration probe was off; grow geometrically
+                capacity = max(capacity * 2, filled + len(samples))
+                audio = np.resize(audio, capacity)
+            np.multiply(samples, 1.0 / 32768.0, out=audio[filled:filled + len(samples)], casting='unsafe')
+            filled += len(samples)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        errors.seek(0)
+        stderr = errors.read().decode('utf-8', errors='replace')
+        errors.close()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {media_path}: {stderr.strip()}")
+
+    return audio[:filled]
@@ -0,0 +1,109 @@
+import copy
+import time
+import random
+import argparse
+
+from indexer_shared import smart_filter_taught_words
+
+# Context pool: plain English, mixed Chinese, and intro-pattern contexts
+CONTEXTS = [
+    "we will talk about the model and its training data today",
+    "so the basic idea is that you scale the compute budget",
+    "这个 model 其实 就是 一个 很大 的 network",
+    "然后 我们 来看 这个 benchmark 的 结果",
+    "这个单词 abandon 意思是 放弃 我们 再读一遍",
+    "看这个词 vivid 翻译成 生动的 怎么来记 呢",
+]
+
+
+def smart_filter_reference(word_index, time_window=120, min_score=10, whitelist=None):
+    """The previous pure-Python implementation, kept for comparison"""
+    filtered_index = {}
+    whitelist = whitelist or set()
+    INTRO_PATTERNS = [
+        "这个单词", "单词叫做", "单词是", "意思是", "叫", "翻译成", "什么意思",
+        "怎么来记", "看这个词", "读一下", "再读一遍", "什么鬼", "怎么讲"
+    ]
+    for word, occurrences in word_index.items():
+        timestamps = sorted([occ['t'] for occ in occurrences])
+        dense_timestamps = set()
+        max_density = 0
+        for i in range(len(timestamps)):
+            window_end = timestamps[i] + time_window
+            current_window_timestamps = []
+            for t in timestamps[i:]:
+                if t <= window_end:
+                    current_window_timestamps.append(t)
+                else:
+                    break
+            count = len(current_window_timestamps)
+            max_density = max(max_density, count)
+            if count >= 3:
+                for t in current_window_timestamps:
+                    dense_timestamps.add(t)
+
+        total_word_score = len(occurrences)
+        if max_density >= 3:
+            total_word_score += max_density * 2
+        for occ in occurrences:
+            occ_score = 1
+            context = occ['c']
+            if any(p in context for p in INTRO_PATTERNS):
+                occ_score += 5
+                total_word_score += 5
+            if any('\u4e00' <= char <= '\u9fff' for char in context):
+                occ_score += 2
+                total_word_score += 2
+            if occ['t'] in dense_timestamps:
+                occ_score += 2
+            occ['s'] = occ_score
+        if total_word_score >= min_score or word in whitelist:
+            filtered_index[word] = occurrences
+    return filtered_index
+
+
+def synthetic_index(n_occurrences, n_words, n_videos, seed=0):
+    """Zipf-like word frequencies, timestamps rounded to 0.1 s like the indexers"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(n_words)]
+    index = {f"w{k}": [] for k in range(n_words)}
+    for word in rng.choices(list(index), weights=weights, k=n_occurrences):
+        index[word].append({
+            "v": str(rng.randrange(n_videos)),
+            "t": round(rng.uniform(0, 3600), 1),
+            "c": rng.choice(CONTEXTS)
+        })
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark smart_filter_taught_words')
+    parser.add_argument('--occurrences', type=int, default=1_000_000, help='Total occurrences (default: 1000000)')
+    parser.add_argument('--words', type=int, default=20_000, help='Distinct words (default: 20000)')
+    parser.add_argument('--videos', type=int, default=500, help='Distinct videos (default: 500)')
+    parser.add_argument('--min-score', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"📊 Synthetic index: {args.occurrences} occurrences, {args.words} words, {args.videos} videos")
+    index = synthetic_index(args.occurrences, args.words, args.videos)
+    reference_input = copy.deepcopy(index)
+
+    started = time.perf_counter()
+    expected = smart_filter_reference(reference_input, min_score=args.min_score)
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = smart_filter_taught_words(index, min_score=args.min_score)
+    vectorized_seconds = time.perf_counter() - started
+
+    assert list(result) == list(expected), "kept words differ"
+    assert all(a['s'] == b['s'] for word in index for a, b in zip(index[word], reference_input[word])), \
+        "occurrence scores differ"
+
+    print(f"  reference:  {reference_seconds:8.2f}s")
+    print(f"  vectorized: {vectorized_seconds:8.2f}s  ({reference_seconds / vectorized_seconds:.1f}x)")
+    print(f"✓ {len(result)} words kept, scores identical")
+
+
+if __name__ == "__main__":
+    main()
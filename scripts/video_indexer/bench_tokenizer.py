@@ -0,0 +1,135 @@
+import os
+import re
+import gc
+import time
+import argparse
+from array import array
+
+from transcript import Transcript
+from context_table import CONTEXT_WINDOW, context_flags
+from indexer_shared import STOP_WORDS, TextProcessor, index_video_words
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGLISH_INPUT = os.path.join(SCRIPT_DIR, "transcription_cleaned.txt")
+CHINESE_INPUT = os.path.join(SCRIPT_DIR, "transcription_zh.txt")
+
+
+class ContextWindows:
+    """
+    Scoring flags of the context window around each word, without building
+    the window string (the previous per-hit approach, kept for comparison).
+
+    None of the intro patterns contain a space and context windows are words
+    joined by spaces, so a pattern matches the window exactly when it matches
+    one of its words: the window's flags are the OR of its words' flags.
+    Each word is inspected at most once.
+    """
+    def __init__(self, words, window=CONTEXT_WINDOW):
+        self.words = words
+        self.window = window
+        self._flags = array('b', [-1]) * len(words)
+
+    def flags(self, index):
+        result = 0
+        for j in range(max(0, index - self.window), min(len(self.words), index + self.window + 1)):
+            f = self._flags[j]
+            if f < 0:
+                f = self._flags[j] = context_flags(self.words[j])
+            result |= f
+        return result
+
+
+def index_words_reference(words, video_id, processor):
+    """The previous per-word regex + validation loop, kept for comparison"""
+    starts = words.starts
+    windows = ContextWindows(words.words)
+    entries = []
+    for i, raw_text in enumerate(words.words):
+        potential_words = re.findall(r'[a-zA-Z]+(?:-[a-zA-Z]+)*', raw_text)
+        if not potential_words:
+            continue
+        flags = None
+        for raw_word in potential_words:
+            lemma = processor.lemmatize(raw_word)
+            is_valid = False
+            if lemma:
+                clean_lemma = lemma.replace('-', '')
+                if clean_lemma.isalpha() and all(ord(c) < 128 for c in lemma):
+                    is_valid = True
+            if is_valid:
+                if len(lemma) < 2 and lemma not in ['a', 'i']:
+                    continue
+                if lemma in STOP_WORDS:
+                    continue
+                if flags is None:
+                    flags = windows.flags(i)
+                entries.append((lemma, {"v": video_id, "t": round(starts[i], 1), "x": i, "_f": flags}))
+    return entries
+
+
+def build_transcript(tokens):
+    transcript = Transcript()
+    for i, t in enumerate(tokens):
+        transcript.append(t, round(i * 0.4, 2), round(i * 0.4 + 0.3, 2))
+    return transcript
+
+
+def load_words(n_words, english_every):
+    """
+    n_words ASR-like words: every `english_every`-th one from the English
+    transcript, the rest short Chinese chunks (Bilibili lessons are mostly
+    Chinese with English words mixed in); english_every=1 is all English
+    """
+    with open(ENGLISH_INPUT, 'r', encoding='utf-8') as f:
+        english = f.read().split()
+    chinese = []
+    if english_every > 1:
+        with open(CHINESE_INPUT, 'r', encoding='utf-8') as f:
+            text = re.sub(r'[\sA-Za-z*]+', '', f.read())
+        chinese = [text[i:i + 2] for i in range(0, len(text), 2)]
+    words = []
+    for i in range(n_words):
+        if i % english_every == 0:
+            words.append(english[(i // english_every) % len(english)])
+        else:
+            words.append(chinese[i % len(chinese)])
+    return words
+
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the single-pass tokenizer against the per-word loop')
+    parser.add_argument('--words', type=int, default=100_000, help='Transcript length in words (default: 100000)')
+    args = parser.parse_args()
+
+    # The per-word loop has no spelled-word reconstruction; compare without it
+    processor = TextProcessor(spell_check=False)
+    speller = TextProcessor()
+    print(f"📊 {args.words} words per transcript\n")
+    print(f"{'transcript':<26} {'per-word':>10} {'tokenizer':>10} {'speedup':>8} {'+spelling':>10} {'entries':>9}")
+    print("-" * 78)
+    for label, english_every in (("English (YouTube)", 1), ("1 in 4 English (Bilibili)", 4)):
+        transcript = build_transcript(load_words(args.words, english_every))
+        # Warm the lemma caches so both sides measure the loop, not lemmatization
+        index_video_words(transcript, 0, processor)
+        index_video_words(transcript, 0, speller)
+        ref_entries, ref_time = timed(index_words_reference, transcript, 0, processor)
+        new_entries, new_time = timed(index_video_words, transcript, 0, processor)
+        assert ref_entries == new_entries, "tokenizer changed the output"
+        _, spell_time = timed(index_video_words, transcript, 0, speller)
+        print(f"{label:<26} {ref_time * 1e3:>8.1f}ms {new_time * 1e3:>8.1f}ms "
+              f"{ref_time / new_time:>7.1f}x {spell_time * 1e3:>8.1f}ms {len(new_entries):>9}")
+    print("\n✓ Identical index entries for both loops")
+
+
+if __name__ == "__main__":
+    main()
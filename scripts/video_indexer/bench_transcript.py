@@ -0,0 +1,109 @@
+import os
+import re
+import gc
+import time
+import pickle
+import argparse
+import tracemalloc
+
+from transcript import Transcript
+from indexer_shared import STOP_WORDS, TextProcessor, index_video_words
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(SCRIPT_DIR, "transcription_cleaned.txt")
+
+
+def load_tokens(path, n_words):
+    """Whitespace tokens of a transcript text file, repeated up to n_words"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tokens = f.read().split()
+    if not tokens:
+        raise ValueError(f"{path} contains no words")
+    return (tokens * (n_words // len(tokens) + 1))[:n_words]
+
+
+def build_dicts(tokens):
+    # Same shape the engines used to return: one dict per word
+    return [{'word': t, 'start': round(i * 0.4, 2), 'end': round(i * 0.4 + 0.3, 2)}
+            for i, t in enumerate(tokens)]
+
+
+def build_transcript(tokens):
+    transcript = Transcript()
+    for i, t in enumerate(tokens):
+        transcript.append(t, round(i * 0.4, 2), round(i * 0.4 + 0.3, 2))
+    return transcript
+
+
+def index_dicts_reference(words, video_id, processor):
+    """The previous per-dict indexing loop, kept for comparison"""
+    entries = []
+    for i, word_obj in enumerate(words):
+        raw_text = word_obj['word']
+        for raw_word in re.findall(r'[a-zA-Z]+(?:-[a-zA-Z]+)*', raw_text):
+            lemma = processor.lemmatize(raw_word)
+            if lemma and lemma.replace('-', '').isalpha() and all(ord(c) < 128 for c in lemma):
+                if len(lemma) < 2 and lemma not in ['a', 'i']:
+                    continue
+                if lemma in STOP_WORDS:
+                    continue
+                context = " ".join([w['word'] for w in words[max(0, i - 5):min(len(words), i + 6)]])
+                entries.append((lemma, {"v": video_id, "t": round(word_obj['start'], 1), "c": context}))
+    return entries
+
+
+def measure(func, *args):
+    """(result, seconds, peak traced bytes) of func(*args)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dict-list vs columnar Transcript')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='Transcript text to sample words from')
+    parser.add_argument('--words', type=int, default=100_000, help='Transcript length in words (default: 100000)')
+    args = parser.parse_args()
+
+    tokens = load_tokens(args.input, args.words)
+    processor = TextProcessor()
+    print(f"📊 {len(tokens)} words sampled from {os.path.basename(args.input)}\n")
+
+    dicts, dict_build, dict_mem = measure(build_dicts, tokens)
+    transcript, col_build, col_mem = measure(build_transcript, tokens)
+
+    ref_entries, ref_index = timed(index_dicts_reference, dicts, 0, processor)
+    col_entries, col_index = timed(index_video_words, transcript, 0, processor)
+    # Columnar entries reference their context ("x") instead of copying it ("c")
+    assert [(lemma, e["v"], e["t"]) for lemma, e in ref_entries] == \
+        [(lemma, e["v"], e["t"]) for lemma, e in col_entries], "columnar indexing changed the output"
+
+    dict_pickle = len(pickle.dumps(dicts))
+    col_pickle = len(pickle.dumps(transcript))
+
+    print(f"{'':<22} {'dict list':>12} {'Transcript':>12} {'ratio':>7}")
+    print("-" * 56)
+    print(f"{'memory (MB)':<22} {dict_mem / 1e6:>12.2f} {col_mem / 1e6:>12.2f} {dict_mem / col_mem:>6.1f}x")
+    print(f"{'build (ms)':<22} {dict_build * 1e3:>12.1f} {col_build * 1e3:>12.1f} {dict_build / col_build:>6.1f}x")
+    print(f"{'index (ms)':<22} {ref_index * 1e3:>12.1f} {col_index * 1e3:>12.1f} {ref_index / col_index:>6.1f}x")
+    print(f"{'pickle (MB)':<22} {dict_pickle / 1e6:>12.2f} {col_pickle / 1e6:>12.2f} {dict_pickle / col_pickle:>6.1f}x")
+    print(f"\n✓ {len(col_entries)} index entries, identical for both representations")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,22 @@ import shutil
 import subprocess
 import re
 import time
+import queue
 import argparse
-import glob
+import threading
 from collections import defaultdict
-from fast_asr_engine import ASREngine  # Use fast engine with improved estimation
+from asr_backends import create_engine, add_backend_argument, DEFAULT_BACKEND
+from pipeline import Pipeline, StageError
+from asr_pool import ASRWorkerPool, transcribe_uncached
+from vad import transcribe_with_vad
+from audio_stream import stream_audio
+from download_scheduler import download_bvids, DEFAULT_WORKERS, DEFAULT_HOST_INTERVAL
+from transcript import as_transcript
+from context_table import VideoContexts
+from index_runs import RunSpiller, ShardWriter, stream_taught_words
+from index_lsm import IndexState
+from shard_publisher import publish_shards
+from shard_planner import DEFAULT_TARGET_BYTES, plan_index
 
 try:
     from tqdm import tqdm
@@ -29,96 +41,10 @@ BVID_LIST = [
 ]
 
 from indexer_shared import (
-    STOP_WORDS, TextProcessor, get_transcription_cache_path,
-    save_transcription_cache, load_transcription_cache,
-    deduplicate_occurrences, smart_filter_taught_words
+    TextProcessor, load_cached_transcript, save_cached_transcript,
+    deduplicate_occurrences, smart_filter_taught_words, index_video_words
 )
 
-def download_audio(bvid, output_dir, max_retries=3):
-    """
-    Download Bilibili video using you-get with retry logic.
-    
-    Args:
-        bvid: Bilibili video ID (e.g., "BV1234567890")
-        output_dir: Directory to save downloaded videos
-        max_retries: Maximum number of download attempts (default: 3)
-        
-    Returns:
-        dict: {"success": bool, "error": str or None, "title": str}
-    """
-    url = f"https://www.bilibili.com/video/{bvid}"
-    print(f"\n📥 Downloading video for {bvid}...")
-    
-    # 1. Get video info first
-    title = "Unknown Title"
-    try:
-        info_cmd = ['you-get', '--json', url]
-        result = subprocess.run(info_cmd, capture_output=True, text=True, check=True, timeout=30)
-        info = json.loads(result.stdout)
-        title = info.get('title', 'Unknown Title')
-        print(f"  📺 Title: {title}")
-    except subprocess.TimeoutExpired:
-        error_msg = "Timeout getting video info"
-        print(f"  ❌ {error_msg}")
-        return {"success": False, "error": error_msg, "title": title}
-    except Exception as e:
-        print(f"  ⚠️  Warning: Could not get video info: {e}")
-        # Continue anyway, title is not critical
-    
-    # 2. Download video with retry logic
-    print(f"  ⏬ Starting download (this may take several minutes for multi-part videos)...")
-    print(f"  💡 Tip: You can see you-get's progress below")
-    
-    for attempt in range(1, max_retries + 1):
-        try:
-            if attempt > 1:
-                print(f"\n  🔄 Retry attempt {attempt}/{max_retries}...")
-                time.sleep(5)  # Wait before retry
-            
-            download_cmd = [
-                'you-get',
-                '--playlist',  # Support multi-page videos
-                '-o', output_dir,
-                url
-            ]
-            
-            # Don't capture output - let you-get show progress in real-time
-            print()  # Add blank line before you-get output
-            result = subprocess.run(
-                download_cmd,
-                timeout=1800  # 30 minute timeout for large playlists
-            )
-            print()  # Add blank line after you-get output
-            
-            # Check if download succeeded (returncode 0 or 1 both can be success)
-            # you-get returns 1 when files already exist
-            if result.returncode in [0, 1]:
-                print(f"  ✅ Download complete")
-                return {"success": True, "error": None, "title": title}
-            else:
-                error_msg = f"you-get exited with code {result.returncode}"
-                if attempt == max_retries:
-                    print(f"  ❌ {error_msg}")
-                    return {"success": False, "error": error_msg, "title": title}
-                print(f"  ⚠️  {error_msg}, retrying...")
-                
-        except subprocess.TimeoutExpired:
-            error_msg = "Download timeout (>30 minutes)"
-            if attempt == max_retries:
-                print(f"  ❌ {error_msg}")
-                return {"success": False, "error": error_msg, "title": title}
-            print(f"  ⚠️  {error_msg}, retrying...")
-            
-        except Exception as e:
-            error_msg = f"Download error: {str(e)}"
-            if attempt == max_retries:
-                print(f"  ❌ {error_msg}")
-                return {"success": False, "error": error_msg, "title": title}
-            print(f"  ⚠️  {error_msg}, retrying...")
-    
-    # Should not reach here, but just in case
-    return {"success": False, "error": "Unknown download failure", "title": title}
-
 def extract_audio(video_path):
     """Extract audio from video file to .wav"""
     base_name = os.path.splitext(video_path)[0]
@@ -158,8 +84,8 @@ def extract_page_number(filename):
     return None
 
 def scan_video_files(directory):
-    """Scan for video files in directory and sort by page number"""
-    video_extensions = {'.mp4', '.flv', '.mkv', '.mov'}
+    """Scan for video files (and audio-only downloads) in directory and sort by page number"""
+    video_extensions = {'.mp4', '.flv', '.mkv', '.mov', '.m4a', '.aac', '.opus'}
     files = []
     for f in os.listdir(directory):
         ext = os.path.splitext(f)[1].lower()
@@ -176,17 +102,156 @@ def scan_video_files(directory):
     files.sort(key=get_page_number)
     return files
 
-def get_context(all_words, current_index, window=5):
-    """Extract context window around current word."""
-    start = max(0, current_index - window)
-    end = min(len(all_words), current_index + window + 1)
-    return " ".join([w['word'] for w in all_words[start:end]])
 
-# (Shared logic imported from indexer_shared)
+def run_pipeline(bvid_list, existing_files, processor, queue_size=2, asr_pool=None, vad=False,
+                 asr_backend=DEFAULT_BACKEND, stream=False, download_workers=DEFAULT_WORKERS,
+                 host_interval=DEFAULT_HOST_INTERVAL, audio_only=False):
+    """
+    Pipelined Phase 1 + Phase 2: download -> extract -> transcribe -> index.
+    
+    Each stage runs in its own thread and hands work to the next one through
+    a bounded queue, so Whisper transcribes video N while video N+1 is being
+    downloaded and video N+2 extracted. Wall-clock time approaches that of the
+    slowest stage instead of the sum of all stages.
+    
+    Args:
+        bvid_list: BVIDs to download (empty to only process existing files)
+        existing_files: Video files already present in TEMP_DIR
+        processor: TextProcessor used for indexing
+        queue_size: Max items waiting between two stages
+        asr_pool: Optional ASRWorkerPool; transcribes several videos at once
+        vad: Only transcribe detected speech regions (see vad.py)
+        asr_backend: Registered ASR backend name (see asr_backends.py)
+        stream: Decode audio into memory instead of writing WAV files
+        download_workers: Concurrent you-get processes (see download_scheduler.py)
+        host_interval: Minimum seconds between download starts per host
+        audio_only: Download only the audio track of each part
+        
+    Returns:
+        (results, download_failures) where results maps video filename to
+        either (list of (lemma, entry) tuples, transcript words) with entry
+        "v" still unset, or a StageError
+    """
+    seen = set()
+    seen_lock = threading.Lock()
+    download_failures = []
+    asr_holder = {}
 
+    def claim(path):
+        # Each file enters the pipeline exactly once
+        with seen_lock:
+            if path in seen:
+                return False
+            seen.add(path)
+            return True
 
+    def download_stage(item):
+        kind, value = item
+        if kind == "file":
+            if claim(value):
+                yield value
+            return
 
-# (Shared logic imported from indexer_shared)
+        # All BVIDs at once: the scheduler moves each part into TEMP_DIR only
+        # when it is complete, so every file it reports can be handed on
+        finished = queue.Queue()
+        outcome = {}
+        worker = threading.Thread(
+            target=lambda: outcome.update(results=download_bvids(
+                value, TEMP_DIR, workers=download_workers, host_interval=host_interval,
+                on_file=finished.put, audio_only=audio_only)),
+            daemon=True
+        )
+        worker.start()
+        while worker.is_alive() or not finished.empty():
+            try:
+                path = finished.get(timeout=1)
+            except queue.Empty:
+                continue
+            if claim(path):
+                yield path
+
+        for result in outcome.get("results", []):
+            if not result["success"]:
+                download_failures.append({"bvid": result["bvid"], "title": result["title"], "error": result["error"]})
+
+        # Parts finished by earlier runs (ledger) were never reported
+        for path in scan_video_files(TEMP_DIR):
+            if claim(path):
+                yield path
+
+    def extract_stage(video_path):
+        task = {
+            "path": video_path,
+            "title": os.path.splitext(os.path.basename(video_path))[0],
+            "audio_path": None,
+            "audio": None,
+            "words": None
+        }
+        cached_data = load_cached_transcript(video_path, asr_backend, "medium")
+        if cached_data:
+            task["words"] = cached_data['words']
+        elif stream:
+            task["audio"] = stream_audio(video_path)
+        else:
+            task["audio_path"] = extract_audio(video_path)
+            if not task["audio_path"]:
+                raise Exception("Audio extraction failed")
+        yield task
+
+    def transcribe_stage(task):
+        if task["words"] is None:
+            print(f"  🗣️  Transcribing {os.path.basename(task['path'])}...")
+            if asr_pool is None and "asr" not in asr_holder:
+                print(f"  🤖 Loading {asr_backend} model (medium)...")
+                asr_holder["asr"] = create_engine(asr_backend, model_size="medium")
+            source = task["audio"] if stream else task["audio_path"]
+            if vad:
+                task["words"] = transcribe_with_vad(source, asr=asr_holder.get("asr"), pool=asr_pool)
+            elif asr_pool is not None:
+                future = asr_pool.submit_audio(source) if stream else asr_pool.submit(source)
+                task["words"] = future.result()
+            elif stream:
+                task["words"] = asr_holder["asr"].transcribe_audio(source)
+            else:
+                task["words"] = asr_holder["asr"].transcribe(source)
+            task["audio"] = None  # Release the decoded samples before indexing
+            save_cached_transcript(task["path"], task["words"], {"title": task["title"]},
+                                   asr_backend, "medium")
+            if task["audio_path"] and os.path.exists(task["audio_path"]):
+                os.remove(task["audio_path"])
+        yield task
+
+    def index_stage(task):
+        transcript = as_transcript(task["words"])
+        yield os.path.basename(task["path"]), (index_video_words(transcript, None, processor), transcript.words)
+
+    pipe = Pipeline(queue_size=queue_size)
+    pipe.add_stage("download", download_stage)
+    pipe.add_stage("extract", extract_stage)
+    pipe.add_stage("transcribe", transcribe_stage, workers=asr_pool.workers if asr_pool else 1)
+    pipe.add_stage("index", index_stage)
+
+    source = [("file", path) for path in existing_files] + ([("bvids", list(bvid_list))] if bvid_list else [])
+
+    results = {}
+    for result in pipe.run(source):
+        if isinstance(result, StageError):
+            if result.stage == "download":
+                kind, value = result.item
+                for bvid in (value if kind == "bvids" else [value]):
+                    download_failures.append({"bvid": bvid, "title": "Unknown Title", "error": str(result.error)})
+                continue
+            item = result.item if isinstance(result.item, str) else result.item["path"]
+            filename = os.path.basename(item)
+            print(f"  ❌ [{result.stage}] {filename}: {result.error}")
+            results[filename] = result
+        else:
+            filename, (entries, words) = result
+            print(f"  ✅ Pipelined {filename} ({len(entries)} occurrences)")
+            results[filename] = (entries, words)
+
+    return results, download_failures
 
 def load_bvid_list_from_file(filepath):
     """Load BVID list from a text file (one BVID per line)"""
@@ -223,6 +288,12 @@ Examples:
   
   # Retry only failed videos from previous run
   python bilibili_indexer.py --retry-failed
+  
+  # Overlap download, audio extraction, Whisper and indexing
+  python bilibili_indexer.py --bvid-file videos.txt --pipeline
+  
+  # Fetch only the audio tracks (needs yt-dlp)
+  python bilibili_indexer.py --bvid-file videos.txt --audio-only
         """
     )
     parser.add_argument('--bvids', nargs='+', metavar='BVID',
@@ -233,7 +304,33 @@ Examples:
                        help='Only retry videos that failed in the previous run')
     parser.add_argument('--skip-download', action='store_true',
                        help='Skip download phase and only process existing videos')
-    parser.add_argument('--incremental', action='store_true', help='Merge with existing index instead of overwriting')
+    parser.add_argument('--download-workers', type=int, default=DEFAULT_WORKERS, metavar='N',
+                       help=f'Download up to N video parts at once (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--download-interval', type=float, default=DEFAULT_HOST_INTERVAL, metavar='SECONDS',
+                       help=f'Minimum seconds between download starts against the same host (default: {DEFAULT_HOST_INTERVAL})')
+    parser.add_argument('--audio-only', action='store_true',
+                       help='Download only the audio track of each part (.m4a via yt-dlp) instead of the full video')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only index new videos: write per-video delta segments and compact them into the existing index')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Run download, extraction, transcription and indexing as concurrent stages')
+    parser.add_argument('--pipeline-queue-size', type=int, default=2, metavar='N',
+                       help='Max videos buffered between pipeline stages (default: 2)')
+    parser.add_argument('--asr-workers', type=int, default=1, metavar='N',
+                       help='Transcribe N videos in parallel, one Whisper model per worker process (default: 1)')
+    parser.add_argument('--vad', action='store_true',
+                       help='Skip silence: only transcribe speech regions found by voice activity detection')
+    add_backend_argument(parser)
+    parser.add_argument('--stream-audio', action='store_true',
+                       help='Pipe audio from ffmpeg straight into the ASR engine instead of writing .wav files')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Spill per-video results to sorted run files and merge them word by word (flat memory)')
+    parser.add_argument('--run-dir', metavar='DIR',
+                       help='Where --streaming puts its temporary run files (default: system temp dir)')
+    parser.add_argument('--shard-target-kb', type=int, default=DEFAULT_TARGET_BYTES // 1024, metavar='KB',
+                       help=f'Target size of each index shard (default: {DEFAULT_TARGET_BYTES // 1024})')
+    parser.add_argument('--binary-shards', action='store_true',
+                       help='Also publish each shard in the compact binary format (read by the frontend with VITE_BINARY_INDEX=true)')
     args = parser.parse_args()
     
     # Determine BVID list source
@@ -272,22 +369,22 @@ Examples:
         print("\n[Phase 1] Skipping download phase (--skip-download)...")
     elif args.retry_failed:
         print("\n[Retry Mode] Skipping download phase...")
+    elif args.pipeline:
+        print("\n[Phase 1] Downloads run inside the pipeline (--pipeline)...")
     else:
         print("\n" + "=" * 60)
         print(f"[Phase 1] Downloading {len(bvid_list)} Video(s)...")
         print("=" * 60)
-        print(f"💡 Note: you-get will show its own download progress\n")
+        print(f"⏬ {args.download_workers} parallel downloads, ledger: {os.path.join(TEMP_DIR, 'download_ledger.json')}\n")
         
-        # Don't use tqdm here - it conflicts with you-get's own progress display
         for idx, bvid in enumerate(bvid_list, 1):
-            print(f"\n[{idx}/{len(bvid_list)}] Processing {bvid}")
             bvid_download_map[bvid] = idx
-            
-            result = download_audio(bvid, TEMP_DIR, max_retries=3)
-            
+        
+        for result in download_bvids(bvid_list, TEMP_DIR, workers=args.download_workers,
+                                     host_interval=args.download_interval, audio_only=args.audio_only):
             if not result["success"]:
                 download_failures.append({
-                    "bvid": bvid,
+                    "bvid": result["bvid"],
                     "title": result["title"],
                     "error": result["error"]
                 })
@@ -336,12 +433,37 @@ Examples:
     
     global_index = defaultdict(list)
     total_words_count = 0
+    shard_target_bytes = args.shard_target_kb * 1024
     video_map = {}
+    contexts = VideoContexts(OUTPUT_DIR, "bilibili")
+    # Streaming Mode: occurrences go to sorted run files instead of global_index
+    spiller = RunSpiller(args.run_dir) if args.streaming and not args.incremental else None
+    shard_writer = None
+    if spiller is not None:
+        # Context tables are staged on its publisher as each video is indexed
+        shard_writer = ShardWriter(OUTPUT_DIR, "index_bilibili", shard_target_bytes, binary=args.binary_shards)
+        contexts.stream_to(shard_writer.publisher)
+    # Raw (pre-filter) entries behind the published index, for incremental runs
+    index_state = IndexState("bilibili", OUTPUT_DIR)
+    
+    def add_video_entries(video_id, words, pairs):
+        """Route one video's (lemma, entry) pairs to global_index, the run files or a delta segment"""
+        if args.incremental:
+            index_state.add_delta(video_id, words, pairs)
+        elif spiller is None:
+            contexts.add(video_id, words)
+            for lemma, entry in pairs:
+                global_index[lemma].append(entry)
+        else:
+            # Table staged on the publisher now: neither it nor the transcript is kept
+            contexts.write_video(video_id, words, [entry for _, entry in pairs])
+            for lemma, entry in pairs:
+                spiller.add(lemma, entry)
+        return len(pairs)
     failed_videos = []  # Track failed videos
     successful_videos = 0
     
     # Incremental Mode: Load existing data
-    loaded_lemmas = set()
     if args.incremental:
         print("\n[Incremental Mode] Loading existing index...")
         
@@ -356,21 +478,46 @@ Examples:
             except Exception as e:
                 print(f"  ⚠️  Failed to load existing video map: {e}")
         
-        # Load shards
-        shard_files = glob.glob(os.path.join(OUTPUT_DIR, "index_bilibili_*.json"))
-        loaded_words = 0
-        for sf in shard_files:
-            try:
-                with open(sf, 'r', encoding='utf-8') as f:
-                    shard_data = json.load(f)
-                    for lemma, entries in shard_data.items():
-                        global_index[lemma].extend(entries)
-                        loaded_lemmas.add(lemma)
-                        loaded_words += 1
-            except Exception as e:
-                print(f"  ⚠️  Failed to load shard {sf}: {e}")
-                
-        print(f"  ✅ Loaded {loaded_words} words from existing shards")
+        # Raw entries of the existing index (built by the last full run)
+        if index_state.exists():
+            print(f"  ✅ Index state found ({len(index_state.pending_deltas())} pending deltas)")
+        else:
+            index_state.seed_from_shards()
+
+    # Pipeline Mode: run all heavy stages concurrently, then merge below in page order
+    pipeline_results = None
+    if args.pipeline:
+        pipeline_bvids = [] if (args.skip_download or args.retry_failed) else bvid_list
+        print(f"\n[Pipeline Mode] download → extract → transcribe → index (queue size {args.pipeline_queue_size})")
+        asr_pool = ASRWorkerPool(args.asr_workers, model_size="medium", backend=args.asr_backend) \
+            if args.asr_workers > 1 else None
+        try:
+            pipeline_results, download_failures = run_pipeline(
+                pipeline_bvids, video_files, processor,
+                queue_size=args.pipeline_queue_size, asr_pool=asr_pool, vad=args.vad,
+                asr_backend=args.asr_backend, stream=args.stream_audio,
+                download_workers=args.download_workers, host_interval=args.download_interval,
+                audio_only=args.audio_only
+            )
+        finally:
+            if asr_pool is not None:
+                asr_pool.close()
+        if download_failures:
+            print(f"\n⚠️  Download Summary: {len(pipeline_bvids) - len(download_failures)}/{len(pipeline_bvids)} successful")
+            print(f"❌ Failed downloads:")
+            for fail in download_failures:
+                print(f"   - {fail['bvid']}: {fail['error']}")
+        if pipeline_bvids:
+            # Re-scan so video IDs follow page order exactly like the sequential mode
+            video_files = scan_video_files(TEMP_DIR)
+    elif args.asr_workers > 1:
+        # Fill the transcription cache in parallel; the loop below then only indexes
+        transcribe_uncached(
+            [(vf, {"title": os.path.splitext(os.path.basename(vf))[0]})
+             for vf in video_files],
+            workers=args.asr_workers, model_size="medium", extract=extract_audio, vad=args.vad,
+            backend=args.asr_backend, stream=args.stream_audio
+        )
 
     # Use progress bar for processing if available
     processing_iterator = tqdm(enumerate(video_files), total=len(video_files), 
@@ -420,9 +567,20 @@ Examples:
             else:
                 processing_iterator.set_postfix_str(video_filename[:40])
             
+            if pipeline_results is not None and video_filename in pipeline_results:
+                # Already transcribed and indexed by the pipeline, just assign the ID
+                outcome = pipeline_results[video_filename]
+                if isinstance(outcome, StageError):
+                    raise Exception(f"{outcome.stage} stage failed: {outcome.error}")
+                entries, words = outcome
+                for lemma, entry in entries:
+                    entry["v"] = video_id
+                total_words_count += add_video_entries(video_id, words, entries)
+                successful_videos += 1
+                continue
+            
             # Check Cache First
-            cache_path = get_transcription_cache_path(video_path)
-            cached_data = load_transcription_cache(cache_path)
+            cached_data = load_cached_transcript(video_path, args.asr_backend, "medium")
             
             words = []
             
@@ -434,69 +592,48 @@ Examples:
                 # No cache, perform heavy lifting
                 if asr is None:
                     if not HAS_TQDM:
-                        print("  🤖 Loading Whisper model (medium)...")
-                    asr = ASREngine(model_size="medium")
+                        print(f"  🤖 Loading {args.asr_backend} model (medium)...")
+                    asr = create_engine(args.asr_backend, model_size="medium")
                 
                 # Extract Audio
                 if not HAS_TQDM:
                     print(f"  🎵 Extracting audio...")
-                audio_path = extract_audio(video_path)
-                if not audio_path:
-                    raise Exception("Audio extraction failed")
+                if args.stream_audio:
+                    # Decoded straight into memory, nothing to clean up afterwards
+                    audio_path = None
+                    audio = stream_audio(video_path)
+                else:
+                    audio_path = extract_audio(video_path)
+                    if not audio_path:
+                        raise Exception("Audio extraction failed")
+                    audio = audio_path
                     
                 # Transcribe
                 if not HAS_TQDM:
                     print(f"  🗣️  Transcribing (this may take a while)...")
-                words = asr.transcribe(audio_path)
+                if args.vad:
+                    words = transcribe_with_vad(audio, asr=asr)
+                elif args.stream_audio:
+                    words = asr.transcribe_audio(audio)
+                else:
+                    words = asr.transcribe(audio_path)
+                audio = None
                 
                 # Save Cache immediately
-                save_transcription_cache(cache_path, words, {"title": title})
+                save_cached_transcript(video_path, words, {"title": title}, args.asr_backend, "medium")
                 if not HAS_TQDM:
                     print(f"  💾 Saved transcription cache")
                 
                 # Optional: Cleanup audio to save space
-                if os.path.exists(audio_path):
+                if audio_path and os.path.exists(audio_path):
                     os.remove(audio_path)
 
             # 3. Indexing (Always runs, fast)
             if not HAS_TQDM:
                 print(f"  📚 Indexing {len(words)} words...")
-            indexed_count = 0
-            for i, word_obj in enumerate(words):
-                raw_text = word_obj['word']
-                
-                # Regex extraction
-                potential_words = re.findall(r'[a-zA-Z]+(?:-[a-zA-Z]+)*', raw_text)
-                
-                for raw_word in potential_words:
-                    lemma = processor.lemmatize(raw_word)
-                    
-                    # Validation
-                    is_valid = False
-                    if lemma:
-                        clean_lemma = lemma.replace('-', '')
-                        if clean_lemma.isalpha() and all(ord(c) < 128 for c in lemma):
-                            is_valid = True
-                    
-                    if is_valid:
-                        if len(lemma) < 2 and lemma not in ['a', 'i']:
-                            continue
-                        if lemma in STOP_WORDS:
-                            continue
-                        
-                        context = get_context(words, i)
-                        
-                        # Absolute time is just start time (no offset needed as we process full video)
-                        absolute_time = word_obj['start']
-                        
-                        entry = {
-                            "v": video_id,
-                            "t": round(absolute_time, 1),
-                            "c": context
-                        }
-                        global_index[lemma].append(entry)
-                        indexed_count += 1
-                        total_words_count += 1
+            words = as_transcript(words)
+            indexed_count = add_video_entries(video_id, words.words, index_video_words(words, video_id, processor))
+            total_words_count += indexed_count
             
             if not HAS_TQDM:
                 print(f"  ✅ Indexed {indexed_count} word occurrences")
@@ -528,83 +665,134 @@ Examples:
     print("Saving data...")
     print("=" * 60)
     
-    # Show original words before filtering
-    print(f"\n{'=' * 60}")
-    print(f"📋 Original Words (before density filter):")
-    print(f"{'=' * 60}")
+    # Save video_map
+    video_map_path = os.path.join(OUTPUT_DIR, "video_map_bilibili.json")
+    with open(video_map_path, "w", encoding='utf-8') as f:
+        json.dump(video_map, f, indent=2, ensure_ascii=False)
+    print(f"✓ Saved video_map_bilibili.json")
     
-    if global_index:
-        sorted_original = sorted(global_index.items(), key=lambda x: (-len(x[1]), x[0]))
-        print(f"{'Word':<20} {'Occurrences':<15} {'First at'}")
-        print("-" * 60)
+    deduplicated_index = None
+    if args.incremental:
+        # Incremental Mode: merge this run's deltas, rescoring only the words they touch
+        print("Compacting delta segments into the index...")
+        stats = index_state.compact(time_window=120, min_score=15, dedup_threshold=60)
+        print(f"  Merged {stats['deltas']} deltas: {stats['touched']} words rescored, "
+              f"{stats['kept']} published, {stats['dropped']} dropped")
+        taught_word_count = stats['kept']
+        try:
+            with open(os.path.join(OUTPUT_DIR, "metadata.json"), 'r', encoding='utf-8') as f:
+                previous_total = json.load(f).get("total_words", 0)
+        except (OSError, ValueError):
+            previous_total = 0
+        final_occurrence_count = previous_total + stats['occurrence_delta']
+    elif spiller is not None:
+        # Streaming Mode: k-way merge of the sorted runs, filtered and sharded word by word
+        spiller.spill()
+        print(f"Merging {len(spiller.runs)} sorted run files ({spiller.entries} occurrences)...")
+        print("  Using Smart Filter Algorithm (Context + Density + Isolation)")
+        original_word_count = taught_word_count = 0
+        original_occurrence_count = taught_occurrence_count = final_occurrence_count = 0
+        try:
+            for lemma, n_original, n_taught, deduped in stream_taught_words(
+                spiller.merge(), time_window=120, min_score=15, dedup_threshold=60
+            ):
+                original_word_count += 1
+                original_occurrence_count += n_original
+                if deduped is None:
+                    continue
+                taught_word_count += 1
+                taught_occurrence_count += n_taught
+                final_occurrence_count += len(deduped)
+                shard_writer.add(lemma, deduped)
+        except BaseException:
+            shard_writer.abort()
+            raise
+        finally:
+            spiller.cleanup()
         
-        for word, occurrences in sorted_original[:30]:  # Show top 30
-            first_time = min(occ['t'] for occ in occurrences)
-            print(f"{word:<20} {len(occurrences):<15} {first_time:.1f}s")
+        print(f"  Words: {original_word_count} → {taught_word_count} (filtered {original_word_count - taught_word_count} auxiliary words)")
+        print(f"  Occurrences: {original_occurrence_count} → {taught_occurrence_count} → {final_occurrence_count} (after deduplication)")
         
-        if len(global_index) > 30:
-            print(f"... and {len(global_index) - 30} more words")
-    
-    print("=" * 60)
+        # Tables were staged per video while indexing; only drop stale ones
+        contexts.save({}, keep_videos=video_map)
+        for filename, word_count in shard_writer.close(contexts).items():
+            print(f"✓ Saved {filename} ({word_count} words)")
+        # Raw entries were not kept; the next --incremental run reseeds from the shards
+        index_state.clear()
+    else:
+        # Show original words before filtering
+        print(f"\n{'=' * 60}")
+        print(f"📋 Original Words (before density filter):")
+        print(f"{'=' * 60}")
+    
+        if global_index:
+            sorted_original = sorted(global_index.items(), key=lambda x: (-len(x[1]), x[0]))
+            print(f"{'Word':<20} {'Occurrences':<15} {'First at'}")
+            print("-" * 60)
+        
+            for word, occurrences in sorted_original[:30]:  # Show top 30
+                first_time = min(occ['t'] for occ in occurrences)
+                print(f"{word:<20} {len(occurrences):<15} {first_time:.1f}s")
+        
+            if len(global_index) > 30:
+                print(f"... and {len(global_index) - 30} more words")
     
-    # Step 1: Filter by frequency density (identify taught words)
-    print("Filtering by frequency density (taught words only)...")
-    print("  Using Smart Filter Algorithm (Context + Density + Isolation)")
+        print("=" * 60)
     
-    original_word_count = len(global_index)
+        # Step 1: Filter by frequency density (identify taught words)
+        print("Filtering by frequency density (taught words only)...")
+        print("  Using Smart Filter Algorithm (Context + Density + Isolation)")
     
-    # Use Smart Algorithm
-    taught_words_index = smart_filter_taught_words(
-        global_index,
-        time_window=120,
-        min_score=15,
-        whitelist=loaded_lemmas if args.incremental else None
-    )
+        original_word_count = len(global_index)
+        # Raw entries for later incremental runs (filtering and saving modify them in place)
+        raw_index = {lemma: [dict(e) for e in entries] for lemma, entries in global_index.items()}
     
-    taught_word_count = len(taught_words_index)
-    original_occurrence_count = sum(len(occs) for occs in global_index.values())
-    taught_occurrence_count = sum(len(occs) for occs in taught_words_index.values())
+        # Use Smart Algorithm
+        taught_words_index = smart_filter_taught_words(
+            global_index,
+            time_window=120,
+            min_score=15
+        )
     
-    print(f"  Words: {original_word_count} → {taught_word_count} (filtered {original_word_count - taught_word_count} auxiliary words)")
-    print(f"  Occurrences: {original_occurrence_count} → {taught_occurrence_count}")
+        taught_word_count = len(taught_words_index)
+        original_occurrence_count = sum(len(occs) for occs in global_index.values())
+        taught_occurrence_count = sum(len(occs) for occs in taught_words_index.values())
     
-    # Step 2: Deduplicate occurrences for each taught word
-    print("Deduplicating nearby occurrences...")
-    deduplicated_index = {}
-    final_occurrence_count = 0
+        print(f"  Words: {original_word_count} → {taught_word_count} (filtered {original_word_count - taught_word_count} auxiliary words)")
+        print(f"  Occurrences: {original_occurrence_count} → {taught_occurrence_count}")
     
-    for lemma, occurrences in taught_words_index.items():
-        deduped = deduplicate_occurrences(occurrences, time_threshold=60)
-        deduplicated_index[lemma] = deduped
-        final_occurrence_count += len(deduped)
+        # Step 2: Deduplicate occurrences for each taught word
+        print("Deduplicating nearby occurrences...")
+        deduplicated_index = {}
+        final_occurrence_count = 0
     
-    print(f"  Occurrences: {taught_occurrence_count} → {final_occurrence_count} (removed {taught_occurrence_count - final_occurrence_count} duplicates)")
+        for lemma, occurrences in taught_words_index.items():
+            deduped = deduplicate_occurrences(occurrences, time_threshold=60)
+            deduplicated_index[lemma] = deduped
+            final_occurrence_count += len(deduped)
     
-    # Save video_map
-    video_map_path = os.path.join(OUTPUT_DIR, "video_map_bilibili.json")
-    with open(video_map_path, "w", encoding='utf-8') as f:
-        json.dump(video_map, f, indent=2, ensure_ascii=False)
-    print(f"✓ Saved video_map_bilibili.json")
+        print(f"  Occurrences: {taught_occurrence_count} → {final_occurrence_count} (removed {taught_occurrence_count - final_occurrence_count} duplicates)")
     
-    # Shard and save index
-    shards = defaultdict(dict)
-    for lemma, entries in deduplicated_index.items():
-        first_char = lemma[0] if lemma and lemma[0].isalpha() else "others"
-        shards[first_char][lemma] = entries
-
-    for char, data in shards.items():
-        filename = f"index_bilibili_{char}.json"
-        with open(os.path.join(OUTPUT_DIR, filename), "w", encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
-        print(f"✓ Saved {filename} ({len(data)} words)")
-            
+        # Context tables (rewrites entry "x" positions, so before the shards)
+        table_count, table_bytes = contexts.save(deduplicated_index, keep_videos=video_map)
+        print(f"✓ Built {table_count} context tables ({table_bytes / 1024:.1f} KB)")
+        index_state.reset(raw_index, contexts)
+
+        # Size-balanced prefix-range shards, serialized in parallel and published
+        # with one atomic manifest swap (the routing table goes into the manifest)
+        shards, routing = plan_index(deduplicated_index, shard_target_bytes)
+        for filename, word_count in publish_shards(OUTPUT_DIR, "index_bilibili", shards,
+                                                   routing=routing, target_bytes=shard_target_bytes,
+                                                   binary=args.binary_shards, contexts=contexts).items():
+            print(f"✓ Saved {filename} ({word_count} words)")
+
     # Save Metadata
     import time
     metadata = {
         "generated_at": int(time.time()),
         "total_videos": len(video_map),
         "total_words": final_occurrence_count,  # Use final count after filtering and deduplication
-        "sharding_type": "alphabet",
+        "sharding_type": "prefix-range",  # Routing table in manifest.json
         "version": "2.0",
         "indexer": "you-get + WhisperX"
     }
@@ -647,18 +835,26 @@ Examples:
         print(f"\nFailed videos:")
         for fail in failed_videos:
             print(f"  - {fail['filename']}: {fail['error']}")
-    print(f"\n✓ Filtering pipeline:")
-    print(f"  - Original: {original_word_count} words, {original_occurrence_count} occurrences")
-    print(f"  - After density filter: {taught_word_count} words, {taught_occurrence_count} occurrences")
-    print(f"  - After deduplication: {taught_word_count} words, {final_occurrence_count} occurrences")
+    if args.incremental:
+        print(f"\n✓ Incremental update:")
+        print(f"  - New occurrences: {total_words_count} (words rescored: {stats['touched']})")
+        print(f"  - Published occurrences: {final_occurrence_count} ({stats['occurrence_delta']:+d})")
+    else:
+        print(f"\n✓ Filtering pipeline:")
+        print(f"  - Original: {original_word_count} words, {original_occurrence_count} occurrences")
+        print(f"  - After density filter: {taught_word_count} words, {taught_occurrence_count} occurrences")
+        print(f"  - After deduplication: {taught_word_count} words, {final_occurrence_count} occurrences")
     print(f"✓ Output: {OUTPUT_DIR}")
     
     # Display indexed words
     print(f"\n{'=' * 60}")
-    print(f"📚 Indexed Words ({len(deduplicated_index)} words):")
+    print(f"📚 Indexed Words ({taught_word_count} words):")
     print(f"{'=' * 60}")
     
-    if deduplicated_index:
+    if deduplicated_index is None:
+        mode = "Incremental" if args.incremental else "Streaming"
+        print(f"  ({mode} mode: {taught_word_count} words, see the index_bilibili_*.json shards)")
+    elif deduplicated_index:
         # Sort by word alphabetically
         sorted_words = sorted(deduplicated_index.items(), key=lambda x: x[0])
         
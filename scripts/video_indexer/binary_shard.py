@@ -0,0 +1,126 @@
+"""
+Compact binary encoding of an index shard ({lemma: [entries]}), decoded in
+the browser by src/utils/binaryShard.ts.
+
+JSON shards repeat "v"/"t"/"x"/"s" for every occurrence and spell
+timestamps out as decimal text. The binary layout (varints are unsigned
+LEB128, zigzag for signed deltas):
+
+    "SRB1"
+    varint string count, then per string: varint byte length + UTF-8
+        (video ids and inline "c" contexts, each stored once)
+    varint lemma count, then per lemma:
+        varint byte length + UTF-8 lemma
+        varint occurrence count, then per occurrence:
+            varint  video id (string index)
+            varint  zigzag(deciseconds - previous occurrence's deciseconds)
+            uint8   score (0 = no score)
+            varint  segment << 1 for an "x" [segment, offset] reference,
+                    followed by varint offset,
+                    or string index << 1 | 1 for an inline "c" context
+"""
+import struct
+
+MAGIC = b"SRB1"
+
+
+def _varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _bytes(out, text):
+    data = text.encode('utf-8')
+    _varint(out, len(data))
+    out += data
+
+
+def encode_shard(shard):
+    """Binary bytes of a {lemma: [entries]} shard (entries need "t" in seconds and "x" or "c")"""
+    strings = {}
+
+    def string_id(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    body = bytearray()
+    _varint(body, len(shard))
+    for lemma, entries in shard.items():
+        _bytes(body, lemma)
+        _varint(body, len(entries))
+        previous = 0
+        for occ in entries:
+            deciseconds = round(occ["t"] * 10)
+            _varint(body, string_id(str(occ["v"])))
+            _varint(body, _zigzag(deciseconds - previous))
+            previous = deciseconds
+            body.append(min(int(occ.get("s", 0)), 255))
+            if isinstance(occ.get("x"), list):
+                segment, offset = occ["x"]
+                _varint(body, segment << 1)
+                _varint(body, offset)
+            elif "c" in occ:
+                _varint(body, string_id(occ["c"]) << 1 | 1)
+            else:
+                raise ValueError(f"Entry of {lemma!r} has neither an 'x' reference nor a 'c' context")
+
+    head = bytearray(MAGIC)
+    _varint(head, len(strings))
+    for text in strings:
+        _bytes(head, text)
+    return bytes(head + body)
+
+
+def decode_shard(payload):
+    """Inverse of encode_shard (for checks; the frontend has its own decoder)"""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a binary index shard")
+    pos = 4
+
+    def varint():
+        nonlocal pos
+        result = shift = 0
+        while True:
+            byte = payload[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def text():
+        nonlocal pos
+        length = varint()
+        pos += length
+        return payload[pos - length:pos].decode('utf-8')
+
+    strings = [text() for _ in range(varint())]
+    shard = {}
+    for _ in range(varint()):
+        lemma = text()
+        entries = []
+        deciseconds = 0
+        for _ in range(varint()):
+            entry = {"v": strings[varint()]}
+            delta = varint()
+            deciseconds += (delta >> 1) ^ -(delta & 1)
+            entry["t"] = deciseconds / 10
+            (score,) = struct.unpack_from("B", payload, pos)
+            pos += 1
+            context = varint()
+            if context & 1:
+                entry["c"] = strings[context >> 1]
+            else:
+                entry["x"] = [context >> 1, varint()]
+            if score:
+                entry["s"] = score
+            entries.append(entry)
+        shard[lemma] = entries
+    return shard
@@ -0,0 +1,76 @@
+import math
+import base64
+
+# False-positive rate the filters are sized for
+DEFAULT_FP_RATE = 0.01
+
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+# Offset basis of the second hash (any value different from FNV_OFFSET)
+SECOND_OFFSET = 0x5BD1E995
+
+
+def _fnv1a(data, offset):
+    h = offset
+    for byte in data:
+        h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def bit_positions(text, m, k):
+    """
+    k bit positions of `text` by double hashing two 32-bit FNV-1a hashes of
+    its UTF-8 bytes; src/utils/bloomFilter.ts must compute the same ones.
+    """
+    data = text.encode('utf-8')
+    h1 = _fnv1a(data, FNV_OFFSET)
+    h2 = _fnv1a(data, SECOND_OFFSET) | 1
+    return [((h1 + i * h2) & 0xFFFFFFFF) % m for i in range(k)]
+
+
+class BloomFilter:
+    """
+    Membership filter for an index's lemmas, shipped in manifest.json so the
+    frontend can answer most lookups of unindexed words without fetching a
+    shard (no false negatives; about DEFAULT_FP_RATE false positives).
+    """
+    def __init__(self, m, k):
+        self.m = m
+        self.k = k
+        self.count = 0
+        self.bits = bytearray((m + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items, fp_rate=DEFAULT_FP_RATE, capacity=None):
+        """Filter holding `items`, sized for `capacity` items (default: just these)"""
+        items = list(items)
+        n = max(1, len(items), capacity or 0)
+        m = max(64, math.ceil(-n * math.log(fp_rate) / math.log(2) ** 2))
+        m = (m + 7) // 8 * 8
+        k = max(1, round(m / n * math.log(2)))
+        bloom = cls(m, k)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    @classmethod
+    def from_manifest(cls, data):
+        bloom = cls(data["m"], data["k"])
+        bloom.bits = bytearray(base64.b64decode(data["bits"]))
+        bloom.count = data["n"]
+        return bloom
+
+    def capacity(self, fp_rate=DEFAULT_FP_RATE):
+        """Items the filter holds at `fp_rate` (counting every add, duplicates included)"""
+        return int(self.m * math.log(2) ** 2 / -math.log(fp_rate))
+
+    def add(self, text):
+        for pos in bit_positions(text, self.m, self.k):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, text):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in bit_positions(text, self.m, self.k))
+
+    def to_manifest(self):
+        return {"m": self.m, "k": self.k, "n": self.count, "bits": base64.b64encode(bytes(self.bits)).decode('ascii')}
@@ -3,6 +3,8 @@ import json
 import glob
 import os
 
+from shard_publisher import load_merged_words
+
 def load_word_book(filepath):
     words = set()
     try:
@@ -39,8 +41,15 @@ def main():
     youtube_pattern = os.path.join(project_root, 'public', 'data', 'index_youtube_*.json')
     bilibili_pattern = os.path.join(project_root, 'public', 'data', 'index_bilibili_*.json')
     
-    yt_words = load_index_words(youtube_pattern)
-    bili_words = load_index_words(bilibili_pattern)
+    # One pass over the merged index when unified_indexer.py built one
+    merged = load_merged_words(os.path.join(project_root, 'public', 'data'))
+    if merged is not None:
+        print("Using the merged index (index_all)")
+        yt_words = merged.get('youtube', set())
+        bili_words = merged.get('bilibili', set())
+    else:
+        yt_words = load_index_words(youtube_pattern)
+        bili_words = load_index_words(bilibili_pattern)
     
     all_indexed = yt_words.union(bili_words)
     
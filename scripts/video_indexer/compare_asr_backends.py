@@ -0,0 +1,159 @@
+import os
+import re
+import math
+import json
+import time
+import argparse
+import statistics
+from difflib import SequenceMatcher
+
+from asr_backends import ASR_BACKENDS, create_engine
+from audio_stream import probe_duration
+from transcript import as_transcript
+
+# Only English words matter for the index, so alignment ignores everything else
+ENGLISH_WORD_RE = re.compile(r'[a-z]+(?:-[a-z]+)*')
+
+
+def english_tokens(words):
+    """Flatten a transcript into [(token, start)] for its English words"""
+    transcript = as_transcript(words)
+    tokens = []
+    for text, start in zip(transcript.words, transcript.starts):
+        for token in ENGLISH_WORD_RE.findall(text.lower()):
+            tokens.append((token, start))
+    return tokens
+
+
+def compare_to_reference(pairs):
+    """
+    Align the English words of each (reference, hypothesis) transcript pair
+    and measure start-time error. Files are aligned separately and pooled.
+
+    Returns:
+        dict with recall (share of reference words found) and start-time
+        error statistics over the aligned words
+    """
+    errors = []
+    ref_words = hyp_words = 0
+    for reference, hypothesis in pairs:
+        ref = english_tokens(reference)
+        hyp = english_tokens(hypothesis)
+        ref_words += len(ref)
+        hyp_words += len(hyp)
+
+        matcher = SequenceMatcher(None, [t for t, _ in ref], [t for t, _ in hyp], autojunk=False)
+        for block in matcher.get_matching_blocks():
+            for k in range(block.size):
+                errors.append(abs(hyp[block.b + k][1] - ref[block.a + k][1]))
+
+    stats = {
+        "ref_words": ref_words,
+        "hyp_words": hyp_words,
+        "matched": len(errors),
+        "recall": len(errors) / ref_words if ref_words else 0.0
+    }
+    if errors:
+        errors.sort()
+        stats.update({
+            "mean_err": statistics.fmean(errors),
+            "median_err": statistics.median(errors),
+            "p90_err": errors[math.ceil(len(errors) * 0.9) - 1],
+            "within_0_5s": sum(e <= 0.5 for e in errors) / len(errors),
+            "within_1s": sum(e <= 1.0 for e in errors) / len(errors)
+        })
+    return stats
+
+
+def run_backend(backend, model_size, media_paths):
+    """Transcribe every file with one backend, returns {path: (words, seconds)}"""
+    print(f"\n🤖 {backend} ({model_size})")
+    engine = create_engine(backend, model_size=model_size)
+    results = {}
+    for path in media_paths:
+        started = time.perf_counter()
+        words = engine.transcribe(path)
+        results[path] = (words, time.perf_counter() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare ASR backends on word-timestamp accuracy and speed',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # stable-whisper (true word timestamps) as reference
+  python compare_asr_backends.py clip1.wav clip2.wav --backends whisper faster-whisper
+
+  # Hand-checked reference transcript (transcription cache format)
+  python compare_asr_backends.py clip1.wav --reference-json clip1.wav.transcription.json
+        """
+    )
+    parser.add_argument('media', nargs='+', help='Audio/video files to transcribe')
+    parser.add_argument('--backends', nargs='+', choices=sorted(ASR_BACKENDS),
+                        default=['whisper', 'faster-whisper'], help='Backends to evaluate')
+    parser.add_argument('--reference', choices=sorted(ASR_BACKENDS), default='stable-whisper',
+                        help='Backend used as ground truth (default: stable-whisper)')
+    parser.add_argument('--reference-json', nargs='+', metavar='FILE',
+                        help='Reference transcripts ({"words": [...]}), one per media file, instead of --reference')
+    parser.add_argument('--model', default='medium', help='Model size for all backends (default: medium)')
+    parser.add_argument('--output', metavar='FILE', help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    if args.reference_json and len(args.reference_json) != len(args.media):
+        parser.error("--reference-json needs exactly one file per media file")
+
+    # 1. Reference transcripts
+    if args.reference_json:
+        references = {}
+        for path, ref_path in zip(args.media, args.reference_json):
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                references[path] = json.load(f)['words']
+    else:
+        references = {p: words for p, (words, _) in run_backend(args.reference, args.model, args.media).items()}
+
+    durations = {p: probe_duration(p) for p in args.media}
+
+    # 2. Candidates
+    report = {}
+    for backend in args.backends:
+        results = run_backend(backend, args.model, args.media)
+        total_time = sum(seconds for _, seconds in results.values())
+        total_audio = sum(d for d in durations.values() if d)
+
+        per_file = {}
+        for path, (words, seconds) in results.items():
+            per_file[os.path.basename(path)] = compare_to_reference([(references[path], words)])
+            per_file[os.path.basename(path)]["seconds"] = seconds
+
+        combined = compare_to_reference([(references[p], words) for p, (words, _) in results.items()])
+        combined["seconds"] = total_time
+        combined["rtf"] = total_time / total_audio if total_audio else None
+        report[backend] = {"overall": combined, "files": per_file}
+
+    # 3. Report
+    print("\n" + "=" * 78)
+    print(f"Word timestamp accuracy vs {'reference JSON' if args.reference_json else args.reference}")
+    print("=" * 78)
+    print(f"{'Backend':<16} {'Recall':>7} {'Mean':>7} {'Median':>7} {'P90':>7} {'≤0.5s':>7} {'≤1s':>7} {'RTF':>7}")
+    print("-" * 78)
+    for backend, data in report.items():
+        o = data["overall"]
+        if "mean_err" not in o:
+            print(f"{backend:<16} {o['recall']:>7.1%}   (no aligned words)")
+            continue
+        rtf = f"{o['rtf']:.2f}" if o["rtf"] is not None else "n/a"
+        print(f"{backend:<16} {o['recall']:>7.1%} {o['mean_err']:>6.2f}s {o['median_err']:>6.2f}s "
+              f"{o['p90_err']:>6.2f}s {o['within_0_5s']:>7.1%} {o['within_1s']:>7.1%} {rtf:>7}")
+    print("=" * 78)
+    print("RTF = processing time / audio duration (lower is faster)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+
+from shard_publisher import dumps_compact, load_manifest
+
+# Words on each side of an occurrence shown as its context
+CONTEXT_WINDOW = 5
+
+# Intro patterns that strongly suggest a word is being taught
+INTRO_PATTERNS = [
+    "这个单词", "单词叫做", "单词是", "意思是", "叫", "翻译成", "什么意思",
+    "怎么来记", "看这个词", "读一下", "再读一遍", "什么鬼", "怎么讲"
+]
+
+# Compiled once: one scan per pattern set instead of one `in` per pattern
+INTRO_RE = re.compile("|".join(re.escape(p) for p in INTRO_PATTERNS))
+CJK_RE = re.compile('[\u4e00-\u9fff]')
+
+# Context flags used by smart_filter_taught_words, kept on entries as "_f"
+FLAG_INTRO = 1
+FLAG_CJK = 2
+
+
+def context_flags(text):
+    """Scoring flags of a context string (or of a single word)"""
+    flags = 0
+    if INTRO_RE.search(text):
+        flags |= FLAG_INTRO
+    if CJK_RE.search(text):
+        flags |= FLAG_CJK
+    return flags
+
+
+def build_segments(words, indices, window=CONTEXT_WINDOW):
+    """
+    Merge the context windows around `indices` (sorted word positions) into
+    contiguous segments, so overlapping windows share their words.
+
+    Returns:
+        (segments, refs): segment strings (words joined by single spaces) and
+        a {word index: [segment id, offset of the word in the segment]} map
+    """
+    spans = []
+    refs = {}
+    for i in indices:
+        start, end = max(0, i - window), min(len(words), i + window + 1)
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+        refs[i] = [len(spans) - 1, i - spans[-1][0]]
+    return [" ".join(words[a:b]) for a, b in spans], refs
+
+
+def resolve_context(table, ref):
+    """Context string of a [segment id, offset] reference into a loaded table"""
+    segment_id, offset = ref
+    tokens = table["s"][segment_id].split(" ")
+    window = table["w"]
+    return " ".join(tokens[max(0, offset - window):offset + window + 1])
+
+
+class VideoContexts:
+    """
+    Per-video context tables for one platform's index.
+
+    Index entries no longer carry a copy of their context ("c"); while
+    indexing they hold the word position ("x": int) and at save time each
+    video's kept occurrences are turned into a segment table, with "x"
+    rewritten to [segment id, offset]. The frontend rebuilds the context
+    string from it.
+
+    Tables are published together with the shards that reference them:
+    publish() stages them on the ShardPublisher, whose commit writes them
+    as content-hashed contexts/context_<platform>_<video id>.<hash>.json
+    files listed in manifest.json, so a table never changes under a
+    manifest that points to it. In streaming mode (stream_to()) each table
+    is staged as soon as it is built and not kept in memory.
+    """
+    def __init__(self, output_dir, platform, window=CONTEXT_WINDOW):
+        self.output_dir = output_dir
+        self.platform = platform
+        self.window = window
+        self._words = {}
+        self._tables = {}
+        self._published = None
+        # Tables built since the last publish(), and the videos save() keeps
+        self._pending = {}
+        self._keep = None
+        self._publisher = None
+        # {video id: {word index: [segment id, offset]}} of the last save()
+        self.refs = {}
+
+    def add(self, video_id, words):
+        """Remember a transcript's word list (e.g. Transcript.words) for `video_id`"""
+        self._words[str(video_id)] = words
+
+    def load_table(self, video_id):
+        """Table of `video_id`: built in this run, else the published one, else None"""
+        video_id = str(video_id)
+        if video_id not in self._tables:
+            if self._published is None:
+                self._published = load_manifest(self.output_dir).get("contexts", {}).get(self.platform, {})
+            table = None
+            if video_id in self._published:
+                try:
+                    with open(os.path.join(self.output_dir, self._published[video_id]), 'r', encoding='utf-8') as f:
+                        table = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            self._tables[video_id] = table
+        return self._tables[video_id]
+
+    def stream_to(self, publisher):
+        """Stage every table put() from now on on `publisher` right away"""
+        self._publisher = publisher
+
+    def put(self, video_id, table):
+        """Queue `table` ({"w": window, "s": segments}) as the video's new table"""
+        video_id = str(video_id)
+        if self._publisher is not None:
+            self._publisher.stage_context(self.platform, video_id, table)
+            self._tables.pop(video_id, None)
+        else:
+            self._tables[video_id] = self._pending[video_id] = table
+
+    def restore_flags(self, entries):
+        """
+        Give entries loaded from existing shards their scoring flags.
+        Entries with a [segment, offset] reference are resolved through the
+        video's table; legacy entries still carry their "c" string.
+        """
+        for occ in entries:
+            if "_f" in occ or "c" in occ:
+                continue
+            table = self.load_table(occ["v"]) if isinstance(occ.get("x"), list) else None
+            occ["_f"] = context_flags(resolve_context(table, occ["x"])) if table else 0
+
+    def words(self, video_id):
+        """Word list registered with add(), or None"""
+        return self._words.get(str(video_id))
+
+    def write_video(self, video_id, words, entries):
+        """
+        Streaming variant of save() for one video: build its table right
+        away from all of its entries (the kept ones are not known yet) and
+        rewrite their "x" positions, so the words need not be kept around.
+        With stream_to(), the table is not kept either.
+        """
+        segments, refs = build_segments(words, sorted({occ["x"] for occ in entries}), self.window)
+        for occ in entries:
+            occ["x"] = refs[occ["x"]]
+        self.put(video_id, {"w": self.window, "s": segments})
+
+    def save(self, index, keep_videos=None):
+        """
+        Build one table per video indexed in this run and rewrite the "x"
+        positions of `index` ({lemma: [entries]}) in place.
+        Tables of videos not in `keep_videos` are unpublished.
+
+        Returns:
+            (tables built, total table bytes)
+        """
+        by_video = {}
+        for entries in index.values():
+            for occ in entries:
+                if isinstance(occ.get("x"), int):
+                    by_video.setdefault(str(occ["v"]), []).append(occ)
+
+        for video_id, occs in by_video.items():
+            words = self._words[video_id]
+            segments, refs = build_segments(words, sorted({occ["x"] for occ in occs}), self.window)
+            for occ in occs:
+                occ["x"] = refs[occ["x"]]
+            self.refs[video_id] = refs
+            self.put(video_id, {"w": self.window, "s": segments})
+
+        if keep_videos is not None:
+            self._keep = {str(v) for v in keep_videos}
+        return len(by_video), sum(len(dumps_compact(self._pending[v])) for v in by_video)
+
+    def publish(self, publisher):
+        """Stage the pending tables (and the videos to keep) on a ShardPublisher"""
+        for video_id, table in self._pending.items():
+            publisher.stage_context(self.platform, video_id, table)
+        if self._keep is not None:
+            publisher.keep_contexts(self.platform, self._keep)
+        self._pending = {}
+        self._keep = None
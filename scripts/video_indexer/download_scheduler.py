@@ -0,0 +1,380 @@
+"""
+Concurrent Bilibili downloader.
+
+Replaces the one-BVID-at-a-time download loop: every part ("P<n>") of every
+BVID becomes its own you-get job, and an asyncio scheduler runs the jobs as
+subprocesses (asyncio.create_subprocess_exec) with
+
+    - a concurrency limit (--download-workers)
+    - a per-host rate limit on job starts, so 50 BVIDs don't hit
+      bilibili.com with 50 requests in the same second
+    - exponential backoff with full jitter between attempts
+    - longest part first (durations from the page list), so one long
+      lesson doesn't start last and hold up the whole batch
+    - a persistent ledger (download_ledger.json in the download directory):
+      a part that finished once is never fetched again while its files exist
+
+Each job downloads into its own directory under .parts/ and only moves the
+finished files into the download directory, so a file there is always
+complete (the pipeline mode can hand it on as soon as it appears) and an
+interrupted job resumes from where you-get stopped.
+
+With audio_only, parts are fetched with yt-dlp instead and only Bilibili's
+DASH audio track is downloaded (an .m4a of ~1/10 the video's size, no
+video stream and no remux). The files keep you-get's naming, so
+extract_page_number works on them unchanged.
+
+Usage:
+    from download_scheduler import download_bvids
+    results = download_bvids(["BV1...", "BV2..."], TEMP_DIR, workers=4)
+"""
+import os
+import re
+import json
+import time
+import shutil
+import random
+import asyncio
+import threading
+import urllib.request
+from urllib.parse import urlparse
+
+DEFAULT_WORKERS = 4
+# Minimum seconds between two job starts against the same host
+DEFAULT_HOST_INTERVAL = 1.0
+DEFAULT_RETRIES = 3
+# Backoff before attempt n is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2^(n-2))]
+BACKOFF_BASE = 5.0
+BACKOFF_CAP = 120.0
+JOB_TIMEOUT = 1800  # 30 minutes per part
+PROBE_TIMEOUT = 30
+
+LEDGER_FILENAME = "download_ledger.json"
+PARTS_DIRNAME = ".parts"
+VIEW_API = "https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
+VIDEO_URL = "https://www.bilibili.com/video/{bvid}"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+# Audio-only mode: the DASH audio track (m4a), else the smallest stream
+AUDIO_FORMAT = "ba[ext=m4a]/ba/worst"
+# Files you-get / yt-dlp leave behind while a download is unfinished
+UNFINISHED_RE = re.compile(r'(\[\d+\]\.\w+|\.download|\.part|\.ytdl)$')
+
+
+class DownloadLedger:
+    """
+    Persistent record of finished parts:
+        {bvid: {"title": str, "parts": {page: {"files": [...], "bytes": int}}}}
+    Written atomically after every finished part, so an interrupted batch
+    keeps everything it already has.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable download ledger {path}: {e}")
+
+    def done_files(self, bvid, page, directory):
+        """Files of a finished part, or None if it still needs downloading"""
+        part = self.data.get(bvid, {}).get("parts", {}).get(str(page))
+        if not part or not part["files"]:
+            return None
+        if not all(os.path.exists(os.path.join(directory, f)) for f in part["files"]):
+            return None  # Deleted since, so it has to be fetched again
+        return part["files"]
+
+    def record(self, bvid, title, page, files, size):
+        entry = self.data.setdefault(bvid, {"title": title, "parts": {}})
+        entry["title"] = title
+        entry["parts"][str(page)] = {"files": files, "bytes": size, "finished_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class HostRateLimiter:
+    """
+    Spaces out job starts against the same host by at least `interval`
+    seconds, for asyncio tasks (wait) and worker threads (wait_sync) alike
+    """
+    def __init__(self, interval=DEFAULT_HOST_INTERVAL):
+        self.interval = interval
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url):
+        """Book the next start slot of `url`'s host; seconds until it begins"""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        return start - now
+
+    async def wait(self, url):
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait_sync(self, url):
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff before `attempt` (2, 3, ...)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 2)))
+
+
+def legitimize(text):
+    """The filename you-get derives from a title (POSIX rules)"""
+    text = text.translate({0: None, ord('/'): '-', ord('|'): '-'})
+    return text.lstrip('.')[:80]
+
+
+def fetch_video_info(bvid):
+    """
+    Title and page list of a BVID from the view API:
+        {"title": str, "pages": [{"page": n, "part": str, "duration": seconds}]}
+    """
+    request = urllib.request.Request(VIEW_API.format(bvid=bvid), headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=PROBE_TIMEOUT) as response:
+        payload = json.load(response)
+    if payload.get("code") != 0:
+        raise ValueError(payload.get("message", f"view API code {payload.get('code')}"))
+    data = payload["data"]
+    return {"title": data["title"], "pages": data.get("pages") or [{"page": 1, "part": data["title"], "duration": 0}]}
+
+
+class PartJob:
+    """
+    One download: a single page of a BVID, or (page None) the whole
+    playlist. Pages are fetched audio-only with yt-dlp if `audio_only`.
+    """
+    def __init__(self, bvid, title, page=None, part=None, duration=0, multi_page=False, audio_only=False):
+        self.bvid = bvid
+        self.title = title
+        self.page = page
+        self.part = part
+        self.duration = duration
+        self.multi_page = multi_page
+        self.audio_only = audio_only and page is not None
+
+    @property
+    def key(self):
+        return "all" if self.page is None else self.page
+
+    @property
+    def label(self):
+        return self.bvid if self.page is None else f"{self.bvid} P{self.page}"
+
+    @property
+    def url(self):
+        url = VIDEO_URL.format(bvid=self.bvid)
+        return url if self.page is None or not self.multi_page else f"{url}?p={self.page}"
+
+    @property
+    def stem(self):
+        """Filename without extension, as you-get names pages: "<title> (P<n>. <part>)" """
+        return legitimize(f"{self.title} (P{self.page}. {self.part})" if self.multi_page else self.title)
+
+    @property
+    def success_codes(self):
+        # you-get returns 1 when files already exist
+        return (0,) if self.audio_only else (0, 1)
+
+    def command(self, output_dir):
+        if self.page is None:
+            return ['you-get', '--playlist', '-o', output_dir, self.url]
+        if self.audio_only:
+            template = os.path.join(output_dir, self.stem.replace('%', '%%') + ".%(ext)s")
+            return ['yt-dlp', '-f', AUDIO_FORMAT, '--no-playlist', '--no-progress', '-o', template, self.url]
+        return ['you-get', '-o', output_dir, self.url]
+
+    def existing_files(self, directory):
+        """
+        Files of this part already in `directory` from before the ledger,
+        audio or video
+        """
+        if self.page is None:
+            return []
+        stem = self.stem
+        return [f for f in os.listdir(directory)
+                if os.path.splitext(f)[0] == stem and not UNFINISHED_RE.search(f)]
+
+
+class DownloadScheduler:
+    """
+    Runs PartJobs as you-get subprocesses, at most `workers` at a time.
+
+    Args:
+        output_dir: Where finished files end up (the indexer's TEMP_DIR)
+        workers: Concurrent you-get processes
+        host_interval: Minimum seconds between job starts per host
+        max_retries: Attempts per part
+        on_file: Optional callback(path), called from the event loop thread
+            as soon as a finished file is moved into output_dir
+        audio_only: Fetch only the audio track of each page (needs yt-dlp)
+    """
+    def __init__(self, output_dir, workers=DEFAULT_WORKERS, host_interval=DEFAULT_HOST_INTERVAL,
+                 max_retries=DEFAULT_RETRIES, on_file=None, audio_only=False):
+        if audio_only and shutil.which('yt-dlp') is None:
+            print("⚠️  yt-dlp not found (pip install yt-dlp), downloading full videos with you-get instead")
+            audio_only = False
+        self.audio_only = audio_only
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.on_file = on_file
+        self.limiter = HostRateLimiter(host_interval)
+        self.ledger = DownloadLedger(os.path.join(output_dir, LEDGER_FILENAME))
+        self.parts_dir = os.path.join(output_dir, PARTS_DIRNAME)
+        self.downloaded_bytes = 0
+
+    def run(self, bvids):
+        """Download every BVID; returns [{"bvid", "success", "error", "title"}] in input order"""
+        os.makedirs(self.parts_dir, exist_ok=True)
+        return asyncio.run(self._run(bvids))
+
+    async def _run(self, bvids):
+        started = time.monotonic()
+        infos = await asyncio.gather(*(self._probe(bvid) for bvid in bvids))
+
+        jobs = []
+        for bvid, info in zip(bvids, infos):
+            if info is None:
+                # No page list: one --playlist job, as before (full video)
+                jobs.append(PartJob(bvid, "Unknown Title"))
+                continue
+            pages = info["pages"]
+            for p in pages:
+                jobs.append(PartJob(bvid, info["title"], p["page"], p.get("part", ""),
+                                    p.get("duration", 0), multi_page=len(pages) > 1,
+                                    audio_only=self.audio_only))
+
+        pending = []
+        skipped = 0
+        for job in jobs:
+            if self._already_done(job):
+                skipped += 1
+            else:
+                pending.append(job)
+        if skipped:
+            print(f"  ⏭️  {skipped} parts already downloaded (ledger), {len(pending)} to fetch")
+        # Longest first: the batch ends when its slowest job does
+        pending.sort(key=lambda job: -job.duration)
+
+        semaphore = asyncio.Semaphore(self.workers)
+        total = len(pending)
+        finished = [0]
+
+        async def run_job(job):
+            async with semaphore:
+                error = await self._download(job)
+            finished[0] += 1
+            mark = "✅" if error is None else "❌"
+            print(f"  {mark} [{finished[0]}/{total}] {job.label}" + (f": {error}" if error else ""))
+            return job, error
+
+        outcomes = await asyncio.gather(*(run_job(job) for job in pending))
+
+        errors = {}
+        for job, error in outcomes:
+            if error is not None:
+                errors.setdefault(job.bvid, []).append(f"{'' if job.page is None else f'P{job.page}: '}{error}")
+        titles = {job.bvid: job.title for job in jobs}
+        elapsed = time.monotonic() - started
+        if total:
+            rate = self.downloaded_bytes / max(elapsed, 1e-6) / 1024 / 1024
+            print(f"  📦 {self.downloaded_bytes / 1024 / 1024:.1f} MB in {elapsed:.0f}s ({rate:.1f} MB/s, "
+                  f"{self.workers} workers)")
+        return [{
+            "bvid": bvid,
+            "success": bvid not in errors,
+            "error": "; ".join(errors[bvid]) if bvid in errors else None,
+            "title": titles.get(bvid, "Unknown Title")
+        } for bvid in bvids]
+
+    async def _probe(self, bvid):
+        await self.limiter.wait(VIEW_API.format(bvid=bvid))
+        try:
+            info = await asyncio.to_thread(fetch_video_info, bvid)
+            print(f"  📺 {bvid}: {info['title']} ({len(info['pages'])} parts)")
+            return info
+        except Exception as e:
+            print(f"  ⚠️  Could not get the page list of {bvid} ({e}), downloading it as one playlist")
+            return None
+
+    def _already_done(self, job):
+        if self.ledger.done_files(job.bvid, job.key, self.output_dir):
+            return True
+        files = job.existing_files(self.output_dir)
+        if files:
+            # Downloaded before the ledger existed
+            size = sum(os.path.getsize(os.path.join(self.output_dir, f)) for f in files)
+            self.ledger.record(job.bvid, job.title, job.key, files, size)
+            return True
+        return False
+
+    async def _download(self, job):
+        """Run one job with retries; returns None on success or the last error"""
+        job_dir = os.path.join(self.parts_dir, f"{job.bvid}_{job.key}")
+        os.makedirs(job_dir, exist_ok=True)
+        error = None
+        for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                delay = backoff_delay(attempt)
+                print(f"  🔄 {job.label}: {error}, retry {attempt}/{self.max_retries} in {delay:.0f}s")
+                await asyncio.sleep(delay)
+            await self.limiter.wait(job.url)
+            error = await self._attempt(job, job_dir)
+            if error is None:
+                return None
+        return error
+
+    async def _attempt(self, job, job_dir):
+        process = await asyncio.create_subprocess_exec(
+            *job.command(job_dir),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return f"Download timeout (>{JOB_TIMEOUT // 60} minutes)"
+        if process.returncode not in job.success_codes:
+            lines = stderr.decode('utf-8', errors='replace').strip().splitlines()
+            return f"{job.command(job_dir)[0]} exited with code {process.returncode}" + (f" ({lines[-1]})" if lines else "")
+
+        files = sorted(f for f in os.listdir(job_dir) if not UNFINISHED_RE.search(f))
+        if not files:
+            return f"{job.command(job_dir)[0]} produced no file"
+        size = 0
+        for f in files:
+            path = os.path.join(self.output_dir, f)
+            size += os.path.getsize(os.path.join(job_dir, f))
+            shutil.move(os.path.join(job_dir, f), path)
+            if self.on_file is not None:
+                self.on_file(path)
+        shutil.rmtree(job_dir, ignore_errors=True)
+        self.downloaded_bytes += size
+        self.ledger.record(job.bvid, job.title, job.key, files, size)
+        return None
+
+
+def download_bvids(bvids, output_dir, workers=DEFAULT_WORKERS, host_interval=DEFAULT_HOST_INTERVAL,
+                   max_retries=DEFAULT_RETRIES, on_file=None, audio_only=False):
+    """Download the parts of all `bvids` concurrently (see DownloadScheduler)"""
+    scheduler = DownloadScheduler(output_dir, workers=workers, host_interval=host_interval,
+                                  max_retries=max_retries, on_file=on_file, audio_only=audio_only)
+    return scheduler.run(bvids)
@@ -2,6 +2,7 @@ import whisper
 import tempfile
 import os
 import subprocess
+from transcript import Transcript
 
 class ASREngine:
     def __init__(self, model_size="base"):
@@ -11,16 +12,25 @@ class ASREngine:
     def transcribe(self, video_path):
         """
         Transcribes video using official Whisper.
-        Returns list of word segments (simplified from sentence segments).
+        Returns a Transcript of word segments (simplified from sentence segments).
         
         CRITICAL: Original video file is NEVER modified.
         """
         print(f"Transcribing {video_path}...")
-        
+        return self._transcribe(video_path)
+
+    def transcribe_audio(self, audio, offset=0.0):
+        """
+        Transcribes an in-memory 16kHz mono float32 array (e.g. one VAD region).
+        `offset` (seconds) shifts all timestamps back onto the original timeline.
+        """
+        return self._transcribe(audio, offset=offset)
+
+    def _transcribe(self, audio, offset=0.0):
         try:
             # Use official Whisper - MUCH faster
             result = self.model.transcribe(
-                video_path,  # Can process audio directly
+                audio,  # Can process audio directly
                 # language="en", # REMOVED: Allow auto-detection (or mixed)
                 verbose=False,
                 word_timestamps=False,  # Faster without word-level
@@ -29,11 +39,9 @@ class ASREngine:
             
             # Convert sentence segments to pseudo-word segments
             # This is a compromise: we get word positions but not as precise
-            words = []
+            words = Transcript()
             for segment in result['segments']:
                 text = segment['text'].strip()
-                start_time = segment['start']
-                end_time = segment['end']
                 
                 # Split sentence into words
                 word_list = text.split()
@@ -43,19 +51,17 @@ class ASREngine:
                 # STRATEGY: Use segment start time for ALL words
                 # This ensures we jump to the beginning of the sentence/phrase,
                 # which provides better context than jumping to the exact word.
-                segment_start = segment['start']
-                segment_end = segment['end']
+                segment_start = segment['start'] + offset
+                segment_end = segment['end'] + offset
                 
                 for word in word_list:
-                    words.append({
-                        'word': word.strip(),
-                        'start': round(segment_start, 2), # Jump to sentence start
-                        'end': round(segment_end, 2)
-                    })
+                    # Jump to sentence start
+                    words.append(word.strip(), round(segment_start, 2), round(segment_end, 2))
             
             print(f"  Extracted {len(words)} words from {len(result['segments'])} segments")
             return words
             
         except Exception as e:
+            # Re-raised: an empty result would be cached as this file's transcript
             print(f"Error transcribing: {e}")
-            return []
+            raise
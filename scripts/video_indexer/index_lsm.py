@@ -0,0 +1,294 @@
+import os
+import json
+import glob
+import time
+import shutil
+import argparse
+from urllib.parse import quote
+
+from indexer_shared import smart_filter_taught_words, deduplicate_occurrences
+from context_table import CONTEXT_WINDOW, build_segments, VideoContexts
+from shard_publisher import publish_shards, load_manifest, dumps_compact
+from shard_planner import DEFAULT_TARGET_BYTES, REPLAN_FACTOR, plan_index, route
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "public", "data")
+# Indexer-side state, never served to the frontend
+STATE_ROOT = os.path.join(SCRIPT_DIR, "index_state")
+
+STATE_VERSION = 1
+
+
+def _shard_key(lemma):
+    return lemma[0] if lemma and lemma[0].isalpha() else "others"
+
+
+def _write_json(path, data, **kwargs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class IndexState:
+    """
+    LSM-style state behind one platform's published index.
+
+    The published shards only hold filtered, deduplicated entries, which is
+    not enough to rescore a word. This keeps the raw (pre-filter) entries of
+    every lemma in its own base file, and each newly indexed video adds a
+    small delta segment. compact() folds the deltas into the base files,
+    rescores only the lemmas they touched and rewrites only the shards and
+    context tables those lemmas live in, so adding a video costs time
+    proportional to that video's words (and their occurrence lists), not to
+    the corpus.
+
+    Layout (under index_state/<platform>/):
+        meta.json                 version, pinned legacy lemmas
+        base/<c>/<lemma>.json     raw entries {"v", "t", "x": word index or ref, "_f"}
+        deltas/<seq>.json         {"video": id, "entries": {lemma: [raw entries]}}
+        words/<video>.json        transcript words (to add context segments later)
+        refs/<video>.json         {word index: [segment, offset]} already in the context table
+    """
+    def __init__(self, platform, output_dir=OUTPUT_DIR, root=STATE_ROOT, window=CONTEXT_WINDOW):
+        self.platform = platform
+        self.output_dir = output_dir
+        self.root = os.path.join(root, platform)
+        self.window = window
+        self.contexts = VideoContexts(output_dir, platform, window)
+        self.meta = _read_json(os.path.join(self.root, "meta.json"), {})
+
+    def exists(self):
+        return self.meta.get("version") == STATE_VERSION
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.meta = {}
+
+    def _save_meta(self):
+        _write_json(os.path.join(self.root, "meta.json"), self.meta, indent=2)
+
+    # --- per-lemma base files -------------------------------------------
+
+    def _base_path(self, lemma):
+        name = quote(lemma, safe='')
+        return os.path.join(self.root, "base", name[:1] or "_", f"{name}.json")
+
+    def load_base(self, lemma):
+        return _read_json(self._base_path(lemma), [])
+
+    def save_base(self, lemma, entries):
+        _write_json(self._base_path(lemma), entries, separators=(',', ':'))
+
+    # --- per-video words and context references --------------------------
+
+    def save_words(self, video_id, words):
+        _write_json(os.path.join(self.root, "words", f"{video_id}.json"), list(words), separators=(',', ':'))
+
+    def _load_words(self, video_id):
+        return _read_json(os.path.join(self.root, "words", f"{video_id}.json"))
+
+    def _refs_path(self, video_id):
+        return os.path.join(self.root, "refs", f"{video_id}.json")
+
+    # --- building the state ----------------------------------------------
+
+    def reset(self, raw_index, contexts):
+        """
+        Replace the state after a full (non-incremental) run.
+
+        Args:
+            raw_index: {lemma: [entries]} snapshot taken before filtering
+                (entries still carry "_f" and integer "x")
+            contexts: The run's VideoContexts, after save()
+        """
+        self.clear()
+        for lemma, entries in raw_index.items():
+            self.save_base(lemma, entries)
+        for video_id in {str(e["v"]) for entries in raw_index.values() for e in entries}:
+            words = contexts.words(video_id)
+            if words is not None:
+                self.save_words(video_id, words)
+            refs = contexts.refs.get(video_id, {})
+            _write_json(self._refs_path(video_id), {str(x): ref for x, ref in refs.items()},
+                        separators=(',', ':'))
+        self.meta = {"version": STATE_VERSION, "pinned": []}
+        self._save_meta()
+
+    def seed_from_shards(self):
+        """
+        Bootstrap from published shards when no state exists yet.
+        Only the filtered, deduplicated entries survive there, so those
+        lemmas are pinned (kept regardless of score, like the old
+        --incremental whitelist) until the next full run rebuilds the state.
+        """
+        self.clear()
+        pinned = []
+        for shard_path in sorted(glob.glob(os.path.join(self.output_dir, f"index_{self.platform}_*.json"))):
+            shard = _read_json(shard_path, {})
+            for lemma, entries in shard.items():
+                self.contexts.restore_flags(entries)
+                for entry in entries:
+                    entry.pop("s", None)
+                self.save_base(lemma, entries)
+                pinned.append(lemma)
+        self.meta = {"version": STATE_VERSION, "pinned": sorted(pinned)}
+        self._save_meta()
+        print(f"  🌱 Seeded index state from published shards ({len(pinned)} pinned words)")
+
+    def add_delta(self, video_id, words, pairs):
+        """Record one newly indexed video: its (lemma, raw entry) pairs and words"""
+        self.save_words(video_id, words)
+        entries = {}
+        for lemma, entry in pairs:
+            entries.setdefault(lemma, []).append(entry)
+        _write_json(os.path.join(self.root, "deltas", f"{time.time_ns():020d}_{video_id}.json"),
+                    {"video": str(video_id), "entries": entries}, separators=(',', ':'))
+
+    def pending_deltas(self):
+        return sorted(glob.glob(os.path.join(self.root, "deltas", "*.json")))
+
+    # --- compaction --------------------------------------------------------
+
+    def _publish_refs(self, kept):
+        """
+        Turn integer "x" positions of kept entries into [segment, offset]
+        references, appending segments to a video's context table for
+        positions it does not cover yet (existing references stay valid).
+        """
+        by_video = {}
+        for entries in kept.values():
+            for occ in entries:
+                if isinstance(occ.get("x"), int):
+                    by_video.setdefault(str(occ["v"]), []).append(occ)
+
+        for video_id, occs in by_video.items():
+            refs = {int(x): ref for x, ref in _read_json(self._refs_path(video_id), {}).items()}
+            missing = sorted({occ["x"] for occ in occs} - refs.keys())
+            if missing:
+                # A new table version (published with the shards); the current one stays untouched
+                table = self.contexts.load_table(video_id) or {"w": self.window, "s": []}
+                table = {"w": table["w"], "s": list(table["s"])}
+                segments, new_refs = build_segments(self._load_words(video_id), missing, table["w"])
+                first = len(table["s"])
+                table["s"].extend(segments)
+                for x, (segment, offset) in new_refs.items():
+                    refs[x] = [first + segment, offset]
+                self.contexts.put(video_id, table)
+                _write_json(self._refs_path(video_id), {str(x): ref for x, ref in refs.items()},
+                            separators=(',', ':'))
+            for occ in occs:
+                occ["x"] = refs[occ["x"]]
+
+    def compact(self, time_window=120, min_score=10, dedup_threshold=60):
+        """
+        Merge pending deltas into the base and republish the touched words.
+
+        Returns:
+            dict with touched / kept / dropped word counts, the change in
+            published occurrences, the number of deltas merged and whether
+            the shards were re-planned
+        """
+        deltas = self.pending_deltas()
+        stats = {"deltas": len(deltas), "touched": 0, "kept": 0, "dropped": 0, "occurrence_delta": 0,
+                 "replanned": False}
+        if not deltas:
+            return stats
+
+        # 1. Fold deltas into the touched lemmas' base lists. A video's old
+        #    entries are replaced, so re-applying a delta is harmless.
+        base = {}
+        for delta_path in deltas:
+            delta = _read_json(delta_path)
+            video_id = delta["video"]
+            for lemma, entries in delta["entries"].items():
+                if lemma not in base:
+                    base[lemma] = self.load_base(lemma)
+                base[lemma] = [e for e in base[lemma] if str(e["v"]) != video_id] + entries
+
+        # 2. Rescore only those lemmas (copies: the base keeps "_f")
+        pinned = set(self.meta.get("pinned", []))
+        candidates = {lemma: [dict(e) for e in entries] for lemma, entries in base.items()}
+        taught = smart_filter_taught_words(candidates, time_window=time_window, min_score=min_score,
+                                           whitelist=pinned & candidates.keys())
+        kept = {lemma: deduplicate_occurrences(entries, dedup_threshold) for lemma, entries in taught.items()}
+        self._publish_refs(kept)
+
+        # 3. Republish only the shards holding touched lemmas
+        prefix = f"index_{self.platform}"
+        current = load_manifest(self.output_dir).get("indexes", {}).get(prefix, {})
+        routing = current.get("routing")
+        target_bytes = current.get("target_bytes") or DEFAULT_TARGET_BYTES
+        binary = current.get("binary", False)
+        by_shard = {}
+        for lemma in base:
+            # Without a routing table the shards are still first-letter ones (re-planned below)
+            key = route(routing, lemma) if routing else _shard_key(lemma)
+            by_shard.setdefault(key, []).append(lemma)
+        updated = {}
+        for key, lemmas in by_shard.items():
+            shard_path = os.path.join(self.output_dir, f"{prefix}_{key}.json")
+            shard = _read_json(shard_path, {})
+            for lemma in lemmas:
+                stats["occurrence_delta"] -= len(shard.get(lemma, []))
+                if lemma in kept:
+                    shard[lemma] = kept[lemma]
+                    stats["occurrence_delta"] += len(kept[lemma])
+                    stats["kept"] += 1
+                elif shard.pop(lemma, None) is not None:
+                    stats["dropped"] += 1
+            updated[key] = shard
+        if routing and all(len(dumps_compact(shard)) <= REPLAN_FACTOR * target_bytes for shard in updated.values()):
+            publish_shards(self.output_dir, prefix, updated, replace=False, binary=binary, contexts=self.contexts)
+        else:
+            # The index outgrew its plan: re-plan every shard into balanced prefix ranges
+            index = {}
+            for shard_path in glob.glob(os.path.join(self.output_dir, f"{prefix}_*.json")):
+                key = os.path.basename(shard_path)[len(prefix) + 1:-len(".json")]
+                if key not in updated and "_" not in key:
+                    index.update(_read_json(shard_path, {}))
+            for shard in updated.values():
+                index.update(shard)
+            shards, routing = plan_index(index, target_bytes)
+            publish_shards(self.output_dir, prefix, shards, routing=routing, target_bytes=target_bytes,
+                           binary=binary, contexts=self.contexts)
+            stats["replanned"] = True
+
+        # 4. Persist the base, then retire the deltas
+        for lemma, entries in base.items():
+            self.save_base(lemma, entries)
+        for delta_path in deltas:
+            os.remove(delta_path)
+        stats["touched"] = len(base)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact pending incremental index deltas')
+    parser.add_argument('--platform', choices=['bilibili', 'youtube'], required=True)
+    parser.add_argument('--min-score', type=int, default=None,
+                        help='Minimum word score (default: 15 for bilibili, 5 for youtube, as in the indexers)')
+    args = parser.parse_args()
+
+    state = IndexState(args.platform)
+    if not state.exists():
+        print(f"❌ No index state for {args.platform}; run the indexer first")
+        return
+    min_score = args.min_score if args.min_score is not None else (15 if args.platform == "bilibili" else 5)
+    stats = state.compact(min_score=min_score)
+    print(f"✓ Merged {stats['deltas']} deltas: {stats['touched']} words rescored, "
+          f"{stats['kept']} published, {stats['dropped']} dropped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import json
+import heapq
+import shutil
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+
+from indexer_shared import smart_filter_taught_words, deduplicate_occurrences
+from shard_publisher import ShardPublisher
+from shard_planner import DEFAULT_TARGET_BYTES, ShardPlanner, lemma_bytes
+
+# Entries buffered in memory before they are spilled to a sorted run file
+RUN_BUFFER_ENTRIES = 200_000
+# Occurrences scored per smart_filter_taught_words call while merging
+FILTER_BATCH_OCCURRENCES = 20_000
+
+
+class RunSpiller:
+    """
+    Streaming replacement for the indexers' global defaultdict(list).
+
+    (lemma, entry) pairs are buffered and, once the buffer is full, sorted
+    by lemma (stable, so per-lemma order is kept) and written to a run file
+    as "lemma<TAB>entry json" lines. merge() then k-way merges the runs, so
+    the corpus-wide index is never held in memory.
+    """
+    def __init__(self, run_dir=None, buffer_entries=RUN_BUFFER_ENTRIES):
+        self.run_dir = tempfile.mkdtemp(prefix="index_runs_", dir=run_dir)
+        self.buffer_entries = buffer_entries
+        self.runs = []
+        self.entries = 0
+        self._buffer = []
+
+    def add(self, lemma, entry):
+        self._buffer.append((lemma, entry))
+        self.entries += 1
+        if len(self._buffer) >= self.buffer_entries:
+            self.spill()
+
+    def spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort(key=itemgetter(0))
+        path = os.path.join(self.run_dir, f"run_{len(self.runs):05d}.tsv")
+        with open(path, 'w', encoding='utf-8') as f:
+            for lemma, entry in self._buffer:
+                f.write(f"{lemma}\t{json.dumps(entry, ensure_ascii=False, separators=(',', ':'))}\n")
+        self.runs.append(path)
+        self._buffer = []
+
+    def merge(self):
+        """Yield (lemma, [entries]) in lemma order, entries in the order they were added"""
+        self.spill()
+        # heapq.merge breaks ties by run order, and runs are written in add order
+        merged = heapq.merge(*(_read_run(path) for path in self.runs), key=itemgetter(0))
+        for lemma, group in groupby(merged, key=itemgetter(0)):
+            yield lemma, [json.loads(entry) for _, entry in group]
+
+    def cleanup(self):
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            lemma, entry = line.rstrip('\n').split('\t', 1)
+            yield lemma, entry
+
+
+def stream_taught_words(merged, time_window=120, min_score=10, whitelist=None, dedup_threshold=60):
+    """
+    smart_filter_taught_words + deduplicate_occurrences over a merged run
+    stream. Words are scored in batches of about FILTER_BATCH_OCCURRENCES
+    occurrences (scores only depend on the word's own occurrences, so
+    batching does not change them).
+
+    Yields:
+        (lemma, original occurrences, taught occurrences, deduplicated entries),
+        the last two being 0 / None for filtered-out words
+    """
+    def flush(batch):
+        taught = smart_filter_taught_words(batch, time_window=time_window, min_score=min_score,
+                                           whitelist=whitelist)
+        for lemma, entries in batch.items():
+            if lemma in taught:
+                yield lemma, len(entries), len(entries), deduplicate_occurrences(entries, dedup_threshold)
+            else:
+                yield lemma, len(entries), 0, None
+
+    batch = {}
+    batch_size = 0
+    for lemma, entries in merged:
+        batch[lemma] = entries
+        batch_size += len(entries)
+        if batch_size >= FILTER_BATCH_OCCURRENCES:
+            yield from flush(batch)
+            batch = {}
+            batch_size = 0
+    if batch:
+        yield from flush(batch)
+
+
+class ShardWriter:
+    """
+    Publishes size-balanced <prefix>_<key>.json shards from a lemma-sorted
+    stream. The ShardPlanner cuts the stream into prefix ranges as it goes;
+    each finished shard is handed to the ShardPublisher (serialized in the
+    background) and close() publishes all of them, with the routing table,
+    in one manifest update.
+    """
+    def __init__(self, output_dir, prefix, target_bytes=DEFAULT_TARGET_BYTES, binary=False):
+        self.publisher = ShardPublisher(output_dir, prefix, binary=binary)
+        self.planner = ShardPlanner(target_bytes)
+        self._key = None
+        self._shard = {}
+
+    def add(self, lemma, entries):
+        key = self.planner.add(lemma, lemma_bytes(lemma, entries))
+        if key != self._key and self._shard:
+            self.publisher.stage(self._key, self._shard)
+            self._shard = {}
+        self._key = key
+        self._shard[lemma] = entries
+
+    def close(self, contexts=None):
+        """Publish the staged shards, with the pending tables of `contexts` (a VideoContexts)"""
+        if self._shard:
+            self.publisher.stage(self._key, self._shard)
+            self._shard = {}
+        if contexts is not None:
+            contexts.publish(self.publisher)
+        return self.publisher.commit(routing=self.planner.routing, target_bytes=self.planner.target_bytes)
+
+    def abort(self):
+        self.publisher.abort()
@@ -4,6 +4,7 @@ import glob
 from collections import defaultdict
 from text_processor import TextProcessor
 from asr_engine import ASREngine
+from shard_publisher import publish_shards
 
 # Configuration
 VIDEO_DIR = "public/videos"
@@ -17,11 +18,9 @@ def scan_videos(directory):
         files.extend(glob.glob(os.path.join(directory, "**", ext), recursive=True))
     return files
 
-def get_context(all_words, current_index, window=5):
+def get_context(transcript, current_index, window=5):
     """Extract context window around current word."""
-    start = max(0, current_index - window)
-    end = min(len(all_words), current_index + window + 1)
-    return " ".join([w['word'] for w in all_words[start:end]])
+    return transcript.context(current_index, window)
 
 def main():
     # Ensure output directory exists
@@ -50,8 +49,7 @@ def main():
             print(f"Processing [{vid_id}] {video_path}...")
             words = asr.transcribe(video_path)  # Temporary audio extracted and deleted
             
-            for i, word_obj in enumerate(words):
-                raw_word = word_obj['word']
+            for i, raw_word in enumerate(words.words):
                 lemma = processor.lemmatize(raw_word)
                 
                 if lemma:
@@ -59,7 +57,7 @@ def main():
                     # V1.2 Structure: {"v": vid_id, "t": [start, end], "c": context}
                     entry = {
                         "v": vid_id,
-                        "t": [round(word_obj['start'], 2), round(word_obj['end'], 2)],
+                        "t": [round(words.starts[i], 2), round(words.ends[i], 2)],
                         "c": context
                     }
                     global_index[lemma].append(entry)
@@ -76,10 +74,7 @@ def main():
         first_char = lemma[0] if lemma[0].isalpha() else "others"
         shards[first_char][lemma] = entries
 
-    for char, data in shards.items():
-        filename = f"index_{char}.json"
-        with open(os.path.join(OUTPUT_DIR, filename), "w") as f:
-            json.dump(data, f)  # Minified
+    for filename in publish_shards(OUTPUT_DIR, "index", shards):
         print(f"Saved {filename}")
 
     # 4. Save Metadata
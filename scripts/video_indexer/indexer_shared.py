@@ -1,6 +1,13 @@
 import os
 import json
-import re
+import numpy as np
+from asr_backends import DEFAULT_BACKEND
+from transcript_store import get_default_store
+from transcript import Transcript, as_transcript
+from context_table import context_flags, FLAG_INTRO, FLAG_CJK
+from lemmatizer import get_default_lemmatizer
+from tokenizer import Tokenizer, WORD_RE
+from spelling import get_default_matcher
 
 # Common English stop words to filter out
 STOP_WORDS = {
@@ -18,11 +25,43 @@ STOP_WORDS = {
     'yes', 'no', 'not', 'yeah', 'ok', 'okay', 'umm', 'uh'
 }
 
+# English words (hyphenated compounds included) inside a transcript token
+ENGLISH_WORD_RE = WORD_RE
+
 class TextProcessor:
-    """Simple text processor for lemmatization"""
-    def lemmatize(self, word):
-        # Lowercase and strip punctuation
-        return word.lower().strip('.,!?()[]{}"\'')
+    """
+    Lowercases, strips punctuation and lemmatizes (memoized, see
+    lemmatizer.py); spelled-out words are reconstructed unless
+    spell_check=False (see spelling.py)
+    """
+    def __init__(self, lemmatizer=None, spell_check=True):
+        self.lemmatizer = lemmatizer or get_default_lemmatizer()
+        self.lemmatize = self.lemmatizer.lemmatize
+        self.tokenizer = Tokenizer(self.lemmatize, STOP_WORDS, get_default_matcher() if spell_check else None)
+
+def index_video_words(words, video_id, processor):
+    """
+    Turn one video's transcript into index entries.
+    Reads the Transcript columns directly; word dict lists are converted once.
+    Lemmas and context flags come from one tokenizer pass over the whole
+    transcript (see tokenizer.py). Entries point at their word ("x") instead of copying the
+    context; see VideoContexts for how that becomes a context table reference.
+    
+    Returns:
+        list of (lemma, {"v": video_id, "t": start, "x": word index, "_f": context flags}) tuples
+    """
+    transcript = as_transcript(words)
+    starts = transcript.starts
+    entries = []
+    for i, lemma, flags in processor.tokenizer.scan(transcript.words):
+        # Absolute time is just start time (no offset needed as we process full video)
+        entries.append((lemma, {
+            "v": video_id,
+            "t": round(starts[i], 1),
+            "x": i,
+            "_f": flags
+        }))
+    return entries
 
 def get_transcription_cache_path(video_path):
     """Get path for transcription cache json"""
@@ -35,7 +74,7 @@ def save_transcription_cache(cache_path, words, video_info):
     data = {
         "version": CACHE_VERSION,
         "info": video_info,
-        "words": words
+        "words": words.to_dicts() if isinstance(words, Transcript) else words
     }
     with open(cache_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
@@ -58,6 +97,50 @@ def load_transcription_cache(cache_path):
             return None
     return None
 
+def _store_key(media_path, backend, model_size):
+    return get_default_store().key_for(media_path, backend, model_size, CACHE_VERSION)
+
+def load_cached_transcript(media_path, backend=DEFAULT_BACKEND, model_size="medium"):
+    """
+    Load a transcript from the content-addressed store (see transcript_store.py).
+    Falls back to a legacy per-file .transcription.json (default backend only,
+    since those don't record which engine produced them) and migrates it.
+    
+    Returns:
+        {"info": {...}, "words": Transcript} or None
+    """
+    key = _store_key(media_path, backend, model_size)
+    data = get_default_store().get(key)
+    if data:
+        return data
+    
+    if backend == DEFAULT_BACKEND:
+        legacy = load_transcription_cache(get_transcription_cache_path(media_path))
+        if legacy:
+            legacy['words'] = as_transcript(legacy['words'])
+            save_cached_transcript(media_path, legacy['words'], legacy.get('info', {}), backend, model_size)
+            return legacy
+    return None
+
+def save_cached_transcript(media_path, words, video_info, backend=DEFAULT_BACKEND, model_size="medium"):
+    """
+    Save a transcript to the content-addressed store. Empty transcripts are
+    not cached (usually a failed run; a cached one would never be retried),
+    nor are those of media files that no longer exist.
+    """
+    if not len(words):
+        print(f"    ⚠️  Empty transcript for {os.path.basename(media_path)}, not caching it")
+        return
+    key = _store_key(media_path, backend, model_size)
+    if key is None:
+        return
+    get_default_store().put(key, words, video_info, meta={
+        "backend": backend,
+        "model": model_size,
+        "cache_version": CACHE_VERSION,
+        "source": os.path.basename(media_path)
+    })
+
 def deduplicate_occurrences(occurrences, time_threshold=60):
     """
     Remove duplicate occurrences that are too close in time.
@@ -85,6 +168,57 @@ def deduplicate_occurrences(occurrences, time_threshold=60):
     
     return result
 
+def _occurrence_flags(occ):
+    """Context flags of one entry: its precomputed "_f" (removed) or a scan of "c"."""
+    flags = occ.pop('_f', None)
+    return context_flags(occ['c']) if flags is None else flags
+
+def _density_scores(times, group, n_groups, time_window):
+    """
+    Sliding-window density for every word at once.
+    
+    Occurrences are sorted by (word, time). For each occurrence i the window
+    [t_i, t_i + time_window] ends at the first later occurrence of the same
+    word past t_i + time_window. Timestamps are replaced by their rank among
+    all distinct timestamps, so (word, rank) packs into one int64 key and a
+    single searchsorted finds every window end with exact float comparisons.
+    
+    Returns:
+        (dense, max_density): per occurrence (input order) whether its
+        timestamp lies in a window of >= 3 occurrences, and per word the
+        largest window count
+    """
+    n = len(times)
+    order = np.lexsort((times, group))
+    t = times[order]
+    g = group[order]
+    
+    distinct = np.unique(t)
+    stride = np.int64(len(distinct) + 1)
+    keys = g * stride + np.searchsorted(distinct, t, side='left')
+    ends = g * stride + np.searchsorted(distinct, t + time_window, side='right')
+    positions = np.arange(n)
+    window_end = np.searchsorted(keys, ends, side='left')
+    counts = window_end - positions
+    
+    group_starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    max_density = np.zeros(n_groups, dtype=np.int64)
+    max_density[g[group_starts]] = np.maximum.reduceat(counts, group_starts)
+    
+    # Positions covered by a dense window (difference array over [i, window_end))
+    is_dense = counts >= 3
+    cover = (np.bincount(positions[is_dense], minlength=n + 1)
+             - np.bincount(window_end[is_dense], minlength=n + 1))
+    covered = np.cumsum(cover)[:n] > 0
+    
+    # Density is decided per timestamp value: equal (word, time) runs share it
+    new_run = np.r_[True, (g[1:] != g[:-1]) | (t[1:] != t[:-1])]
+    dense_sorted = np.maximum.reduceat(covered, np.flatnonzero(new_run))[np.cumsum(new_run) - 1]
+    
+    dense = np.empty(n, dtype=bool)
+    dense[order] = dense_sorted
+    return dense, max_density
+
 def smart_filter_taught_words(word_index, time_window=120, min_score=10, whitelist=None):
     """
     Smartly filter taught words based on multi-dimensional scoring.
@@ -96,6 +230,12 @@ def smart_filter_taught_words(word_index, time_window=120, min_score=10, whiteli
     3. Context Score: +5 if context contains intro patterns ("这个单词", "意思是"...)
     4. Isolation Score: +2 if context contains Chinese characters (mixed language)
     
+    Context checks use the entry's precomputed "_f" flags (see
+    context_table.py) when present and its "c" string otherwise; "_f" is
+    removed from every entry. Scoring is vectorized over the whole index
+    (see _density_scores); the only per-occurrence Python work is reading
+    't'/flags and writing 's'.
+    
     Args:
         word_index: Dict of {word: [occurrences]}
         time_window: Sliding window size (seconds)
@@ -108,72 +248,35 @@ def smart_filter_taught_words(word_index, time_window=120, min_score=10, whiteli
     filtered_index = {}
     whitelist = whitelist or set()
     
-    # Intro patterns that strongly suggest a word is being taught
-    INTRO_PATTERNS = [
-        "这个单词", "单词叫做", "单词是", "意思是", "叫", "翻译成", "什么意思",
-        "怎么来记", "看这个词", "读一下", "再读一遍", "什么鬼", "怎么讲"
-    ]
+    items = list(word_index.items())
+    sizes = np.fromiter((len(occs) for _, occs in items), dtype=np.int64, count=len(items))
+    total = int(sizes.sum())
     
-    for word, occurrences in word_index.items():
-        # 1. Calculate Density Map (which occurrences are in dense regions)
-        timestamps = sorted([occ['t'] for occ in occurrences])
-        dense_timestamps = set()
-        
-        max_density = 0
-        for i in range(len(timestamps)):
-            window_end = timestamps[i] + time_window
-            current_window_timestamps = []
-            for t in timestamps[i:]:
-                if t <= window_end:
-                    current_window_timestamps.append(t)
-                else:
-                    break
-            
-            count = len(current_window_timestamps)
-            max_density = max(max_density, count)
-            
-            # If this window is dense, mark all timestamps in it
-            if count >= 3:
-                for t in current_window_timestamps:
-                    dense_timestamps.add(t)
-        
-        # 2. Calculate Individual Scores & Total Score
-        total_word_score = 0
-        
-        # Base Score for the word (based on total count)
-        base_word_score = len(occurrences)
-        total_word_score += base_word_score
-        
-        # Density Bonus for the word
-        if max_density >= 3:
-            total_word_score += max_density * 2
-            
-        # Calculate score for each occurrence
+    times = np.fromiter((occ['t'] for _, occs in items for occ in occs), dtype=np.float64, count=total)
+    flags = np.fromiter((_occurrence_flags(occ) for _, occs in items for occ in occs), dtype=np.int64, count=total)
+    group = np.repeat(np.arange(len(items), dtype=np.int64), sizes)
+    
+    if total:
+        dense, max_density = _density_scores(times, group, len(items), time_window)
+    else:
+        dense, max_density = np.zeros(0, dtype=bool), np.zeros(len(items), dtype=np.int64)
+    
+    # Context (+5) and isolation (+2) count for both the occurrence and its word
+    context_bonus = 5 * ((flags & FLAG_INTRO) != 0) + 2 * ((flags & FLAG_CJK) != 0)
+    occ_scores = (1 + context_bonus + 2 * dense).tolist()
+    
+    # Base score (count) + density bonus + summed context bonuses
+    word_scores = (sizes
+                   + np.where(max_density >= 3, max_density * 2, 0)
+                   + np.bincount(group, weights=context_bonus, minlength=len(items)).astype(np.int64)).tolist()
+    
+    position = 0
+    for (word, occurrences), word_score in zip(items, word_scores):
         for occ in occurrences:
-            occ_score = 1 # Base score for this occurrence
-            
-            # Context Score
-            context = occ['c']
-            if any(p in context for p in INTRO_PATTERNS):
-                occ_score += 5
-                total_word_score += 5 # Add to word total
-            
-            # Isolation Score (Chinese characters)
-            if any('\u4e00' <= char <= '\u9fff' for char in context):
-                occ_score += 2
-                total_word_score += 2 # Add to word total
-                
-            # Density Score (is this specific occurrence in a dense region?)
-            if occ['t'] in dense_timestamps:
-                occ_score += 2
-                
-            # Save score to occurrence
-            occ['s'] = occ_score
-            
-        # Cap total context/isolation score contributions to avoid spam
-        # (Simplified logic: we trust the sum of individual scores roughly reflects importance)
-            
-        if total_word_score >= min_score or word in whitelist:
+            occ['s'] = occ_scores[position]
+            position += 1
+        
+        if word_score >= min_score or word in whitelist:
             filtered_index[word] = occurrences
             
     return filtered_index
@@ -0,0 +1,459 @@
+"""
+English lemmatization for the indexers (TextProcessor.lemmatize).
+
+Lowercasing and stripping punctuation left "actors"/"actor" and
+"adventures"/"adventure" as separate index keys: shards carried both and
+each form was scored on its own. The frontend already looks words up by
+their lemma (getLemma in src/utils/textUtils.ts), so inflected keys were
+also unreachable.
+
+A normalized surface form is resolved through:
+    1. lemma_table.json, a surface -> lemma table precomputed offline
+       (`python lemmatizer.py --build`) for the surfaces that actually
+       occur: published index keys, youtube_words_list.json and the word
+       lists in public/cihuibiao. Their lemmas come from the lemminflect
+       lexicon (pip install lemminflect, build time only) and irregular
+       forms; without lemminflect, from the word book inflected by part of
+       speech and plural/-ed/-ing pairs of index keys
+    2. NLTK's WordNet lemmatizer, if installed (pip install nltk, plus
+       nltk.download('wordnet')), for words outside the table. Stop words
+       and irregular forms never reach it, and a result that is a stop
+       word ("was" -> "wa") or not a known word is ignored
+    3. the surface form itself
+Results are memoized per raw token, so the per-token hot loop is one
+cache lookup for every repeated word.
+
+Usage:
+    python lemmatizer.py --build
+    python lemmatizer.py --report --platform youtube
+"""
+import os
+import re
+import csv
+import glob
+import json
+import time
+import argparse
+import threading
+from functools import lru_cache
+
+try:
+    from nltk.stem import WordNetLemmatizer
+    HAS_NLTK = True
+except ImportError:
+    HAS_NLTK = False
+
+try:
+    from lemminflect import getAllLemmas
+    HAS_LEMMINFLECT = True
+except ImportError:
+    HAS_LEMMINFLECT = False
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+WORD_BOOK_DIR = os.path.join(PROJECT_ROOT, "public", "cihuibiao")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "public", "data")
+LEMMA_TABLE_PATH = os.path.join(SCRIPT_DIR, "lemma_table.json")
+# Index keys saved alongside the published indexes ([word, ...])
+WORD_LIST_PATHS = [os.path.join(PROJECT_ROOT, "youtube_words_list.json")]
+
+TABLE_VERSION = 1
+# Punctuation ASR output leaves attached to words
+STRIP_CHARS = '.,!?()[]{}"\''
+# Distinct raw tokens memoized per Lemmatizer
+CACHE_SIZE = 1 << 16
+
+VOWELS = set("aeiou")
+POS_RE = re.compile(r'\b(n|v|vt|vi|adj|adv|prep|conj|pron|num|aux)\.')
+VOWEL_GROUP_RE = re.compile(r'[aeiouy]+')
+
+# Irregular forms. Forms that are common words of their own ("left",
+# "saw", "found", "lay", "fell", "rose", "bit", "better", "leaves") are
+# left out on purpose.
+IRREGULAR = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "having": "have",
+    "does": "do", "did": "do", "done": "do", "doing": "do",
+    "went": "go", "gone": "go", "goes": "go", "going": "go", "makes": "make", "making": "make",
+    "takes": "take", "taking": "take", "comes": "come", "coming": "come", "gets": "get", "getting": "get",
+    "made": "make", "took": "take", "taken": "take", "came": "come", "got": "get", "gotten": "get",
+    "began": "begin", "begun": "begin", "bent": "bend", "blew": "blow", "blown": "blow",
+    "broke": "break", "broken": "break", "brought": "bring", "built": "build", "bought": "buy",
+    "caught": "catch", "chose": "choose", "chosen": "choose", "drew": "draw", "drawn": "draw",
+    "dreamt": "dream", "drank": "drink", "drunk": "drink", "drove": "drive", "driven": "drive",
+    "ate": "eat", "eaten": "eat", "fed": "feed", "felt": "feel", "fought": "fight",
+    "flew": "fly", "flown": "fly", "forgot": "forget", "forgotten": "forget",
+    "forgave": "forgive", "forgiven": "forgive", "froze": "freeze", "frozen": "freeze",
+    "gave": "give", "given": "give", "grew": "grow", "grown": "grow", "hung": "hang",
+    "heard": "hear", "hid": "hide", "hidden": "hide", "held": "hold", "kept": "keep",
+    "knew": "know", "known": "know", "learnt": "learn", "led": "lead", "lent": "lend",
+    "lost": "lose", "meant": "mean", "met": "meet", "paid": "pay", "ran": "run",
+    "rang": "ring", "rung": "ring", "rode": "ride", "ridden": "ride", "said": "say",
+    "sought": "seek", "sold": "sell", "sent": "send", "shook": "shake", "shaken": "shake",
+    "shone": "shine", "shot": "shoot", "sang": "sing", "sung": "sing", "sank": "sink",
+    "sat": "sit", "slept": "sleep", "spent": "spend", "spoken": "speak", "stood": "stand",
+    "stole": "steal", "stolen": "steal", "stuck": "stick", "struck": "strike", "swam": "swim",
+    "swum": "swim", "taught": "teach", "tore": "tear", "torn": "tear", "told": "tell",
+    "thought": "think", "threw": "throw", "thrown": "throw", "understood": "understand",
+    "woke": "wake", "woken": "wake", "wore": "wear", "worn": "wear", "won": "win",
+    "wrote": "write", "written": "write", "seen": "see", "sped": "speed",
+    "children": "child", "men": "man", "women": "woman", "feet": "foot", "teeth": "tooth",
+    "mice": "mouse", "geese": "goose", "lives": "life", "wives": "wife", "knives": "knife",
+    "halves": "half", "shelves": "shelf", "wolves": "wolf", "thieves": "thief",
+}
+
+# Surfaces that look inflected but are words of their own
+NOT_INFLECTED = {
+    "news", "goods", "means", "series", "species", "clothes", "glasses", "arms", "woods",
+    "evening", "morning", "ceiling", "during", "nothing", "something", "anything", "everything",
+    "need", "speed", "hundred", "red", "bed", "seed", "feed",
+    "according", "including", "boring", "interesting", "exciting", "amazing",
+    "physics", "mathematics", "economics", "politics", "ethics",
+    "others", "pants", "mars", "wales",
+}
+
+
+def load_word_book(directory=WORD_BOOK_DIR):
+    """
+    {word: set of parts of speech} from the word book CSVs
+    (序号,单词,音标,词性及释义; the meaning may spill over extra columns)
+    """
+    words = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) < 2:
+                    continue
+                word = row[1].strip().lower()
+                if not word.isalpha():
+                    continue
+                words.setdefault(word, set()).update(POS_RE.findall(" ".join(row[3:])))
+    return words
+
+
+def _doubles(word):
+    """Consonant-vowel-consonant ending whose last letter doubles (stop -> stopped)"""
+    return (len(word) >= 3 and word[-1] not in VOWELS and word[-1] not in "wxy"
+            and word[-2] in VOWELS and word[-3] not in VOWELS)
+
+
+def _one_syllable(word):
+    # Stress is on the only syllable, so the doubling is certain (fit -> fitted, never "fited")
+    return len(VOWEL_GROUP_RE.findall(word)) == 1
+
+
+def plural_forms(word):
+    if word.endswith(("s", "x", "z", "ch", "sh")):
+        return {word + "es"}
+    if word.endswith("y") and word[-2:-1] not in VOWELS:
+        return {word[:-1] + "ies"}
+    if word.endswith("o"):
+        return {word + "s", word + "es"}
+    return {word + "s"}
+
+
+def _suffix_forms(word, suffix):
+    """word + "ed"/"er"/"est" with the e-drop, y -> i and doubling rules"""
+    if word.endswith("e"):
+        return {word + suffix[1:]}
+    if word.endswith("y") and word[-2:-1] not in VOWELS:
+        return {word[:-1] + "i" + suffix}
+    if not _doubles(word):
+        return {word + suffix}
+    forms = {word + word[-1] + suffix}
+    if not _one_syllable(word):
+        forms.add(word + suffix)
+    return forms
+
+
+def ing_forms(word):
+    if word.endswith("ie"):
+        return {word[:-2] + "ying"}
+    if word.endswith("e") and not word.endswith(("ee", "ye", "oe")):
+        return {word[:-1] + "ing"}
+    if not _doubles(word):
+        return {word + "ing"}
+    forms = {word + word[-1] + "ing"}
+    if not _one_syllable(word):
+        forms.add(word + "ing")
+    return forms
+
+
+def inflections(word, pos):
+    """Regular inflected forms of a word book entry, by its parts of speech"""
+    forms = set()
+    is_verb = bool(pos & {"v", "vt", "vi"})
+    if "n" in pos or is_verb:
+        forms |= plural_forms(word)
+    if is_verb:
+        forms |= _suffix_forms(word, "ed") | ing_forms(word)
+    if "adj" in pos and len(word) <= 6:
+        # Longer adjectives take more/most
+        forms |= _suffix_forms(word, "er") | _suffix_forms(word, "est")
+    return forms
+
+
+def load_word_lists(paths=WORD_LIST_PATHS):
+    """Words of the saved index key lists (spelled-out junk like "a-b-l-e" is skipped)"""
+    words = set()
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            continue
+        words.update(w.lower() for w in items if isinstance(w, str) and w.isalpha())
+    return words
+
+
+def lexicon_lemma(surface, known=()):
+    """
+    lemminflect's lemma of an inflected surface, or None when the surface
+    is not in its lexicon, is a lemma itself under some part of speech
+    ("physics", "boring") or has several lemmas none of which is `known`
+    """
+    lemmas = {lemma.lower() for forms in getAllLemmas(surface).values() for lemma in forms}
+    if not lemmas or surface in lemmas:
+        return None
+    if len(lemmas) > 1:
+        lemmas &= set(known)
+    return lemmas.pop() if len(lemmas) == 1 else None
+
+
+def build_table(word_book, index_keys=(), vocabulary=(), word_lists=(), use_lexicon=HAS_LEMMINFLECT):
+    """
+    Precompute {surface: lemma} for the surfaces that occur: `index_keys`
+    (keys of published indexes), `word_lists` (load_word_lists) and the
+    word book / `vocabulary` (spelling.load_vocabulary) words. No surface
+    form is invented, so the table only holds real words.
+
+    Irregular forms map through IRREGULAR. The rest come from the
+    lemminflect lexicon when `use_lexicon`; otherwise from the regular
+    inflections of word book entries by part of speech, and from keys that
+    are the plural, -ed or -ing form of a known key (bases of 3+ / 4+
+    letters).
+
+    Surfaces that are lemmas themselves (word book words, NOT_INFLECTED,
+    irregular lemmas) are never mapped, and neither is anything onto a
+    stop word: "going" -> "go" would drop the form from the index.
+    """
+    from indexer_shared import STOP_WORDS
+
+    known = set(word_book) | set(vocabulary)
+    lemmas = known | NOT_INFLECTED | set(IRREGULAR.values())
+    surfaces = {w for w in set(index_keys) | set(word_lists) | known if w.isalpha()}
+    table = {}
+
+    def add(surface, lemma):
+        if (surface != lemma and surface in surfaces and surface not in lemmas
+                and surface not in STOP_WORDS and lemma not in STOP_WORDS):
+            table.setdefault(surface, lemma)
+
+    for surface, lemma in IRREGULAR.items():
+        if surface in surfaces:
+            add(surface, lemma)
+    if use_lexicon:
+        # Shorter regular forms are ASR fragments ("ani" -> "anus")
+        for surface in sorted(w for w in surfaces - set(table) if len(w) >= 4):
+            lemma = lexicon_lemma(surface, lemmas | surfaces)
+            if lemma is not None:
+                add(surface, lemma)
+        return table
+
+    for word in sorted(word_book):
+        for surface in sorted(inflections(word, word_book[word])):
+            add(surface, word)
+    for word in sorted(surfaces & known):
+        candidates = plural_forms(word) if len(word) >= 3 else set()
+        if len(word) >= 4:
+            candidates |= _suffix_forms(word, "ed") | ing_forms(word)
+        for surface in sorted(candidates):
+            add(surface, word)
+    return table
+
+
+def load_table(path=LEMMA_TABLE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)["table"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+class Lemmatizer:
+    """
+    Memoized surface -> lemma lookup (see the module docstring for the
+    resolution order). lemmatize() takes raw tokens and is cached on them,
+    so lowercasing and punctuation stripping are memoized too.
+    """
+    def __init__(self, table=None, use_wordnet=HAS_NLTK, cache_size=CACHE_SIZE, known_words=None):
+        self.table = load_table() if table is None else table
+        self._wordnet = None
+        if use_wordnet:
+            try:
+                self._wordnet = WordNetLemmatizer()
+                self._wordnet.lemmatize("tests")
+            except LookupError:
+                print("Tip: Download the WordNet data for better lemmas: python -c \"import nltk; nltk.download('wordnet')\"")
+                self._wordnet = None
+        if self._wordnet is not None:
+            from indexer_shared import STOP_WORDS
+            from spelling import load_vocabulary
+
+            self._stop_words = STOP_WORDS
+            # WordNet strips any trailing "s" ("has" -> "ha"): only results
+            # that are known words are taken
+            self._known = set(self.table.values()) | (load_vocabulary() if known_words is None else set(known_words))
+        self.lemmatize = lru_cache(maxsize=cache_size)(self._lemmatize)
+
+    def _lemmatize(self, word):
+        surface = word.lower().strip(STRIP_CHARS)
+        lemma = self.table.get(surface)
+        if lemma is not None:
+            return lemma
+        if (self._wordnet is None or not surface.isalpha()
+                or surface in self._stop_words or surface in IRREGULAR):
+            return surface
+        for pos in ('n', 'v'):
+            lemma = self._wordnet.lemmatize(surface, pos)
+            if lemma != surface and lemma in self._known and lemma not in self._stop_words:
+                return lemma
+        return surface
+
+
+_default_lemmatizer = None
+_default_lemmatizer_lock = threading.Lock()
+
+
+def get_default_lemmatizer():
+    global _default_lemmatizer
+    with _default_lemmatizer_lock:
+        if _default_lemmatizer is None:
+            _default_lemmatizer = Lemmatizer()
+        return _default_lemmatizer
+
+
+def load_published_index(output_dir, prefix):
+    """{lemma: entries} of a published index (through the manifest, else the legacy files)"""
+    from shard_publisher import load_manifest
+
+    index = {}
+    shards = load_manifest(output_dir).get("indexes", {}).get(prefix, {}).get("shards")
+    if shards:
+        paths = [os.path.join(output_dir, shard["file"]) for shard in shards.values()]
+    else:
+        paths = glob.glob(os.path.join(output_dir, f"{prefix}_*.json"))
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            index.update(json.load(f))
+    return index
+
+
+def report(index, lemmatizer, target_bytes, tokens=None):
+    """Print how many keys merge under `lemmatizer` and how much the shards shrink"""
+    from indexer_shared import STOP_WORDS, deduplicate_occurrences
+    from shard_planner import lemma_bytes, plan_index
+
+    merged = {}
+    forms = {}
+    for key, entries in index.items():
+        lemma = lemmatizer.lemmatize(key)
+        merged.setdefault(lemma, []).extend(entries)
+        forms.setdefault(lemma, []).append(key)
+    stop = {lemma for lemma in merged if lemma in STOP_WORDS}
+    for lemma in stop:
+        del merged[lemma]
+    groups = sorted(((lemma, sorted(keys)) for lemma, keys in forms.items() if lemma in merged and keys != [lemma]),
+                    key=lambda item: -len(merged[item[0]]))
+    # A rebuild deduplicates the merged occurrences like any other word's
+    for lemma, _ in groups:
+        merged[lemma] = deduplicate_occurrences(merged[lemma], time_threshold=60)
+
+    before_bytes = sum(lemma_bytes(k, v) for k, v in index.items())
+    after_bytes = sum(lemma_bytes(k, v) for k, v in merged.items())
+    before_shards, _ = plan_index(index, target_bytes)
+    after_shards, _ = plan_index(merged, target_bytes)
+    dropped = sum(len(forms[lemma]) for lemma in stop)
+    remapped = sum(1 for lemma, keys in groups for key in keys if key != lemma)
+    print(f"  Keys: {len(index)} → {len(merged)} ({remapped} inflected forms mapped onto {len(groups)} lemmas, "
+          f"{dropped} forms of stop words dropped)")
+    print(f"  Occurrences: {sum(map(len, index.values()))} → {sum(map(len, merged.values()))} (after deduplication)")
+    print(f"  Shard bytes: {before_bytes / 1024:.1f} KB → {after_bytes / 1024:.1f} KB "
+          f"({(1 - after_bytes / max(1, before_bytes)) * 100:.1f}% smaller, before rescoring)")
+    print(f"  Shards at {target_bytes // 1024} KB: {len(before_shards)} → {len(after_shards)}")
+    for lemma, keys in groups[:15]:
+        print(f"    {lemma:<16} ← {', '.join(keys)}")
+    if len(groups) > 15:
+        print(f"    ... and {len(groups) - 15} more")
+
+    if tokens:
+        start = time.perf_counter()
+        for token in tokens:
+            token.lower().strip(STRIP_CHARS)
+        baseline = time.perf_counter() - start
+        print(f"  lower/strip only: {baseline / len(tokens) * 1e9:.0f} ns/token")
+        lemmatizer.lemmatize.cache_clear()
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            for token in tokens:
+                lemmatizer.lemmatize(token)
+            elapsed = time.perf_counter() - start
+            print(f"  lemmatize ({label} cache): {elapsed / len(tokens) * 1e9:.0f} ns/token "
+                  f"({len(tokens)} tokens, {elapsed * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the surface -> lemma table and report its effect on the index')
+    parser.add_argument('--build', action='store_true', help=f'Write {os.path.basename(LEMMA_TABLE_PATH)}')
+    parser.add_argument('--no-index-keys', action='store_true',
+                        help='Build for the word lists only, ignoring published index keys')
+    parser.add_argument('--report', action='store_true',
+                        help='Show key merges, shard shrink and lemmatize() speed on a published index')
+    parser.add_argument('--platform', choices=['bilibili', 'youtube', 'all'], default='youtube',
+                        help='Index to report on (default: youtube)')
+    parser.add_argument('--transcript', default=os.path.join(SCRIPT_DIR, "transcription_cleaned.txt"),
+                        help='Text file whose tokens time lemmatize()')
+    args = parser.parse_args()
+
+    if args.build:
+        from spelling import load_vocabulary
+
+        word_book = load_word_book()
+        keys = set()
+        if not args.no_index_keys:
+            for prefix in ("index_bilibili", "index_youtube"):
+                keys.update(load_published_index(OUTPUT_DIR, prefix))
+        if not HAS_LEMMINFLECT:
+            print("Tip: Install lemminflect for lexicon lemmas: pip install lemminflect "
+                  "(falling back to the word book inflections)")
+        word_lists = load_word_lists()
+        table = build_table(word_book, keys, load_vocabulary(), word_lists)
+        with open(LEMMA_TABLE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"version": TABLE_VERSION, "table": dict(sorted(table.items()))}, f,
+                      ensure_ascii=False, indent=0)
+        print(f"✓ Saved {os.path.basename(LEMMA_TABLE_PATH)}: {len(table)} surface forms "
+              f"({len(word_book)} word book entries, {len(keys)} index keys, {len(word_lists)} listed words, "
+              f"{'lemminflect' if HAS_LEMMINFLECT else 'word book'} lemmas)")
+
+    if args.report:
+        from indexer_shared import ENGLISH_WORD_RE
+        from shard_planner import DEFAULT_TARGET_BYTES
+
+        prefix = f"index_{args.platform}"
+        index = load_published_index(OUTPUT_DIR, prefix)
+        if not index:
+            print(f"❌ No published {prefix} index in {OUTPUT_DIR}")
+            return
+        tokens = []
+        if os.path.exists(args.transcript):
+            with open(args.transcript, 'r', encoding='utf-8') as f:
+                tokens = ENGLISH_WORD_RE.findall(f.read())
+        lemmatizer = Lemmatizer()
+        print(f"📊 {prefix} with {'WordNet + ' if lemmatizer._wordnet else ''}lemma table ({len(lemmatizer.table)} forms):")
+        report(index, lemmatizer, DEFAULT_TARGET_BYTES, tokens)
+
+
+if __name__ == "__main__":
+    main()
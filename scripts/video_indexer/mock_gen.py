@@ -4,6 +4,7 @@ import csv
 import random
 import time
 from collections import defaultdict
+from shard_publisher import publish_shards
 
 # Configuration
 CSV_PATH = "public/cihuibiao/zkgaopinci666.csv"
@@ -120,15 +121,9 @@ def main():
     
     # Save sharded index files
     saved_files = []
-    for char, word_dict in sorted(sharded_index.items()):
-        filename = f"index_{char}.json"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        
-        with open(filepath, "w") as f:
-            json.dump(word_dict, f)  # Compact format (no indent for production)
-        
+    for filename, word_count in publish_shards(OUTPUT_DIR, "index", sharded_index).items():
         saved_files.append(filename)
-        print(f"✓ Saved {filename} ({len(word_dict)} words)")
+        print(f"✓ Saved {filename} ({word_count} words)")
     
     # Generate metadata
     metadata = {
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+# Sentinel that tells a stage its upstream is exhausted
+_DONE = object()
+
+
+class StageError:
+    """
+    Failure record produced when a stage raises.
+    It skips every remaining stage and is yielded by Pipeline.run() so the
+    caller can log it next to successful results.
+    """
+    def __init__(self, stage, item, error):
+        self.stage = stage
+        self.item = item
+        self.error = error
+
+    def __repr__(self):
+        return f"StageError(stage={self.stage!r}, error={self.error!r})"
+
+
+class Stage:
+    """A named processing step run by one or more worker threads."""
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    """
+    Staged executor: each stage runs in its own thread(s) and stages are
+    joined by bounded queues, so a slow stage applies back-pressure instead
+    of letting finished work pile up on disk or in memory.
+
+    Stage functions are generators: they receive one item and may yield any
+    number of items for the next stage (e.g. one BVID -> many video files).
+
+    Usage:
+        pipe = Pipeline(queue_size=2)
+        pipe.add_stage("download", download_fn)
+        pipe.add_stage("transcribe", transcribe_fn)
+        for result in pipe.run(bvids):
+            ...
+    """
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self.stages = []
+
+    def add_stage(self, name, func, workers=1):
+        self.stages.append(Stage(name, func, workers))
+        return self
+
+    def _run_stage(self, stage, in_q, out_q, live_workers, lock):
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                # Let sibling workers see the sentinel too
+                in_q.put(_DONE)
+                break
+
+            if isinstance(item, StageError):
+                out_q.put(item)
+                continue
+
+            try:
+                for result in stage.func(item):
+                    out_q.put(result)
+            except Exception as e:
+                out_q.put(StageError(stage.name, item, e))
+
+        # The last worker of a stage closes the downstream queue
+        with lock:
+            live_workers[0] -= 1
+            if live_workers[0] == 0:
+                out_q.put(_DONE)
+
+    def _feed(self, source, out_q):
+        for item in source:
+            out_q.put(item)
+        out_q.put(_DONE)
+
+    def run(self, source):
+        """
+        Push every item of `source` through all stages.
+        Yields the output of the last stage (or StageError records) as soon
+        as they are available.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]),
+                                    name="pipeline-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            live_workers = [stage.workers]
+            lock = threading.Lock()
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, queues[i], queues[i + 1], live_workers, lock),
+                    name=f"pipeline-{stage.name}-{w}",
+                    daemon=True
+                ))
+
+        for t in threads:
+            t.start()
+
+        out_q = queues[-1]
+        while True:
+            result = out_q.get()
+            if result is _DONE:
+                break
+            yield result
+
+        for t in threads:
+            t.join()
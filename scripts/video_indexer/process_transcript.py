@@ -1,8 +1,19 @@
 import os
+import re
 import argparse
 import sys
-from google import genai
-from google.genai import types
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import Pipeline, StageError
+
+try:
+    from google import genai
+    from google.genai import types
+    HAS_GENAI = True
+except ImportError:
+    HAS_GENAI = False
 
 # Initialize Google GenAI client
 client = None
@@ -10,6 +21,11 @@ client = None
 def get_client():
     global client
     if client is None:
+        if not HAS_GENAI:
+            print("❌ Error: google-genai is not installed: pip install google-genai")
+            print("   (or run with --stub to try the pipeline offline)")
+            sys.exit(1)
+
         # Check for keys. The SDK defaults to GOOGLE_API_KEY, but we support GEMINI_API_KEY too
         api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
         
@@ -21,6 +37,44 @@ def get_client():
         client = genai.Client(api_key=api_key)
     return client
 
+class StubClient:
+    """
+    Offline stand-in for genai.Client, for testing and benchmarking the
+    chunk executor without an API key: each call sleeps `latency` seconds
+    (±20%) and echoes the text back, and more than `max_rps` calls within
+    one second are rejected with a 429 like the real API.
+    """
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, latency=0.5, max_rps=None):
+        self.latency = latency
+        self.max_rps = max_rps
+        self.calls = 0
+        self.rejected = 0
+        self._recent = []
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            if self.max_rps is not None and len(self._recent) >= self.max_rps:
+                self.rejected += 1
+                raise Exception("429 RESOURCE_EXHAUSTED (stub rate limit)")
+            self._recent.append(now)
+            self.calls += 1
+        time.sleep(self.latency * random.uniform(0.8, 1.2))
+        return self._Response(contents[-1])
+
+def use_stub_client(latency=0.5, max_rps=None):
+    """Route every request to a StubClient (see --stub)"""
+    global client
+    client = StubClient(latency=latency, max_rps=max_rps)
+    return client
+
 # Default to Gemini 2.0 Flash as it is stable and fast, but user requested 3-pro capability. 
 # Let's default to what they asked for "gemini-2.0-flash-exp" is often better for general tasks, 
 # "gemini-3-pro-preview" is the cutting edge. I will set the default to the one in their example?
@@ -43,23 +97,99 @@ class chunk_status:
     SUCCESS = "SUCCESS"
     FAILED = "FAILED"
 
-def generate_with_retry(prompt, text, model, temperature=0.3, max_retries=5, initial_delay=2):
+# Default concurrency of the chunk executor and request rate it starts from
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RPS = 2.0
+# 429s absorbed by the rate limiter a single request may see before it counts as failed
+MAX_RATE_LIMITED_RETRIES = 50
+
+class TokenBucket:
+    """
+    Request rate limiter shared by all chunk workers.
+    Each request takes one token; tokens refill at `rate` per second up to
+    `capacity`. The rate adapts to the server: a 429 halves it (and drops
+    the saved-up tokens), every success raises it by `increase` again, up
+    to the configured maximum. 429s within `cooldown` seconds of a cut are
+    answers to requests already in flight and don't cut again.
+    """
+    def __init__(self, rate=DEFAULT_MAX_RPS, capacity=1, min_rate=0.05, increase=0.25, cooldown=1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.min_rate = min_rate
+        self.increase = increase
+        self.cooldown = cooldown
+        self.tokens = self.capacity
+        self.rate_limited = 0
+        self._updated = time.monotonic()
+        self._last_cut = float('-inf')
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_rate_limited(self):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+            self.rate_limited += 1
+            if self._updated - self._last_cut >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_cut = self._updated
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+# Shared by every generate_with_retry call (set by configure_rate_limit)
+rate_limiter = None
+
+def configure_rate_limit(max_rps=DEFAULT_MAX_RPS, burst=1):
+    global rate_limiter
+    rate_limiter = TokenBucket(max_rps, capacity=burst) if max_rps and max_rps > 0 else None
+    return rate_limiter
+
+def generate_with_retry(prompt, text, model, temperature=0.3, max_retries=5, initial_delay=2,
+                        max_rate_limited=MAX_RATE_LIMITED_RETRIES):
     """
     Helper to call Gemini with retry logic. 
     Raises Exception if all retries fail, allowing the caller to handle the failure state.
+    Every attempt waits for the shared rate limiter first, and 429s slow it down.
+    A 429 the limiter absorbs does not use up one of the `max_retries`
+    attempts (a busy pool would otherwise fail chunks while it adapts);
+    those get their own, larger budget of `max_rate_limited`.
     """
     delay = initial_delay
     last_error = None
+    attempt = 0
+    rate_limited = 0
     
-    for attempt in range(max_retries):
+    while attempt < max_retries:
         try:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
             response = get_client().models.generate_content(
                 model=model,
                 contents=[prompt, text],
                 config=types.GenerateContentConfig(
                     temperature=temperature
-                )
+                ) if HAS_GENAI else {"temperature": temperature}
             )
+            if rate_limiter is not None:
+                rate_limiter.on_success()
             return response.text.strip()
         except Exception as e:
             last_error = e
@@ -67,9 +197,18 @@ def generate_with_retry(prompt, text, model, temperature=0.3, max_retries=5, ini
             error_str = str(e)
             is_rate_limit = "429" in error_str or "RESOURCE_EXHAUSTED" in error_str
             is_server_error = "500" in error_str or "503" in error_str or "disconnected" in error_str
-            
+            if is_rate_limit and rate_limiter is not None and rate_limited < max_rate_limited:
+                # The slowed-down limiter spaces out the retry for every worker
+                rate_limited += 1
+                rate_limiter.on_rate_limited()
+                logger.warning(f"    ⏳ Rate limited, request rate lowered to {rate_limiter.rate:.2f}/s "
+                               f"({rate_limited}/{max_rate_limited})")
+                continue
+            attempt += 1
+            if attempt >= max_retries:
+                break
             if is_rate_limit or is_server_error:
-                logger.warning(f"    ⏳ Transient error ({error_str[:50]}...). Retrying in {delay}s... (Attempt {attempt+1}/{max_retries})")
+                logger.warning(f"    ⏳ Transient error ({error_str[:50]}...). Retrying in {delay}s... (Attempt {attempt}/{max_retries})")
                 time.sleep(delay)
                 delay *= 2 # Exponential backoff
             else:
@@ -99,24 +238,28 @@ def process_single_chunk(func, chunk, index, total):
             "error": str(e)
         }
 
-def robust_batch_process(chunks, process_func, phase_name="Processing"):
+def robust_batch_process(chunks, process_func, phase_name="Processing", workers=1):
     """
     Two-Pass processing strategy.
-    Pass 1: Try all.
-    Pass 2: Retry failures.
+    Pass 1: Try all, up to `workers` chunks at a time (request rate is
+            shared through rate_limiter); results are kept in chunk order.
+    Pass 2: Retry failures, one at a time.
     """
     results = [None] * len(chunks)
     failed_indices = []
 
-    print(f"\n🚀 Starting {phase_name} (Total chunks: {len(chunks)})")
+    print(f"\n🚀 Starting {phase_name} (Total chunks: {len(chunks)}, {max(1, workers)} workers)")
     
     # --- Pass 1 ---
-    for i, chunk in enumerate(chunks):
-        print(f"  🔹 [Pass 1] {phase_name} chunk {i+1}/{len(chunks)} ({len(chunk)} chars)...")
-        res = process_single_chunk(process_func, chunk, i, len(chunks))
-        results[i] = res
-        if res["status"] == chunk_status.FAILED:
-            failed_indices.append(i)
+    def run_chunk(i):
+        print(f"  🔹 [Pass 1] {phase_name} chunk {i+1}/{len(chunks)} ({len(chunks[i])} chars)...")
+        return process_single_chunk(process_func, chunks[i], i, len(chunks))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for i, res in enumerate(executor.map(run_chunk, range(len(chunks)))):
+            results[i] = res
+            if res["status"] == chunk_status.FAILED:
+                failed_indices.append(i)
 
     # --- Pass 2 (Recovery) ---
     if failed_indices:
@@ -176,19 +319,42 @@ def translate_transcript(text):
 
     return generate_with_retry(prompt, text, DEFAULT_MODEL)
 
+# End of a sentence (English or Chinese), with any closing quote and whitespace
+SENTENCE_END_RE = re.compile(r'[.!?。！？]+["\'”’]?\s*')
+
+def split_long_paragraph(para, max_chars=4000):
+    """
+    Cut a paragraph longer than max_chars at the last sentence end before
+    each max_chars boundary (ASR transcripts are often one giant paragraph),
+    or hard at max_chars if a stretch has no sentence end at all.
+    """
+    pieces = []
+    while len(para) > max_chars:
+        cut = 0
+        for match in SENTENCE_END_RE.finditer(para, 0, max_chars):
+            cut = match.end()
+        if cut == 0:
+            cut = max_chars
+        pieces.append(para[:cut].strip())
+        para = para[cut:].strip()
+    if para:
+        pieces.append(para)
+    return pieces
+
 def split_text_into_chunks(text, max_chars=4000):
     """
     Splits text into chunks respecting paragraph boundaries (\n\n).
     Tries to keep each chunk under max_chars, but enforces sentence boundaries
-    where possible.
+    where possible. Paragraphs longer than max_chars are split at sentence
+    ends first (see split_long_paragraph).
     """
-    paragraphs = text.split('\n\n')
+    paragraphs = [piece for para in text.split('\n\n') for piece in split_long_paragraph(para.strip(), max_chars)]
     chunks = []
     current_chunk = []
     current_length = 0
     
     # Sentence ending punctuation
-    sentence_endings = ('.', '!', '?', '"', "'", '”', '’')
+    sentence_endings = ('.', '!', '?', '"', "'", '”', '’', '。', '！', '？')
 
     for para in paragraphs:
         para = para.strip()
@@ -225,7 +391,115 @@ def split_text_into_chunks(text, max_chars=4000):
     
     return chunks
 
-def process_file(input_file, clean_only=False):
+class OrderedChunkWriter:
+    """
+    Appends chunk results to a file in chunk order as they arrive out of
+    order: chunk i is written as soon as chunks 0..i all are, so the file
+    always holds a complete prefix of the output.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.written = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def put(self, index, text):
+        with self._lock:
+            self._pending[index] = text
+            while self.written in self._pending:
+                if self.written:
+                    self._file.write("\n\n")
+                self._file.write(self._pending.pop(self.written))
+                self.written += 1
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def pipelined_process(chunks, cleaned_path, zh_path=None, workers=DEFAULT_WORKERS):
+    """
+    Streaming clean -> translate: each chunk goes to translation as soon as
+    it is cleaned (both stages run `workers` threads, see pipeline.py), so
+    translating chunk 1 no longer waits for cleaning chunk N. Translation
+    chunks are exactly the cleaning chunks. Both outputs are written
+    incrementally in chunk order (OrderedChunkWriter).
+
+    Two-pass recovery as in robust_batch_process: chunks that fail a stage
+    are retried once after the streaming pass, then translated; a chunk
+    that fails again keeps its input text.
+    """
+    total = len(chunks)
+    cleaned_out = OrderedChunkWriter(cleaned_path)
+    zh_out = OrderedChunkWriter(zh_path) if zh_path else None
+    failed_clean = []
+    failed_translate = []
+
+    def clean_stage(i):
+        print(f"  🔹 [Pass 1] Cleaning chunk {i+1}/{total} ({len(chunks[i])} chars)...")
+        res = process_single_chunk(clean_transcript, chunks[i], i, total)
+        if res["status"] == chunk_status.FAILED:
+            failed_clean.append(i)
+            return
+        cleaned_out.put(i, res["text"])
+        yield i, res["text"]
+
+    def translate_stage(item):
+        i, text = item
+        print(f"  🔸 [Pass 1] Translating chunk {i+1}/{total} ({len(text)} chars)...")
+        res = process_single_chunk(translate_transcript, text, i, total)
+        if res["status"] == chunk_status.FAILED:
+            failed_translate.append((i, text))
+            return
+        zh_out.put(i, res["text"])
+        yield i
+
+    stages = "Cleaning → Translating" if zh_out else "Cleaning"
+    print(f"\n🚀 Starting {stages} (Total chunks: {total}, {max(1, workers)} workers per stage)")
+    pipe = Pipeline(queue_size=max(1, workers))
+    pipe.add_stage("clean", clean_stage, workers=workers)
+    if zh_out:
+        pipe.add_stage("translate", translate_stage, workers=workers)
+    try:
+        for result in pipe.run(range(total)):
+            if isinstance(result, StageError):
+                raise result.error
+
+        # --- Pass 2 (Recovery) ---
+        if failed_clean:
+            print(f"\n⚠️  {len(failed_clean)} chunks failed cleaning in Pass 1. Starting Recovery Pass...")
+        for idx in sorted(failed_clean):
+            print(f"  🚑 [Pass 2] Retrying cleaning of chunk {idx+1}...")
+            res = process_single_chunk(clean_transcript, chunks[idx], idx, total)
+            if res["status"] == chunk_status.SUCCESS:
+                print(f"    ✅ Recovered chunk {idx+1}!")
+            else:
+                print(f"    ❌ Chunk {idx+1} failed again. Keeping original text.")
+            cleaned_out.put(idx, res["text"])
+            if zh_out:
+                print(f"  🔸 Translating chunk {idx+1}/{total}...")
+                translated = process_single_chunk(translate_transcript, res["text"], idx, total)
+                if translated["status"] == chunk_status.FAILED:
+                    failed_translate.append((idx, res["text"]))
+                else:
+                    zh_out.put(idx, translated["text"])
+
+        if failed_translate:
+            print(f"\n⚠️  {len(failed_translate)} chunks failed translation. Starting Recovery Pass...")
+        for idx, text in sorted(failed_translate):
+            print(f"  🚑 [Pass 2] Retrying translation of chunk {idx+1}...")
+            res = process_single_chunk(translate_transcript, text, idx, total)
+            if res["status"] == chunk_status.SUCCESS:
+                print(f"    ✅ Recovered chunk {idx+1}!")
+            else:
+                print(f"    ❌ Chunk {idx+1} failed again. Keeping original text.")
+            zh_out.put(idx, res["text"])
+    finally:
+        cleaned_out.close()
+        if zh_out:
+            zh_out.close()
+
+def process_file(input_file, clean_only=False, workers=DEFAULT_WORKERS):
     if not os.path.exists(input_file):
         print(f"❌ Error: Input file '{input_file}' not found.")
         return
@@ -238,40 +512,41 @@ def process_file(input_file, clean_only=False):
         print("❌ Error: File is empty.")
         return
 
-    # --- Step 1: Cleaning ---
+    # Cleaning and translation run as one streaming pipeline over the same
+    # chunks; both files grow as chunks finish
     chunks = split_text_into_chunks(raw_text)
-    full_cleaned_text = robust_batch_process(chunks, clean_transcript, phase_name="Cleaning")
-    
-    # Save cleaned
     base_name = os.path.splitext(input_file)[0]
     cleaned_file = f"{base_name}_cleaned.txt"
-    with open(cleaned_file, 'w', encoding='utf-8') as f:
-        f.write(full_cleaned_text)
-    print(f"✅ Saved clean text to: {cleaned_file}")
-
+    zh_file = None if clean_only else f"{base_name}_zh.txt"
     if clean_only:
         print("🛑 --clean-only flag set. Skipping translation.")
-        return
 
-    # --- Step 2: Translation ---
-    # Re-chunk safely
-    translate_chunks = split_text_into_chunks(full_cleaned_text)
-    full_translated_text = robust_batch_process(translate_chunks, translate_transcript, phase_name="Translating")
-    
-    # Save translated
-    zh_file = f"{base_name}_zh.txt"
-    with open(zh_file, 'w', encoding='utf-8') as f:
-        f.write(full_translated_text)
-    print(f"✅ Saved translation to: {zh_file}")
+    pipelined_process(chunks, cleaned_file, zh_file, workers=workers)
+    print(f"✅ Saved clean text to: {cleaned_file}")
+    if zh_file:
+        print(f"✅ Saved translation to: {zh_file}")
 
 def main():
     parser = argparse.ArgumentParser(description='Clean and Translate Transcriptions')
     parser.add_argument('input_file', help='Path to the input text file')
     parser.add_argument('--clean-only', action='store_true', help='Only clean the transcript, skip translation')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, metavar='N',
+                        help=f'Send up to N chunks at once (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--max-rps', type=float, default=DEFAULT_MAX_RPS, metavar='RPS',
+                        help=f'Request rate to start from; halved on every 429 and slowly raised again (default: {DEFAULT_MAX_RPS}, 0 = unlimited)')
+    parser.add_argument('--stub', action='store_true',
+                        help='Use an offline stub model that echoes the text (no API key needed)')
+    parser.add_argument('--stub-latency', type=float, default=0.5, metavar='SECONDS',
+                        help='Response time of the --stub model (default: 0.5)')
+    parser.add_argument('--stub-rps', type=float, default=None, metavar='RPS',
+                        help='Requests per second the --stub model accepts before answering 429 (default: unlimited)')
     
     args = parser.parse_args()
     
-    process_file(args.input_file, clean_only=args.clean_only)
+    if args.stub:
+        use_stub_client(latency=args.stub_latency, max_rps=args.stub_rps)
+    configure_rate_limit(args.max_rps)
+    process_file(args.input_file, clean_only=args.clean_only, workers=args.workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+from bisect import bisect_right
+
+from shard_publisher import dumps_compact
+
+# Default shard size the planner aims for (serialized JSON bytes)
+DEFAULT_TARGET_BYTES = 32 * 1024
+# An incrementally updated shard this many times over target triggers a re-plan
+REPLAN_FACTOR = 2
+
+
+def lemma_bytes(lemma, entries):
+    """Approximate serialized size of one lemma's `"lemma":[...],` member"""
+    return len(dumps_compact(entries)) + len(lemma.encode('utf-8')) + 4
+
+
+def routing_prefix(previous, lemma):
+    """Shortest prefix of `lemma` that sorts after `previous` (previous < lemma)"""
+    common = 0
+    for a, b in zip(previous, lemma):
+        if a != b:
+            break
+        common += 1
+    return lemma[:common + 1]
+
+
+class ShardPlanner:
+    """
+    Splits a lemma-sorted stream into prefix ranges of roughly
+    `target_bytes` each, instead of one shard per first letter (which made
+    "s" hundreds of times larger than "z").
+
+    The routing table is a list of [start prefix, shard key] pairs sorted
+    by prefix: a lemma lives in the last shard whose start is <= the lemma.
+    Starts are the shortest prefixes that separate neighbouring shards, so
+    the table stays small enough to ship in the manifest.
+    """
+    def __init__(self, target_bytes=DEFAULT_TARGET_BYTES):
+        self.target_bytes = target_bytes
+        self.routing = []
+        self._size = 0
+        self._last = None
+
+    def add(self, lemma, size):
+        """Place the next lemma (in sorted order); returns its shard key"""
+        if self._last is None or (self._size and self._size + size > self.target_bytes):
+            start = "" if self._last is None else routing_prefix(self._last, lemma)
+            self.routing.append([start, f"{len(self.routing):03d}"])
+            self._size = 0
+        self._size += size
+        self._last = lemma
+        return self.routing[-1][1]
+
+
+def plan_index(index, target_bytes=DEFAULT_TARGET_BYTES):
+    """
+    Shard a whole {lemma: entries} index.
+
+    Returns:
+        ({shard key: {lemma: entries}}, routing table)
+    """
+    planner = ShardPlanner(target_bytes)
+    shards = {}
+    for lemma in sorted(index):
+        key = planner.add(lemma, lemma_bytes(lemma, index[lemma]))
+        shards.setdefault(key, {})[lemma] = index[lemma]
+    return shards, planner.routing
+
+
+def route(routing, lemma):
+    """Shard key of `lemma` in a routing table"""
+    starts = [start for start, _ in routing]
+    return routing[max(0, bisect_right(starts, lemma) - 1)][1]
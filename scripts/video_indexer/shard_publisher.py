@@ -0,0 +1,399 @@
+import os
+import json
+import gzip
+import time
+import uuid
+import shutil
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from binary_shard import encode_shard
+from bloom_filter import BloomFilter
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False  # Windows: manifest updates from concurrent processes are not serialized
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK_NAME = "manifest.lock"
+# Content-addressed shard files, safe to cache forever
+SHARD_SUBDIR = "shards"
+# Content-addressed per-video context tables (context_table.VideoContexts)
+CONTEXT_SUBDIR = "contexts"
+# Characters of the SHA-256 kept in shard file names
+HASH_PREFIX = 16
+# Bloom filters are sized for this many times the lemmas, so partial updates can add to them
+BLOOM_HEADROOM = 1.25
+# Per-index shard size reports (raw / gzip / brotli), meant to be committed and diffed
+SIZE_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "size_reports")
+
+
+@contextmanager
+def _manifest_lock(output_dir):
+    """Exclusive lock on manifest.lock for a manifest read-modify-write"""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, MANIFEST_LOCK_NAME), 'a') as lock:
+        if HAS_FCNTL:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def dumps_compact(data):
+    """Compact UTF-8 JSON bytes (orjson when installed, same output shape as json)"""
+    if HAS_ORJSON:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compress_variants(payload):
+    """
+    Precompressed variants of a shard at maximum compression, as
+    {manifest field: (file suffix, bytes)}. gzip gets a fixed mtime so equal
+    shards give equal bytes; brotli is skipped when the module is missing.
+    """
+    variants = {"gzip": (".gz", gzip.compress(payload, compresslevel=9, mtime=0))}
+    if HAS_BROTLI:
+        variants["br"] = (".br", brotli.compress(payload, quality=11))
+    return variants
+
+
+def _write_bytes(path, payload):
+    with open(path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 0, "indexes": {}}
+
+
+def load_merged_words(output_dir, prefix="index_all"):
+    """
+    {platform: set of lemmas} from a merged index (unified_indexer.py), or
+    None if there is none or one of its platforms' own index was published
+    after it (so the merged one is stale for that platform)
+    """
+    indexes = load_manifest(output_dir).get("indexes", {})
+    merged = indexes.get(prefix)
+    if not merged or "platforms" not in merged:
+        return None
+    platforms = merged["platforms"]
+    if any(indexes.get(f"index_{p}", {}).get("version", 0) > merged["version"] for p in platforms):
+        return None
+    words = {platform: set() for platform in platforms}
+    for shard in merged["shards"].values():
+        with open(os.path.join(output_dir, shard["file"]), 'r', encoding='utf-8') as f:
+            for lemma, entries in json.load(f).items():
+                for entry in entries:
+                    words[platforms[entry.get("p", 0)]].add(lemma)
+    return words
+
+
+class ShardPublisher:
+    """
+    Publishes one index's shards (e.g. prefix "index_bilibili") atomically.
+
+    stage() serializes shards on a thread pool into a staging directory;
+    commit() moves them to content-addressed names under shards/, then
+    swaps in a new manifest.json with os.replace, which is the single
+    switch the frontend sees: until then it keeps reading the previous
+    version, so a crash mid-run never leaves a half-written index behind.
+
+    After the swap the legacy <prefix>_<key>.json names are refreshed (each
+    one atomically) for the analysis scripts and older frontends.
+
+    Context tables referenced by the shards' entries are staged the same
+    way (stage_context) and listed per platform under the manifest's
+    "contexts", so shards and tables switch together.
+    """
+    def __init__(self, output_dir, prefix, workers=None, binary=False):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        # Also write the binary_shard encoding (<prefix>_<key>.<hash>.bin)
+        self.binary = binary
+        self.staging_dir = os.path.join(output_dir, ".staging", f"{prefix}-{os.getpid()}")
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        os.makedirs(self.staging_dir)
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 4))
+        self._staged = {}
+        self._staged_contexts = {}
+        self._keep_contexts = {}
+
+    def stage(self, key, data):
+        """Serialize shard `key` ({lemma: entries}) in the background"""
+        self._staged[key] = self._pool.submit(self._write_staged, key, data)
+
+    def stage_context(self, platform, video_id, table):
+        """Serialize a video's context table in the background"""
+        video_id = str(video_id)
+        self._staged_contexts[(platform, video_id)] = self._pool.submit(
+            self._write_staged_context, platform, video_id, table)
+
+    def keep_contexts(self, platform, video_ids):
+        """Unpublish the context tables of `platform` videos not in `video_ids` at commit"""
+        self._keep_contexts[platform] = {str(v) for v in video_ids}
+
+    def _write_staged_context(self, platform, video_id, table):
+        payload = dumps_compact(table)
+        path = os.path.join(self.staging_dir, f"context_{platform}_{video_id}.json")
+        _write_bytes(path, payload)
+        return {"path": path, "sha256": hashlib.sha256(payload).hexdigest()}
+
+    def _write_staged(self, key, data, payload=None):
+        payload = payload if payload is not None else dumps_compact(data)
+        path = os.path.join(self.staging_dir, f"{self.prefix}_{key}.json")
+        _write_bytes(path, payload)
+        encodings = {}
+        for encoding, (suffix, compressed) in compress_variants(payload).items():
+            _write_bytes(path + suffix, compressed)
+            encodings[encoding] = (suffix, len(compressed))
+        info = {"path": path, "size": len(payload), "sha256": hashlib.sha256(payload).hexdigest(),
+                "words": len(data), "encodings": encodings, "lemmas": list(data)}
+        if self.binary:
+            binary = encode_shard(data)
+            _write_bytes(path[:-len(".json")] + ".bin", binary)
+            info["bin"] = len(binary)
+        return info
+
+    def _shard_key(self, filename, suffix=".json"):
+        """Shard key of "<prefix>_<key><suffix>", or None (e.g. another prefix's file)"""
+        if not (filename.startswith(f"{self.prefix}_") and filename.endswith(suffix)):
+            return None
+        key = filename[len(self.prefix) + 1:len(filename) - len(suffix)]
+        return key if key and "_" not in key and "." not in key else None
+
+    def _adopt_legacy(self):
+        """Stage existing legacy shards the first time a partial update meets an unmanaged index"""
+        for filename in os.listdir(self.output_dir):
+            key = self._shard_key(filename)
+            if key is None or key in self._staged:
+                continue
+            with open(os.path.join(self.output_dir, filename), 'rb') as f:
+                payload = f.read()
+            self._staged[key] = self._pool.submit(self._write_staged, key, json.loads(payload), payload)
+
+    def commit(self, replace=True, routing=None, target_bytes=None, platforms=None):
+        """
+        Publish the staged shards.
+
+        Args:
+            replace: True for a full rebuild (shards that were not staged are
+                dropped from the manifest); False to update only the staged
+                shards and keep the others
+            routing: [[start prefix, shard key], ...] from shard_planner, or
+                None for first-letter keys (a partial update keeps the
+                current table)
+            target_bytes: Shard size the routing table was planned for
+            platforms: Platform names of a merged index, in the order its
+                entries' "p" tags refer to (a partial update keeps the
+                current list)
+
+        Returns:
+            {legacy filename: word count} of the staged shards
+        """
+        # Held from reading the manifest through its garbage collection, so
+        # concurrent publishers (the two indexers) never drop each other's updates
+        with _manifest_lock(self.output_dir):
+            manifest = load_manifest(self.output_dir)
+            if not replace and self.prefix not in manifest.get("indexes", {}):
+                self._adopt_legacy()
+            staged = {key: future.result() for key, future in self._staged.items()}
+            staged_contexts = {key: future.result() for key, future in self._staged_contexts.items()}
+            self._pool.shutdown()
+
+            shard_dir = os.path.join(self.output_dir, SHARD_SUBDIR)
+            os.makedirs(shard_dir, exist_ok=True)
+            current = manifest.get("indexes", {}).get(self.prefix, {})
+            previous = current.get("shards", {})
+            if not replace and routing is None:
+                routing, target_bytes = current.get("routing"), current.get("target_bytes")
+            if not replace and platforms is None:
+                platforms = current.get("platforms")
+            shards = {} if replace else dict(previous)
+            for key, info in sorted(staged.items()):
+                filename = f"{self.prefix}_{key}.{info['sha256'][:HASH_PREFIX]}.json"
+                os.replace(info["path"], os.path.join(shard_dir, filename))
+                shards[key] = {"file": f"{SHARD_SUBDIR}/{filename}", "size": info["size"],
+                               "sha256": info["sha256"], "words": info["words"]}
+                # Precompressed siblings: <file>.gz / <file>.br, sizes in the manifest
+                for encoding, (suffix, size) in info["encodings"].items():
+                    os.replace(info["path"] + suffix, os.path.join(shard_dir, filename + suffix))
+                    shards[key][encoding] = size
+                if "bin" in info:
+                    os.replace(info["path"][:-len(".json")] + ".bin",
+                               os.path.join(shard_dir, filename[:-len(".json")] + ".bin"))
+                    shards[key]["bin"] = info["bin"]
+
+            bloom = self._build_bloom(None if replace else current.get("bloom"), staged, shards)
+            previous_contexts = manifest.get("contexts", {})
+            contexts = self._move_contexts(staged_contexts, previous_contexts)
+
+            # The atomic switch: readers see either the old or the new manifest
+            manifest["version"] = manifest.get("version", 0) + 1
+            manifest["generated_at"] = int(time.time())
+            entry = {"version": manifest["version"], "generated_at": manifest["generated_at"],
+                     "binary": self.binary, "bloom": bloom.to_manifest(), "shards": shards}
+            if routing is not None:
+                entry.update(sharding="prefix-range", target_bytes=target_bytes, routing=routing)
+            else:
+                entry["sharding"] = "alphabet"
+            if platforms is not None:
+                entry["platforms"] = list(platforms)
+            manifest.setdefault("indexes", {})[self.prefix] = entry
+            if contexts:
+                manifest["contexts"] = contexts
+            manifest_path = os.path.join(self.output_dir, MANIFEST_NAME)
+            tmp = f"{manifest_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+            _write_bytes(tmp, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+            os.replace(tmp, manifest_path)
+
+            self._refresh_legacy(shards, previous)
+            self._collect_garbage(shards, previous)
+            self._collect_context_garbage(contexts, previous_contexts)
+        self._write_size_report(shards, routing)
+        self._remove_staging()
+        return {f"{self.prefix}_{key}.json": staged[key]["words"] for key in sorted(staged)}
+
+    def _build_bloom(self, previous, staged, shards):
+        """
+        Membership filter over every lemma of the index. A partial update ORs
+        the staged lemmas into the previous filter while it has room; lemmas
+        of replaced shard versions stay set (false positives, never false
+        negatives) until a rebuild, which reads the untouched shards.
+        """
+        lemmas = [lemma for info in staged.values() for lemma in info["lemmas"]]
+        if previous:
+            bloom = BloomFilter.from_manifest(previous)
+            # Most staged lemmas were published before; only new ones fill the filter
+            added = [lemma for lemma in lemmas if lemma not in bloom]
+            if bloom.count + len(added) <= bloom.capacity():
+                for lemma in added:
+                    bloom.add(lemma)
+                return bloom
+        for key in shards.keys() - staged.keys():
+            with open(os.path.join(self.output_dir, shards[key]["file"]), 'rb') as f:
+                lemmas.extend(json.loads(f.read()))
+        return BloomFilter.from_items(lemmas, capacity=int(len(lemmas) * BLOOM_HEADROOM))
+
+    def _move_contexts(self, staged, previous):
+        """{platform: {video id: file}} with the staged tables moved under contexts/"""
+        context_dir = os.path.join(self.output_dir, CONTEXT_SUBDIR)
+        os.makedirs(context_dir, exist_ok=True)
+        contexts = {platform: dict(files) for platform, files in previous.items()}
+        for (platform, video_id), info in sorted(staged.items()):
+            filename = f"context_{platform}_{video_id}.{info['sha256'][:HASH_PREFIX]}.json"
+            os.replace(info["path"], os.path.join(context_dir, filename))
+            contexts.setdefault(platform, {})[video_id] = f"{CONTEXT_SUBDIR}/{filename}"
+        for platform, keep in self._keep_contexts.items():
+            contexts[platform] = {video_id: file for video_id, file in contexts.get(platform, {}).items()
+                                  if video_id in keep}
+        return contexts
+
+    def _collect_context_garbage(self, contexts, previous):
+        """Drop context tables neither manifest version lists, for the platforms this commit touched"""
+        platforms = {platform for platform, _ in self._staged_contexts} | self._keep_contexts.keys()
+        if not platforms:
+            return
+        keep = {os.path.basename(file) for files in list(contexts.values()) + list(previous.values())
+                for file in files.values()}
+        prefixes = tuple(f"context_{platform}_" for platform in platforms)
+        context_dir = os.path.join(self.output_dir, CONTEXT_SUBDIR)
+        for filename in os.listdir(context_dir):
+            if filename.startswith(prefixes) and filename not in keep:
+                os.remove(os.path.join(context_dir, filename))
+        # Unhashed tables of earlier versions, overwritten in place (superseded by the manifest list)
+        for filename in os.listdir(self.output_dir):
+            if filename.startswith(prefixes) and filename.endswith(".json"):
+                os.remove(os.path.join(self.output_dir, filename))
+
+    def abort(self):
+        self._pool.shutdown(cancel_futures=True)
+        self._remove_staging()
+
+    def _remove_staging(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.staging_dir))
+        except OSError:
+            pass  # Another publisher is still staging
+
+    def _refresh_legacy(self, shards, previous):
+        for key, info in shards.items():
+            legacy = os.path.join(self.output_dir, f"{self.prefix}_{key}.json")
+            if previous.get(key, {}).get("sha256") == info["sha256"] and os.path.exists(legacy):
+                continue
+            shutil.copyfile(os.path.join(self.output_dir, info["file"]), f"{legacy}.tmp")
+            os.replace(f"{legacy}.tmp", legacy)
+        # Shards no longer published (e.g. after re-planning) would be double-counted by scripts
+        for filename in os.listdir(self.output_dir):
+            key = self._shard_key(filename)
+            if key is not None and key not in shards:
+                os.remove(os.path.join(self.output_dir, filename))
+
+    def _collect_garbage(self, shards, previous):
+        """Drop hashed files older than the previous version (clients may still hold its manifest)"""
+        # "<prefix>_<key>.<hash>" stems: the .json file plus its .gz / .br / .bin variants
+        keep = {os.path.basename(info["file"]).split(".json")[0]
+                for info in list(shards.values()) + list(previous.values())}
+        shard_dir = os.path.join(self.output_dir, SHARD_SUBDIR)
+        for filename in os.listdir(shard_dir):
+            stem = ".".join(filename.split(".")[:2])
+            if stem not in keep and self._shard_key(filename.split(".", 1)[0], "") is not None:
+                os.remove(os.path.join(shard_dir, filename))
+
+    def _write_size_report(self, shards, routing):
+        """One line per shard (raw / gzip / brotli / binary bytes), stable order so runs can be diffed"""
+        starts = {key: start for start, key in routing or []}
+        lines = ["shard\tstart\twords\traw\tgzip\tbrotli\tbinary"]
+        totals = [0, 0, 0, 0, 0]
+        for key in sorted(shards):
+            info = shards[key]
+            sizes = [info["words"], info["size"], info.get("gzip", 0), info.get("br", 0), info.get("bin", 0)]
+            totals = [a + b for a, b in zip(totals, sizes)]
+            lines.append("\t".join([key, starts.get(key, key)] + [str(n) for n in sizes]))
+        lines.append("\t".join(["total", ""] + [str(n) for n in totals]))
+        os.makedirs(SIZE_REPORT_DIR, exist_ok=True)
+        with open(os.path.join(SIZE_REPORT_DIR, f"{self.prefix}.tsv"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def publish_shards(output_dir, prefix, shards, replace=True, routing=None, target_bytes=None, workers=None,
+                   binary=False, platforms=None, contexts=None):
+    """
+    Publish {key: {lemma: entries}} shards in one atomic manifest update
+    (see ShardPublisher.commit for the arguments), together with the
+    pending tables of `contexts` (a VideoContexts) when given.
+
+    Returns:
+        {legacy filename: word count}
+    """
+    publisher = ShardPublisher(output_dir, prefix, workers, binary)
+    try:
+        for key, data in shards.items():
+            publisher.stage(key, data)
+        if contexts is not None:
+            contexts.publish(publisher)
+        return publisher.commit(replace=replace, routing=routing, target_bytes=target_bytes, platforms=platforms)
+    except BaseException:
+        publisher.abort()
+        raise
@@ -0,0 +1,104 @@
+"""
+Reconstruction of words that teachers spell out letter by letter.
+
+ASR turns "A-B-L-E" into either one hyphenated token ("a-b-l-e") or a
+run of single-letter words ("A", "B", "L", "E"). Both used to end up in
+the index as junk ("a-b-a-n-d-u-n", "a-c-l-e") or not at all, while the
+spelled word is exactly what is being taught. The tokenizer (see
+tokenizer.py) collects such letter runs while it streams over the hits
+and asks SpellingMatcher which word book word they spell; the
+occurrence is then indexed under that word with the intro flag set.
+"""
+import os
+import glob
+import json
+
+from lemmatizer import WORD_BOOK_DIR, load_word_book
+
+# Shorter runs are initials and abbreviations ("U S", "a-c")
+MIN_LETTERS = 3
+# Runs at least this long may be matched with one letter misheard or missing
+FUZZY_MIN_LETTERS = 5
+
+
+def load_vocabulary(directory=WORD_BOOK_DIR):
+    """
+    Words of every list in public/cihuibiao: the word book CSVs, plus JSON
+    lists ([word, ...] or [{"word": ...}, ...], as in the
+    KyleBing/english-vocabulary files cihui_full points to)
+    """
+    words = set(load_word_book(directory))
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.json"), recursive=True)):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Skipping word list {path}: {e}")
+            continue
+        for item in items if isinstance(items, list) else []:
+            word = item.get("word") if isinstance(item, dict) else item
+            if isinstance(word, str) and word.isalpha():
+                words.add(word.lower())
+    return words
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class SpellingMatcher:
+    """
+    Maps spelled letters to a vocabulary word: an exact match, or for
+    longer runs the only word one edit (a misheard, missing or extra
+    letter) away, found through single-deletion variants.
+    """
+    def __init__(self, vocabulary):
+        self.vocabulary = frozenset(vocabulary)
+        self._variants = {}
+        for word in self.vocabulary:
+            if len(word) >= FUZZY_MIN_LETTERS - 1:
+                for variant in _deletes(word) | {word}:
+                    self._variants.setdefault(variant, set()).add(word)
+        self._matches = {}
+
+    def match(self, letters):
+        """Vocabulary word spelled by `letters` (lowercase), or None"""
+        if letters in self._matches:
+            return self._matches[letters]
+        word = None
+        if len(letters) >= MIN_LETTERS:
+            if letters in self.vocabulary:
+                word = letters
+            elif len(letters) >= FUZZY_MIN_LETTERS:
+                candidates = set()
+                for variant in _deletes(letters) | {letters}:
+                    candidates |= self._variants.get(variant, set())
+                candidates = {c for c in candidates if abs(len(c) - len(letters)) <= 1}
+                if len(candidates) == 1:
+                    word = candidates.pop()
+        self._matches[letters] = word
+        return word
+
+
+def spelled_letters(raw):
+    """
+    Letters spelled by a hyphenated token ("a-b-l-e", "a-b-l-e-able"), or
+    None if it does not start with a run of 2+ single letters
+    """
+    parts = raw.split('-')
+    run = 0
+    while run < len(parts) and len(parts[run]) == 1:
+        run += 1
+    if run < 2:
+        return None
+    return "".join(parts[:run]).lower()
+
+
+_default_matcher = None
+
+
+def get_default_matcher():
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = SpellingMatcher(load_vocabulary())
+    return _default_matcher
@@ -0,0 +1,157 @@
+"""
+Single-pass tokenizer for the indexing loop (index_video_words).
+
+The per-word loop ran a regex findall on every ASR word, then lemmatized
+and validated each hit (hyphen strip + isalpha, an ord() < 128 scan, the
+length rule, STOP_WORDS). Here the pattern runs once over the whole
+transcript joined by newlines (which it never matches, so hits cannot
+span words) and match offsets are mapped back to word indices with one
+vectorized searchsorted. The pattern only matches ASCII letters and
+hyphens, which is the whole validation, so the remaining per-hit work is
+one dict lookup of the raw token: its lemma, or None when the length rule
+or the stop words reject it. The context flags of each hit's window come
+from the same joined text (the intro and CJK patterns, also run once).
+Spelled-out words are reconstructed in the same stream (see spelling.py).
+
+Benchmark against the per-word loop: python bench_tokenizer.py
+"""
+import re
+
+import numpy as np
+
+from context_table import CONTEXT_WINDOW, INTRO_RE, CJK_RE, FLAG_INTRO, FLAG_CJK
+from spelling import MIN_LETTERS, spelled_letters
+
+# English words (hyphenated compounds included): ASCII letters only
+WORD_RE = re.compile(r'[a-zA-Z]+(?:-[a-zA-Z]+)*')
+SEPARATOR = "\n"
+# One match per run of CJK characters instead of one per character
+CJK_RUN_RE = re.compile(CJK_RE.pattern + '+')
+# WORD_RE splits contractions at these ("I'm" -> "I", "m"; "it's" -> "it", "s")
+APOSTROPHES = "'’"
+
+
+class Tokenizer:
+    """
+    Finds the indexable lemmas of a word list.
+
+    Args:
+        lemmatize: Callable raw token -> lemma (TextProcessor.lemmatize)
+        stop_words: Lemmas that are never indexed
+        speller: spelling.SpellingMatcher to reconstruct spelled-out words
+            with, or None to leave letter runs alone
+    """
+    def __init__(self, lemmatize, stop_words=frozenset(), speller=None):
+        self._lemmatize = lemmatize
+        self._stop_words = stop_words
+        self._speller = speller
+        # {raw token: (lemma or None, extra context flags)}, so each
+        # distinct token is judged once
+        self._lemmas = {}
+
+    def _indexable(self, word):
+        lemma = self._lemmatize(word)
+        if not lemma or (len(lemma) < 2 and lemma not in ('a', 'i')) or lemma in self._stop_words:
+            return None
+        return lemma
+
+    def lemma(self, raw):
+        """(indexable lemma or None, extra context flags) of one regex hit"""
+        try:
+            return self._lemmas[raw]
+        except KeyError:
+            letters = spelled_letters(raw) if self._speller is not None else None
+            if letters is None:
+                result = (self._indexable(raw), 0)
+            else:
+                # A spelled-out word ("a-b-l-e"): the word it spells, or junk
+                word = self._speller.match(letters)
+                result = (self._indexable(word), FLAG_INTRO) if word else (None, 0)
+            self._lemmas[raw] = result
+            return result
+
+    def scan(self, words, window=CONTEXT_WINDOW):
+        """
+        (word index, lemma, context flags) of every indexable hit in `words`
+        (a list of ASR word strings), in transcript order. The flags are
+        those of the `window` words around the hit: the OR of those words'
+        context_flags, since no intro pattern spans a space.
+
+        With a speller, runs of single-letter hits in adjacent words
+        ("A", "B", "L", "E") are collected as the hits stream by and
+        yield one hit of the word they spell, at the first letter; like
+        spelled hyphenated tokens, it gets FLAG_INTRO (the word is being
+        taught). Letters next to an apostrophe are pieces of a contraction,
+        not spelled letters: they end the run instead of joining it.
+        """
+        if not words:
+            return []
+        text = SEPARATOR.join(words)
+        hits = [(m.start(), m.group()) for m in WORD_RE.finditer(text)]
+        if not hits:
+            return []
+        # Exclusive end offset of each word including its separator
+        ends = np.cumsum(np.fromiter(map(len, words), dtype=np.int64, count=len(words)) + 1)
+        indices = _word_indices(ends, (pos for pos, _ in hits), len(hits))
+        flags = _window_flags(text, ends, indices, window).tolist()
+
+        lemmas = self._lemmas
+        spelling = self._speller is not None
+        run, run_start, run_last, run_flags = [], -1, -2, 0
+        result = []
+        for i, (pos, raw), f in zip(indices.tolist(), hits, flags):
+            if spelling:
+                if len(raw) == 1 and not _contraction_part(text, pos):
+                    if i - run_last > 1:
+                        self._spelled_run(run, run_start, run_flags, result)
+                        run, run_start, run_flags = [], i, f
+                    run.append(raw)
+                    run_last = i
+                    continue
+                if run:
+                    self._spelled_run(run, run_start, run_flags, result)
+                    run, run_last = [], -2
+            lemma, extra = lemmas[raw] if raw in lemmas else self.lemma(raw)
+            if lemma is not None:
+                result.append((i, lemma, f | extra))
+        if spelling:
+            self._spelled_run(run, run_start, run_flags, result)
+        return result
+
+    def _spelled_run(self, run, start, flags, result):
+        """Append the hit of a finished single-letter run if it spells a word"""
+        if len(run) < MIN_LETTERS:
+            return
+        word = self._speller.match("".join(run).lower())
+        lemma = self._indexable(word) if word else None
+        if lemma is not None:
+            result.append((start, lemma, flags | FLAG_INTRO))
+
+
+def _contraction_part(text, pos):
+    """Whether the one-letter hit at `pos` touches an apostrophe ("I'm", "it's")"""
+    return (pos > 0 and text[pos - 1] in APOSTROPHES) or (pos + 1 < len(text) and text[pos + 1] in APOSTROPHES)
+
+
+def _word_indices(ends, positions, count=-1):
+    """Word index of each text offset"""
+    return np.searchsorted(ends, np.fromiter(positions, dtype=np.int64, count=count), side='right')
+
+
+def _window_flags(text, ends, indices, window):
+    """
+    Context flags of the window around each word in `indices`. None of the
+    patterns can match a separator, so a word has a flag exactly when a
+    match starts inside it; a window has it when any of its words does
+    (counted with a prefix sum).
+    """
+    n = len(ends)
+    lo = np.maximum(indices - window, 0)
+    hi = np.minimum(indices + window + 1, n)
+    flags = np.zeros(len(indices), dtype=np.int64)
+    for pattern, flag in ((INTRO_RE, FLAG_INTRO), (CJK_RUN_RE, FLAG_CJK)):
+        has = np.zeros(n, dtype=np.int64)
+        has[_word_indices(ends, (m.start() for m in pattern.finditer(text)))] = 1
+        counts = np.concatenate(([0], np.cumsum(has)))
+        flags |= np.where(counts[hi] > counts[lo], flag, 0)
+    return flags
@@ -0,0 +1,73 @@
+import sys
+from array import array
+
+
+class Transcript:
+    """
+    Columnar word-level transcript.
+
+    Replaces the list of {'word', 'start', 'end'} dicts the engines used to
+    return: word texts live in one list of interned strings (repeated words
+    share a single object) and timestamps in two array('d') columns, so a
+    100k-word transcript is three containers instead of 100k dicts.
+
+    Iterating or indexing still yields {'word', 'start', 'end'} dicts for
+    code that has not been ported; hot loops should read the columns.
+    """
+    __slots__ = ("words", "starts", "ends")
+
+    def __init__(self, words=None, starts=None, ends=None):
+        self.words = [sys.intern(w) for w in words] if words else []
+        self.starts = starts if isinstance(starts, array) else array('d', starts or ())
+        self.ends = ends if isinstance(ends, array) else array('d', ends or ())
+
+    @classmethod
+    def from_dicts(cls, words):
+        """Build from the legacy [{'word', 'start', 'end'}, ...] shape"""
+        transcript = cls()
+        for w in words:
+            transcript.append(w['word'], w['start'], w['end'])
+        return transcript
+
+    def to_dicts(self):
+        return [{'word': w, 'start': s, 'end': e} for w, s, e in zip(self.words, self.starts, self.ends)]
+
+    def append(self, word, start, end):
+        self.words.append(sys.intern(word))
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, other):
+        other = as_transcript(other)
+        self.words.extend(other.words)
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+
+    def context(self, index, window=5):
+        """Words within `window` positions of `index`, joined with spaces"""
+        return " ".join(self.words[max(0, index - window):index + window + 1])
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        return {'word': self.words[index], 'start': self.starts[index], 'end': self.ends[index]}
+
+    def __iter__(self):
+        for w, s, e in zip(self.words, self.starts, self.ends):
+            yield {'word': w, 'start': s, 'end': e}
+
+    def __eq__(self, other):
+        if not isinstance(other, Transcript):
+            return NotImplemented
+        return self.words == other.words and self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self):
+        return f"Transcript({len(self)} words)"
+
+
+def as_transcript(words):
+    """Accept a Transcript or a legacy list of word dicts"""
+    if isinstance(words, Transcript):
+        return words
+    return Transcript.from_dicts(words)
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import glob
+import struct
+import hashlib
+import argparse
+import threading
+from array import array
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False  # Windows: index writes from concurrent processes are not serialized
+
+from transcript import Transcript, as_transcript
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shared by bilibili_indexer, youtube_indexer and youtube_to_text
+DEFAULT_STORE_DIR = os.path.join(SCRIPT_DIR, "transcript_store")
+
+STORE_VERSION = 1
+PAYLOAD_MAGIC = b"STR1"
+# magic, word count, string count, string table byte length
+PAYLOAD_HEADER = struct.Struct("<4sIII")
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def encode_words(words):
+    """
+    Columnar binary encoding of a transcript (Transcript or word dict list):
+    header | starts (float64[n]) | ends (float64[n]) | string ids (uint32[n]) | string table
+    The string table is the distinct word texts, UTF-8, NUL separated.
+    """
+    transcript = as_transcript(words)
+    strings = {}
+    ids = array('I', [strings.setdefault(w, len(strings)) for w in transcript.words])
+    starts = array('d', transcript.starts)
+    ends = array('d', transcript.ends)
+
+    table = "\0".join(strings).encode('utf-8')
+    if sys.byteorder != 'little':
+        for column in (ids, starts, ends):
+            column.byteswap()
+    return b"".join([
+        PAYLOAD_HEADER.pack(PAYLOAD_MAGIC, len(ids), len(strings), len(table)),
+        starts.tobytes(), ends.tobytes(), ids.tobytes(), table
+    ])
+
+
+def decode_words(payload):
+    """Inverse of encode_words, returns a Transcript"""
+    magic, n, n_strings, table_len = PAYLOAD_HEADER.unpack_from(payload)
+    if magic != PAYLOAD_MAGIC:
+        raise ValueError("Not a transcript payload")
+
+    offset = PAYLOAD_HEADER.size
+    starts = array('d', payload[offset:offset + 8 * n])
+    offset += 8 * n
+    ends = array('d', payload[offset:offset + 8 * n])
+    offset += 8 * n
+    ids = array('I', payload[offset:offset + 4 * n])
+    offset += 4 * n
+    if sys.byteorder != 'little':
+        for column in (ids, starts, ends):
+            column.byteswap()
+
+    table = payload[offset:offset + table_len].decode('utf-8').split("\0") if n_strings else []
+    table = [sys.intern(t) for t in table]
+    transcript = Transcript(starts=starts, ends=ends)
+    transcript.words = [table[i] for i in ids]
+    return transcript
+
+
+class TranscriptStore:
+    """
+    Content-addressed transcription cache.
+
+    Entries are keyed by the SHA-256 of the media file plus the ASR
+    backend, model and cache version, so renamed or re-downloaded files hit
+    the cache and switching backends never reuses a stale transcript.
+    A single index.json answers "is it cached?" without opening any payload,
+    and remembers each path's hash by (size, mtime) so unchanged files are
+    not re-hashed. Several processes may share a store (e.g. the bilibili
+    and youtube indexers): each index write takes index.json.lock, re-reads
+    the file and applies only this process's changes on top of it.
+
+    Layout:
+        <root>/index.json
+        <root>/<key[:2]>/<key>.bin
+    """
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        # Changes not yet written, merged into the on-disk index by _save_index
+        self._dirty = {"entries": {}, "paths": {}}
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == STORE_VERSION:
+                    return data
+                print(f"    Transcript store version mismatch, starting a new index")
+            except Exception as e:
+                print(f"    Error loading transcript store index: {e}")
+        return {"version": STORE_VERSION, "entries": {}, "paths": {}}
+
+    def _save_index(self):
+        """Merge this process's changes into index.json (caller holds self._lock)"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(f"{self.index_path}.lock", 'a') as lock:
+            if HAS_FCNTL:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Entries other processes added since our last read survive
+            index = self._load_index()
+            for section, changes in self._dirty.items():
+                index[section].update(changes)
+            tmp = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, self.index_path)
+        self._index = index
+        self._dirty = {"entries": {}, "paths": {}}
+
+    def content_hash(self, media_path):
+        """SHA-256 of the file content, memoized by (size, mtime); None if the file is gone"""
+        path = os.path.abspath(media_path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            known = self._index["paths"].get(path)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["sha256"]
+
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(block)
+        except FileNotFoundError:
+            return None
+        sha = digest.hexdigest()
+
+        with self._lock:
+            self._index["paths"][path] = self._dirty["paths"][path] = {
+                "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+            self._save_index()
+        return sha
+
+    def key_for(self, media_path, backend, model, cache_version):
+        """Store key of a transcript, or None if the media file is gone (a cache miss)"""
+        content = self.content_hash(media_path)
+        if content is None:
+            return None
+        return hashlib.sha256(f"{content}|{backend}|{model}|{cache_version}".encode()).hexdigest()
+
+    def _payload_path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.bin")
+
+    def lookup(self, key):
+        """Index entry for `key` (no payload I/O), or None"""
+        if key is None:
+            return None
+        with self._lock:
+            return self._index["entries"].get(key)
+
+    def get(self, key):
+        """Cached {"info": ..., "words": [...]} for `key`, or None"""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        try:
+            with open(self._payload_path(key), 'rb') as f:
+                words = decode_words(f.read())
+        except Exception as e:
+            print(f"    Error loading cached transcript: {e}, will re-transcribe")
+            return None
+        return {"info": entry.get("info", {}), "words": words}
+
+    def put(self, key, words, info, meta=None):
+        payload_path = self._payload_path(key)
+        os.makedirs(os.path.dirname(payload_path), exist_ok=True)
+        # Unique per writer: two processes (or threads) may store the same audio at once
+        tmp = f"{payload_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(encode_words(words))
+        os.replace(tmp, payload_path)
+
+        entry = {"words": len(words), "info": info}
+        entry.update(meta or {})
+        with self._lock:
+            self._index["entries"][key] = self._dirty["entries"][key] = entry
+            self._save_index()
+
+    def stats(self):
+        with self._lock:
+            entries = dict(self._index["entries"])
+        payload_bytes = 0
+        for key in entries:
+            try:
+                payload_bytes += os.path.getsize(self._payload_path(key))
+            except OSError:
+                pass
+        return {"entries": len(entries), "words": sum(e["words"] for e in entries.values()),
+                "payload_bytes": payload_bytes}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TranscriptStore()
+        return _default_store
+
+
+def main():
+    from indexer_shared import load_transcription_cache, save_cached_transcript
+    from asr_backends import DEFAULT_BACKEND
+
+    parser = argparse.ArgumentParser(description='Content-addressed transcript cache maintenance')
+    parser.add_argument('--import-dir', nargs='+', metavar='DIR',
+                        help='Import legacy *.transcription.json caches found next to media files in DIR')
+    parser.add_argument('--backend', default=DEFAULT_BACKEND,
+                        help=f'Backend the legacy caches were produced with (default: {DEFAULT_BACKEND})')
+    parser.add_argument('--model', default='medium', help='Model size of the legacy caches (default: medium)')
+    args = parser.parse_args()
+
+    for directory in args.import_dir or []:
+        for cache_path in sorted(glob.glob(os.path.join(directory, "*.transcription.json"))):
+            media_path = cache_path[:-len(".transcription.json")]
+            data = load_transcription_cache(cache_path)
+            if not data or not os.path.exists(media_path):
+                continue
+            save_cached_transcript(media_path, data['words'], data.get('info', {}),
+                                   args.backend, args.model)
+            print(f"✓ Imported {os.path.basename(cache_path)} ({len(data['words'])} words)")
+
+    store = TranscriptStore()
+    stats = store.stats()
+    print(f"Transcript store: {stats['entries']} transcripts, {stats['words']} words, "
+          f"{stats['payload_bytes'] / 1024:.1f} KB in {store.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Unified Index Builder
+
+Builds one merged, platform-tagged index from the cached transcripts of
+every platform in a single pass, instead of one index family per indexer:
+
+    index_all_*.json        every lemma's occurrences on all platforms,
+                            each entry tagged "p" (position of its platform
+                            in the manifest's "platforms" list)
+    index_bilibili_*.json   per-platform views derived from the same pass,
+    index_youtube_*.json    so older readers and --incremental runs of the
+                            platform indexers keep working
+
+The frontend answers a lookup for any platform from the one merged shard
+(see videoIndexService.ts); the coverage scripts read all platforms from it.
+
+Transcription is not done here: run bilibili_indexer.py / youtube_indexer.py
+first (or with --skip-download) so the transcript cache and the
+video_map_<platform>.json files exist.
+
+Usage:
+    python unified_indexer.py
+    python unified_indexer.py --platforms youtube bilibili --binary-shards
+"""
+import os
+import json
+import argparse
+from collections import defaultdict
+
+from asr_backends import add_backend_argument
+from transcript import as_transcript
+from context_table import VideoContexts
+from index_lsm import IndexState
+from shard_publisher import publish_shards
+from shard_planner import DEFAULT_TARGET_BYTES, plan_index
+from indexer_shared import (
+    TextProcessor, load_cached_transcript, deduplicate_occurrences,
+    smart_filter_taught_words, index_video_words
+)
+
+# Configuration
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "public", "data")
+
+# Where each platform indexer keeps the media its video map's filenames refer
+# to, and the min_score it filters with
+PLATFORMS = {
+    "bilibili": {"media_dir": os.path.join(SCRIPT_DIR, "temp_downloads"), "min_score": 15},
+    "youtube": {"media_dir": os.path.join(SCRIPT_DIR, "temp_downloads_youtube"), "min_score": 5},
+}
+MERGED_PREFIX = "index_all"
+
+
+def load_video_map(platform):
+    """video_map_<platform>.json, or None if that platform was never indexed"""
+    path = os.path.join(OUTPUT_DIR, f"video_map_{platform}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def without_tag(entry):
+    return {k: v for k, v in entry.items() if k != "p"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the merged cross-platform index from cached transcripts')
+    parser.add_argument('--platforms', nargs='+', choices=list(PLATFORMS), default=list(PLATFORMS),
+                        help='Platforms to merge, in tag order (default: all)')
+    for platform, config in PLATFORMS.items():
+        parser.add_argument(f'--{platform}-min-score', type=int, default=config["min_score"], metavar='N',
+                            help=f'Minimum score to keep a {platform} word (default: {config["min_score"]})')
+    add_backend_argument(parser)
+    parser.add_argument('--shard-target-kb', type=int, default=DEFAULT_TARGET_BYTES // 1024, metavar='KB',
+                        help=f'Target size of each index shard (default: {DEFAULT_TARGET_BYTES // 1024})')
+    parser.add_argument('--binary-shards', action='store_true',
+                        help='Also publish the per-platform views in the compact binary format')
+    args = parser.parse_args()
+    shard_target_bytes = args.shard_target_kb * 1024
+
+    print("=" * 60)
+    print("Unified Index Builder")
+    print("=" * 60)
+
+    # 1. One pass over every platform's transcripts
+    processor = TextProcessor()
+    platforms = []
+    video_maps = {}
+    contexts = {}
+    # {platform: {lemma: [entries]}}; entries are tagged, so the merged
+    # index is just the union of the filtered per-platform lists
+    platform_index = {}
+    missing = []
+    for platform in args.platforms:
+        video_map = load_video_map(platform)
+        if video_map is None:
+            print(f"⚠️  No video_map_{platform}.json, skipping {platform}")
+            continue
+        tag = len(platforms)
+        platforms.append(platform)
+        video_maps[platform] = video_map
+        contexts[platform] = VideoContexts(OUTPUT_DIR, platform)
+        index = platform_index[platform] = defaultdict(list)
+
+        print(f"\n📚 Indexing {platform} ({len(video_map)} videos)...")
+        for video_id, info in video_map.items():
+            media_path = os.path.join(PLATFORMS[platform]["media_dir"], info.get("filename", ""))
+            cached = load_cached_transcript(media_path, args.asr_backend, "medium") if info.get("filename") else None
+            if not cached:
+                missing.append((platform, video_id, info.get("filename")))
+                continue
+            words = as_transcript(cached['words'])
+            contexts[platform].add(video_id, words.words)
+            for lemma, entry in index_video_words(words, video_id, processor):
+                entry["p"] = tag
+                index[lemma].append(entry)
+
+    if not platforms:
+        print("❌ Error: No platform has been indexed yet. Run bilibili_indexer.py / youtube_indexer.py first.")
+        return
+    if missing:
+        print(f"\n⚠️  {len(missing)} videos have no cached transcript ({args.asr_backend}) and were skipped:")
+        for platform, video_id, filename in missing[:10]:
+            print(f"  - {platform} {video_id}: {filename}")
+        if len(missing) > 10:
+            print(f"  ... and {len(missing) - 10} more")
+
+    # 2. Filter each platform with its own threshold, then merge
+    merged = defaultdict(list)
+    views = {}
+    for platform in platforms:
+        index = platform_index[platform]
+        min_score = getattr(args, f"{platform}_min_score")
+        print(f"\nFiltering {platform} words with min_score={min_score}...")
+        # Raw entries for the platform indexer's later --incremental runs
+        raw_index = {lemma: [without_tag(e) for e in entries] for lemma, entries in index.items()}
+        taught_index = smart_filter_taught_words(index, time_window=120, min_score=min_score)
+        deduplicated_index = {lemma: deduplicate_occurrences(entries, time_threshold=60)
+                              for lemma, entries in taught_index.items()}
+        print(f"  Words: {len(index)} → {len(deduplicated_index)}")
+        print(f"  Occurrences: {sum(len(e) for e in index.values())} → "
+              f"{sum(len(e) for e in deduplicated_index.values())}")
+
+        # Context tables (rewrites entry "x" positions, so before any shard)
+        table_count, table_bytes = contexts[platform].save(deduplicated_index, keep_videos=video_maps[platform])
+        print(f"✓ Built {table_count} {platform} context tables ({table_bytes / 1024:.1f} KB)")
+        IndexState(platform, OUTPUT_DIR).reset(raw_index, contexts[platform])
+
+        for lemma, entries in deduplicated_index.items():
+            merged[lemma].extend(entries)
+        views[platform] = {lemma: [without_tag(e) for e in entries] for lemma, entries in deduplicated_index.items()}
+
+    # 3. Publish: the views first, so the merged index is the newest in the
+    #    manifest (the frontend only prefers it over views that are older)
+    for platform in platforms:
+        shards, routing = plan_index(views[platform], shard_target_bytes)
+        publish_shards(OUTPUT_DIR, f"index_{platform}", shards, routing=routing,
+                       target_bytes=shard_target_bytes, binary=args.binary_shards, contexts=contexts[platform])
+        print(f"✓ Published index_{platform} ({len(views[platform])} words, {len(shards)} shards)")
+
+    # The binary format has no platform tag, so the merged index is JSON only
+    shards, routing = plan_index(merged, shard_target_bytes)
+    publish_shards(OUTPUT_DIR, MERGED_PREFIX, shards, routing=routing,
+                   target_bytes=shard_target_bytes, platforms=platforms)
+    occurrence_count = sum(len(entries) for entries in merged.values())
+    print(f"✓ Published {MERGED_PREFIX} ({len(merged)} words, {occurrence_count} occurrences, {len(shards)} shards)")
+
+    print("\n" + "=" * 60)
+    print("Unified Index Complete!")
+    print("=" * 60)
+    for platform in platforms:
+        print(f"✓ {platform}: {len(video_maps[platform])} videos, {len(views[platform])} words")
+    shared = sum(1 for entries in merged.values() if len({e["p"] for e in entries}) > 1)
+    print(f"✓ Merged: {len(merged)} words ({shared} found on more than one platform)")
+    print(f"✓ Output: {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
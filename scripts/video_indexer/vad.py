@@ -0,0 +1,229 @@
+import os
+import wave
+import subprocess
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from transcript import Transcript
+
+# Expected input: the 16 kHz mono pcm_s16le WAV produced by extract_audio
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+# Frames are read in blocks so memory use does not grow with video length
+READ_BLOCK_SECONDS = 60
+# Regions queued on an ASRWorkerPool per worker; each queued one is a pickled copy of its samples
+REGIONS_IN_FLIGHT_PER_WORKER = 2
+
+
+def _is_pcm16k_mono(path):
+    try:
+        with wave.open(path, 'rb') as wf:
+            return (wf.getframerate() == SAMPLE_RATE and wf.getnchannels() == 1
+                    and wf.getsampwidth() == 2)
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+@contextmanager
+def pcm16k_wav(path):
+    """
+    Yield a 16 kHz mono WAV for `path`.
+    Files that already match are used as-is; anything else is converted
+    into a temporary WAV that is removed afterwards.
+    """
+    if _is_pcm16k_mono(path):
+        yield path
+        return
+
+    tmp = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    tmp.close()
+    try:
+        subprocess.run([
+            'ffmpeg', '-i', path,
+            '-vn',
+            '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE),
+            '-ac', '1',
+            tmp.name,
+            '-y',
+            '-loglevel', 'error'
+        ], check=True)
+        yield tmp.name
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
+def _audio_blocks(source, block_samples):
+    """Yield float32 blocks from a 16 kHz mono WAV path or an in-memory array"""
+    if isinstance(source, np.ndarray):
+        for i in range(0, len(source), block_samples):
+            yield source[i:i + block_samples]
+        return
+
+    with wave.open(source, 'rb') as wf:
+        while True:
+            raw = wf.readframes(block_samples)
+            if not raw:
+                break
+            yield np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energies(source, frame_ms=FRAME_MS):
+    """Per-frame RMS energy in dBFS, computed block by block"""
+    frame_len = SAMPLE_RATE * frame_ms // 1000
+    frames_per_block = (READ_BLOCK_SECONDS * 1000) // frame_ms
+    energies = []
+
+    for samples in _audio_blocks(source, frame_len * frames_per_block):
+        usable = len(samples) // frame_len * frame_len
+        if usable == 0:
+            break
+        frames = samples[:usable].reshape(-1, frame_len)
+        rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-10)
+        energies.append(20 * np.log10(rms))
+
+    if not energies:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(energies)
+
+
+def detect_speech_regions(source, frame_ms=FRAME_MS, threshold_db=None,
+                          min_silence=0.6, min_speech=0.3, padding=0.2, max_region=120.0):
+    """
+    Energy-based voice activity detection.
+
+    Args:
+        source: 16 kHz mono WAV path or float32 array (see audio_stream.py)
+        threshold_db: Speech threshold; default is noise floor + 12 dB
+        min_silence: Gaps shorter than this (seconds) do not split a region
+        min_speech: Regions shorter than this are dropped
+        padding: Seconds added on both sides of each region
+        max_region: Longer regions are split at their quietest frame
+
+    Returns:
+        List of (start, end) tuples in seconds on the original timeline
+    """
+    energies = frame_energies(source, frame_ms)
+    if len(energies) == 0:
+        return []
+
+    frame_s = frame_ms / 1000.0
+    if threshold_db is None:
+        noise_floor = float(np.percentile(energies, 10))
+        threshold_db = max(noise_floor + 12.0, -50.0)
+
+    # Speech runs as [start_frame, end_frame)
+    voiced = np.concatenate(([False], energies > threshold_db, [False]))
+    edges = np.flatnonzero(voiced[1:] != voiced[:-1])
+    runs = list(zip(edges[0::2], edges[1::2]))
+
+    # Merge runs separated by short pauses
+    min_gap = int(min_silence / frame_s)
+    merged = []
+    for start, end in runs:
+        start, end = int(start), int(end)
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    # Drop blips, then pad each region on both sides
+    total = len(energies) * frame_s
+    padded = []
+    for start, end in merged:
+        if (end - start) * frame_s < min_speech:
+            continue
+        padded.append((max(0.0, start * frame_s - padding), min(total, end * frame_s + padding)))
+
+    # Split overly long regions at the quietest frame of their last 10 seconds
+    regions = []
+    for start, end in padded:
+        while end - start > max_region:
+            lo = int((start + max_region - 10.0) / frame_s)
+            hi = int((start + max_region) / frame_s)
+            cut = (lo + int(np.argmin(energies[lo:hi]))) * frame_s
+            regions.append((start, cut))
+            start = cut
+        regions.append((start, end))
+    return regions
+
+
+def load_region(wav_path, start, end):
+    """Read only [start, end) seconds of a 16 kHz mono WAV as float32"""
+    with wave.open(wav_path, 'rb') as wf:
+        first = int(start * SAMPLE_RATE)
+        wf.setpos(min(first, wf.getnframes()))
+        raw = wf.readframes(int(end * SAMPLE_RATE) - first)
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _pool_map(pool, submit, jobs):
+    """
+    Results of submit(*job) for every job, in order, with at most
+    REGIONS_IN_FLIGHT_PER_WORKER jobs per pool worker submitted at a time
+    """
+    window = max(1, pool.workers * REGIONS_IN_FLIGHT_PER_WORKER)
+    in_flight = deque()
+    results = []
+    for job in jobs:
+        if len(in_flight) >= window:
+            results.append(in_flight.popleft().result())
+        in_flight.append(submit(*job))
+    results.extend(future.result() for future in in_flight)
+    return results
+
+
+def transcribe_with_vad(media_path, asr=None, pool=None, **vad_kwargs):
+    """
+    Transcribe only the speech regions of a file.
+
+    Regions are decoded independently (in parallel when an ASRWorkerPool is
+    given) and every word timestamp is shifted back onto the original
+    timeline. With a pool, only a few regions per worker are queued at a
+    time (REGIONS_IN_FLIGHT_PER_WORKER), so a long in-memory array is not
+    copied into the pool all at once.
+
+    Args:
+        media_path: Audio/video file (converted to 16 kHz mono if needed),
+            or an already decoded float32 array from audio_stream.stream_audio
+        asr: ASREngine with transcribe_audio(), used when no pool is given
+        pool: Optional ASRWorkerPool
+
+    Returns:
+        Transcript, same shape as ASREngine.transcribe()
+    """
+    if isinstance(media_path, np.ndarray):
+        audio = media_path
+        regions = detect_speech_regions(audio, **vad_kwargs)
+        print(f"  🔊 VAD: {len(regions)} speech regions ({sum(e - s for s, e in regions):.0f}s of speech)")
+        bounds = [(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE), start) for start, end in regions]
+        if pool is not None:
+            # Slices are views; each is only copied when it is submitted
+            parts = _pool_map(pool, lambda a, b, offset: pool.submit_audio(audio[a:b], offset), bounds)
+        else:
+            parts = [asr.transcribe_audio(audio[a:b], offset=offset) for a, b, offset in bounds]
+        return _concat(parts)
+
+    with pcm16k_wav(media_path) as wav_path:
+        regions = detect_speech_regions(wav_path, **vad_kwargs)
+        speech = sum(end - start for start, end in regions)
+        print(f"  🔊 VAD: {len(regions)} speech regions ({speech:.0f}s of speech)")
+
+        if pool is not None:
+            parts = _pool_map(pool, pool.submit_region, regions)
+        else:
+            parts = [asr.transcribe_audio(load_region(wav_path, start, end), offset=start)
+                     for start, end in regions]
+
+    return _concat(parts)
+
+
+def _concat(parts):
+    words = Transcript()
+    for part in parts:
+        words.extend(part)
+    return words
@@ -0,0 +1,217 @@
+"""
+In-process YouTube downloader (yt_dlp.YoutubeDL API).
+
+The CLI path (youtube_indexer.download_audio_youtube) starts one yt-dlp
+process for the playlist metadata and another per video, each paying the
+Python/yt-dlp startup, and converted every result to WAV. Here:
+
+    - all URLs' metadata is read by one YoutubeDL instance (flat playlist
+      extraction, one session: cookies, connections and extractor state
+      are reused across URLs)
+    - videos are downloaded by a pool of worker threads, each with its own
+      long-lived YoutubeDL (instances are not thread-safe), closed once the
+      pool drains; download starts share one per-host interval
+      (HostRateLimiter), so N workers don't hit YouTube N times at once
+    - the native audio stream is kept as downloaded (opus in .webm, or
+      .m4a), ~1 MB per minute instead of ~10 MB for WAV; Whisper, VAD and
+      the transcript cache read any format ffmpeg decodes
+
+Files are named <video id>.<ext>; a video with any such audio file on disk
+(WAV from older runs included) is not downloaded again.
+
+Usage:
+    from youtube_downloader import HAS_YTDLP, YoutubeDownloader
+    results = YoutubeDownloader(TEMP_DIR, workers=4).download(urls)
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from download_scheduler import DEFAULT_HOST_INTERVAL, HostRateLimiter, backoff_delay
+
+try:
+    import yt_dlp
+    HAS_YTDLP = True
+except ImportError:
+    HAS_YTDLP = False
+
+DEFAULT_WORKERS = 4
+# Native audio stream: opus first, then AAC, then whatever audio there is
+AUDIO_FORMAT = "ba[acodec=opus]/ba[ext=m4a]/ba"
+AUDIO_EXTENSIONS = ('.webm', '.opus', '.m4a', '.ogg', '.mp3', '.wav')
+
+
+def find_downloaded_audio(output_dir, video_id):
+    """Filename of the audio already downloaded for `video_id`, or None"""
+    for ext in AUDIO_EXTENSIONS:
+        filename = f"{video_id}{ext}"
+        if os.path.exists(os.path.join(output_dir, filename)):
+            return filename
+    return None
+
+
+def scan_downloaded_audio(output_dir):
+    """Download results for every audio file in `output_dir` (--skip-download)"""
+    results = []
+    for f in sorted(os.listdir(output_dir)):
+        video_id, ext = os.path.splitext(f)
+        if ext in AUDIO_EXTENSIONS and find_downloaded_audio(output_dir, video_id) == f:
+            results.append({
+                "success": True,
+                "title": f"Existing {video_id}",
+                "id": video_id,
+                "filename": f,
+                "path": os.path.join(output_dir, f)
+            })
+    return results
+
+
+def _video_entries(info):
+    """(id, title) of every video in an extract_info result, playlists flattened"""
+    if info.get('_type') in ('playlist', 'multi_video'):
+        for entry in info.get('entries') or []:
+            if entry:
+                yield from _video_entries(entry)
+    elif info.get('id'):
+        yield info['id'], info.get('title') or 'Unknown Title'
+
+
+class YoutubeDownloader:
+    """
+    Batched metadata + concurrent audio downloads through yt_dlp.YoutubeDL.
+
+    Args:
+        output_dir: Where <video id>.<ext> files are written
+        workers: Concurrent downloads
+        max_retries: Attempts per video (full-jitter exponential backoff between them)
+        host_interval: Minimum seconds between download starts, shared by all workers
+    """
+    def __init__(self, output_dir, workers=DEFAULT_WORKERS, max_retries=3, host_interval=DEFAULT_HOST_INTERVAL):
+        if not HAS_YTDLP:
+            raise ImportError("yt-dlp is not installed: pip install yt-dlp")
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.limiter = HostRateLimiter(host_interval)
+        self._local = threading.local()
+        # Every worker's YoutubeDL, closed by download() when the pool is done
+        self._instances = []
+        self._instances_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    def _options(self, **extra):
+        options = {
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+        }
+        options.update(extra)
+        return options
+
+    def list_videos(self, urls):
+        """[(video id, title)] of all URLs (videos, playlists, channels), first occurrence order"""
+        videos = {}
+        with yt_dlp.YoutubeDL(self._options(extract_flat='in_playlist')) as ydl:
+            for url in urls:
+                try:
+                    info = ydl.extract_info(url, download=False)
+                except Exception as e:
+                    print(f"  ⚠️  Warning: Could not get video info for {url}: {e}")
+                    continue
+                found = 0
+                for video_id, title in _video_entries(info):
+                    videos.setdefault(video_id, title)
+                    found += 1
+                print(f"  📺 {url}: {found} video(s)")
+        return list(videos.items())
+
+    def _ydl(self):
+        # One YoutubeDL per worker thread, reused for all of its downloads
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = yt_dlp.YoutubeDL(self._options(
+                format=AUDIO_FORMAT,
+                noplaylist=True,
+                outtmpl=os.path.join(self.output_dir, '%(id)s.%(ext)s'),
+            ))
+            with self._instances_lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def _close_instances(self):
+        with self._instances_lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            ydl.close()
+        self._local = threading.local()
+
+    def _log(self, message):
+        with self._print_lock:
+            print(message)
+
+    def _download_one(self, video_id, title):
+        result = {"success": False, "error": None, "title": title, "id": video_id}
+        error = None
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                delay = backoff_delay(attempt)
+                self._log(f"  🔄 {video_id}: {error}, retry {attempt}/{self.max_retries} in {delay:.0f}s")
+                time.sleep(delay)
+            self.limiter.wait_sync(url)
+            try:
+                self._ydl().extract_info(url, download=True)
+            except Exception as e:
+                error = str(e)
+                continue
+            filename = find_downloaded_audio(self.output_dir, video_id)
+            if filename is None:
+                error = "Output file not found"
+                continue
+            result.update(success=True, filename=filename, path=os.path.join(self.output_dir, filename))
+            return result
+        result["error"] = error
+        return result
+
+    def download(self, urls):
+        """
+        Download the audio of every video behind `urls`.
+
+        Returns:
+            list of {"success", "error", "title", "id", "filename", "path"}
+            for the videos now on disk, in playlist order (as download_audio_youtube)
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        started = time.monotonic()
+        videos = self.list_videos(urls)
+
+        results = {}
+        pending = []
+        for video_id, title in videos:
+            filename = find_downloaded_audio(self.output_dir, video_id)
+            if filename:
+                results[video_id] = {"success": True, "error": None, "title": title, "id": video_id,
+                                     "filename": filename, "path": os.path.join(self.output_dir, filename)}
+            else:
+                pending.append((video_id, title))
+        print(f"  ⏬ {len(pending)} to download, {len(results)} already on disk ({self.workers} workers)")
+
+        downloaded_bytes = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self._download_one, video_id, title) for video_id, title in pending]
+                for done, future in enumerate(futures, 1):
+                    result = future.result()
+                    if result["success"]:
+                        downloaded_bytes += os.path.getsize(result["path"])
+                        self._log(f"  ✅ [{done}/{len(pending)}] {result['filename']}: {result['title']}")
+                        results[result["id"]] = result
+                    else:
+                        self._log(f"  ❌ [{done}/{len(pending)}] Failed to download {result['id']}: {result['error']}")
+        finally:
+            self._close_instances()
+        if pending:
+            elapsed = time.monotonic() - started
+            print(f"  📦 {downloaded_bytes / 1024 / 1024:.1f} MB in {elapsed:.0f}s")
+        return [results[video_id] for video_id, _ in videos if video_id in results]
@@ -4,15 +4,25 @@ import subprocess
 import re
 import time
 import argparse
-import glob
 from collections import defaultdict
-from fast_asr_engine import ASREngine
+from asr_backends import create_engine, add_backend_argument
+from asr_pool import transcribe_uncached
+from vad import transcribe_with_vad
+from transcript import Transcript, as_transcript
+from context_table import VideoContexts
+from index_runs import RunSpiller, ShardWriter, stream_taught_words
+from index_lsm import IndexState
+from shard_publisher import publish_shards
+from shard_planner import DEFAULT_TARGET_BYTES, plan_index
+from download_scheduler import DEFAULT_HOST_INTERVAL
+from youtube_downloader import (
+    HAS_YTDLP, YoutubeDownloader, AUDIO_FORMAT, DEFAULT_WORKERS, find_downloaded_audio, scan_downloaded_audio
+)
 
 # Import shared logic including STOP_WORDS
 from indexer_shared import (
-    STOP_WORDS, TextProcessor, get_transcription_cache_path,
-    save_transcription_cache, load_transcription_cache,
-    deduplicate_occurrences, smart_filter_taught_words
+    TextProcessor, load_cached_transcript, save_cached_transcript,
+    deduplicate_occurrences, smart_filter_taught_words, index_video_words
 )
 
 try:
@@ -35,7 +45,8 @@ URL_LIST = [
 
 def download_audio_youtube(url, output_dir, max_retries=3):
     """
-    Download YouTube video audio using yt-dlp.
+    Download YouTube video audio using the yt-dlp command line (one process
+    per video; see download_youtube for the in-process path).
     
     Args:
         url: Video URL
@@ -104,20 +115,20 @@ def download_audio_youtube(url, output_dir, max_retries=3):
             
         print(f"  Processing: {title} ({video_id})")
         
-        # Output filename template
+        # Output filename template (native audio stream, no WAV conversion)
         output_template = os.path.join(output_dir, f"{video_id}.%(ext)s")
-        expected_file = os.path.join(output_dir, f"{video_id}.wav")
         
         # Check if already exists
-        if os.path.exists(expected_file):
-             print(f"  ✅ Already exists: {expected_file}")
+        existing = find_downloaded_audio(output_dir, video_id)
+        if existing:
+             print(f"  ✅ Already exists: {existing}")
              results.append({
                 "success": True, 
                 "error": None, 
                 "title": title, 
                 "id": video_id,
-                "filename": f"{video_id}.wav",
-                "path": expected_file
+                "filename": existing,
+                "path": os.path.join(output_dir, existing)
             })
              continue
 
@@ -130,10 +141,7 @@ def download_audio_youtube(url, output_dir, max_retries=3):
     
                 cmd = [
                     'yt-dlp',
-                    '-f', 'ba', 
-                    '-x', 
-                    '--audio-format', 'wav', 
-                    '--audio-quality', '0',
+                    '-f', AUDIO_FORMAT,
                     '--no-playlist', # Download ONE specific video at a time (since we are iterating ids)
                     '-o', output_template,
                     f"https://www.youtube.com/watch?v={video_id}" # Force single video URL
@@ -141,15 +149,16 @@ def download_audio_youtube(url, output_dir, max_retries=3):
                 
                 subprocess.run(cmd, check=True)
                 
-                if os.path.exists(expected_file):
-                    print(f"  ✅ Download complete: {expected_file}")
+                downloaded = find_downloaded_audio(output_dir, video_id)
+                if downloaded:
+                    print(f"  ✅ Download complete: {downloaded}")
                     results.append({
                         "success": True, 
                         "error": None, 
                         "title": title, 
                         "id": video_id,
-                        "filename": f"{video_id}.wav",
-                        "path": expected_file
+                        "filename": downloaded,
+                        "path": os.path.join(output_dir, downloaded)
                     })
                     success = True
                     break
@@ -166,12 +175,49 @@ def download_audio_youtube(url, output_dir, max_retries=3):
              
     return results
 
+def download_youtube(urls, output_dir, workers=DEFAULT_WORKERS, host_interval=DEFAULT_HOST_INTERVAL):
+    """
+    Download the audio behind all `urls`: in-process with batched metadata
+    and a download pool when the yt_dlp module is available (see
+    youtube_downloader.py), else one yt-dlp process per video.
+    
+    Returns:
+        list of download_audio_youtube result dicts
+    """
+    if HAS_YTDLP:
+        print(f"\n📥 Downloading {len(urls)} URL(s) in-process ({workers} workers)...")
+        return YoutubeDownloader(output_dir, workers=workers, host_interval=host_interval).download(urls)
+    
+    print("Tip: Install the yt-dlp Python package for batched in-process downloads: pip install yt-dlp")
+    results = []
+    for url in urls:
+        results.extend(download_audio_youtube(url, output_dir))
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description='YouTube Video Indexer')
     parser.add_argument('--urls', nargs='+', help='List of YouTube URLs')
     parser.add_argument('--skip-download', action='store_true', help='Skip download phase')
+    parser.add_argument('--download-workers', type=int, default=DEFAULT_WORKERS, metavar='N',
+                        help=f'Download up to N videos at once (in-process yt-dlp only, default: {DEFAULT_WORKERS})')
+    parser.add_argument('--download-interval', type=float, default=DEFAULT_HOST_INTERVAL, metavar='SECONDS',
+                        help=f'Minimum seconds between download starts, shared by all workers (default: {DEFAULT_HOST_INTERVAL})')
     parser.add_argument('--min-score', type=int, default=5, help='Minimum score to keep a word (default: 5)')
-    parser.add_argument('--incremental', action='store_true', help='Merge with existing index instead of overwriting')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only index new videos: write per-video delta segments and compact them into the existing index')
+    parser.add_argument('--asr-workers', type=int, default=1, metavar='N',
+                        help='Transcribe N videos in parallel, one Whisper model per worker process (default: 1)')
+    parser.add_argument('--vad', action='store_true',
+                        help='Skip silence: only transcribe speech regions found by voice activity detection')
+    add_backend_argument(parser)
+    parser.add_argument('--streaming', action='store_true',
+                        help='Spill per-video results to sorted run files and merge them word by word (flat memory)')
+    parser.add_argument('--run-dir', metavar='DIR',
+                        help='Where --streaming puts its temporary run files (default: system temp dir)')
+    parser.add_argument('--shard-target-kb', type=int, default=DEFAULT_TARGET_BYTES // 1024, metavar='KB',
+                        help=f'Target size of each index shard (default: {DEFAULT_TARGET_BYTES // 1024})')
+    parser.add_argument('--binary-shards', action='store_true',
+                        help='Also publish each shard in the compact binary format (read by the frontend with VITE_BINARY_INDEX=true)')
     args = parser.parse_args()
     
     urls = args.urls or URL_LIST
@@ -188,21 +234,11 @@ def main():
     downloaded_files = []
     
     if not args.skip_download:
-        for url in urls:
-            results = download_audio_youtube(url, TEMP_DIR)
-            downloaded_files.extend(results)
+        downloaded_files = download_youtube(urls, TEMP_DIR, workers=args.download_workers,
+                                            host_interval=args.download_interval)
     else:
-        # Scan dir for wavs if skipping download
-        for f in os.listdir(TEMP_DIR):
-            if f.endswith('.wav'):
-                vid = os.path.splitext(f)[0]
-                downloaded_files.append({
-                    "success": True,
-                    "title": f"Existing {vid}",
-                    "id": vid,
-                    "filename": f,
-                    "path": os.path.join(TEMP_DIR, f)
-                })
+        # Scan dir for downloaded audio if skipping download
+        downloaded_files = scan_downloaded_audio(TEMP_DIR)
 
     # 2. Transcribe & Index
     print("\n" + "="*60)
@@ -214,9 +250,19 @@ def main():
     
     global_index = defaultdict(list)
     video_map = {}
+    contexts = VideoContexts(OUTPUT_DIR, "youtube")
+    # Streaming Mode: occurrences go to sorted run files instead of global_index
+    spiller = RunSpiller(args.run_dir) if args.streaming and not args.incremental else None
+    shard_writer = None
+    if spiller is not None:
+        # Context tables are staged on its publisher as each video is indexed
+        shard_writer = ShardWriter(OUTPUT_DIR, "index_youtube", args.shard_target_kb * 1024,
+                                   binary=args.binary_shards)
+        contexts.stream_to(shard_writer.publisher)
+    # Raw (pre-filter) entries behind the published index, for incremental runs
+    index_state = IndexState("youtube", OUTPUT_DIR)
     
     # Incremental Mode: Load existing data
-    loaded_lemmas = set()
     if args.incremental:
         print("\n[Incremental Mode] Loading existing index...")
         
@@ -231,22 +277,20 @@ def main():
             except Exception as e:
                 print(f"  ⚠️  Failed to load existing video map: {e}")
         
-        # Load shards
-        shard_files = glob.glob(os.path.join(OUTPUT_DIR, "index_youtube_*.json"))
-        loaded_words = 0
-        for sf in shard_files:
-            try:
-                with open(sf, 'r', encoding='utf-8') as f:
-                    shard_data = json.load(f)
-                    for lemma, entries in shard_data.items():
-                        global_index[lemma].extend(entries)
-                        loaded_lemmas.add(lemma)
-                        loaded_words += 1
-            except Exception as e:
-                print(f"  ⚠️  Failed to load shard {sf}: {e}")
-                
-        print(f"  ✅ Loaded {loaded_words} words from existing shards")
+        # Raw entries of the existing index (built by the last full run)
+        if index_state.exists():
+            print(f"  ✅ Index state found ({len(index_state.pending_deltas())} pending deltas)")
+        else:
+            index_state.seed_from_shards()
 
+    if args.asr_workers > 1:
+        # Fill the transcription cache in parallel; the loop below then only indexes
+        transcribe_uncached(
+            [(item['path'], {"title": item['title']})
+             for item in downloaded_files
+             if not (args.incremental and item['id'] in video_map)],
+            workers=args.asr_workers, model_size="medium", vad=args.vad, backend=args.asr_backend
+        )
     
     for idx, item in enumerate(downloaded_files):
         video_id = item['id'] # YouTube ID is the ID
@@ -270,10 +314,9 @@ def main():
         }
         
         # Check Cache
-        cache_path = get_transcription_cache_path(file_path)
-        cached_data = load_transcription_cache(cache_path)
+        cached_data = load_cached_transcript(file_path, args.asr_backend, "medium")
         
-        words = []
+        words = Transcript()
         if cached_data:
             print("  ✅ Found cached transcription")
             words = cached_data['words']
@@ -283,56 +326,92 @@ def main():
         else:
             if asr is None:
                 print("  🤖 Loading Whisper...")
-                asr = ASREngine(model_size="medium")
+                asr = create_engine(args.asr_backend, model_size="medium")
             
             print("  🗣️  Transcribing...")
-            words = asr.transcribe(file_path)
-            save_transcription_cache(cache_path, words, {"title": title})
+            if args.vad:
+                words = transcribe_with_vad(file_path, asr=asr)
+            else:
+                words = asr.transcribe(file_path)
+            save_cached_transcript(file_path, words, {"title": title}, args.asr_backend, "medium")
             
-        # Indexing
+        # Indexing (straight off the Transcript columns, contexts by reference)
+        words = as_transcript(words)
         print(f"  📚 Indexing {len(words)} words...")
-        for i, word_obj in enumerate(words):
-            raw_text = word_obj['word']
-            potential_words = re.findall(r'[a-zA-Z]+(?:-[a-zA-Z]+)*', raw_text)
-            
-            for raw_word in potential_words:
-                lemma = processor.lemmatize(raw_word)
-                if lemma and lemma not in STOP_WORDS and len(lemma) > 1:
-                     context = " ".join([w['word'] for w in words[max(0, i-5):min(len(words), i+6)]])
-                     global_index[lemma].append({
-                         "v": video_id,
-                         "t": round(word_obj['start'], 1),
-                         "c": context
-                     })
+        video_entries = index_video_words(words, video_id, processor)
+        
+        if args.incremental:
+            index_state.add_delta(video_id, words.words, video_entries)
+        elif spiller is None:
+            contexts.add(video_id, words.words)
+            for lemma, entry in video_entries:
+                global_index[lemma].append(entry)
+        else:
+            # Table staged on the publisher now: neither it nor the transcript is kept
+            contexts.write_video(video_id, words.words, [entry for _, entry in video_entries])
+            for lemma, entry in video_entries:
+                spiller.add(lemma, entry)
 
     # 3. Save Data (Isolated)
     print("\n" + "="*60)
     print("Saving YouTube Data...")
     
+    # Save video_map
+    with open(os.path.join(OUTPUT_DIR, "video_map_youtube.json"), "w", encoding='utf-8') as f:
+        json.dump(video_map, f, indent=2, ensure_ascii=False)
+    
+    if args.incremental:
+        # Incremental Mode: merge this run's deltas, rescoring only the words they touch
+        print(f"  Compacting delta segments with min_score={args.min_score}...")
+        stats = index_state.compact(min_score=args.min_score)
+        print(f"  Merged {stats['deltas']} deltas: {stats['touched']} words rescored, "
+              f"{stats['kept']} published, {stats['dropped']} dropped")
+        print(f"✅ Saved video_map_youtube.json and index shards.")
+        return
+    
+    if spiller is not None:
+        # Streaming Mode: k-way merge of the sorted runs, filtered and sharded word by word
+        print(f"  Filtering words with min_score={args.min_score} (streaming {spiller.entries} occurrences)...")
+        try:
+            for lemma, _, _, deduped in stream_taught_words(
+                spiller.merge(), min_score=args.min_score
+            ):
+                if deduped is not None:
+                    shard_writer.add(lemma, deduped)
+        except BaseException:
+            shard_writer.abort()
+            raise
+        finally:
+            spiller.cleanup()
+        # Tables were staged per video while indexing; only drop stale ones
+        contexts.save({}, keep_videos=video_map)
+        shard_writer.close(contexts)
+        # Raw entries were not kept; the next --incremental run reseeds from the shards
+        index_state.clear()
+        print(f"✅ Saved video_map_youtube.json and index shards.")
+        return
+    
     # Filter taught words
     print(f"  Filtering words with min_score={args.min_score}...")
+    # Raw entries for later incremental runs (filtering and saving modify them in place)
+    raw_index = {lemma: [dict(e) for e in entries] for lemma, entries in global_index.items()}
     taught_index = smart_filter_taught_words(
         global_index, 
-        min_score=args.min_score,
-        whitelist=loaded_lemmas if args.incremental else None
+        min_score=args.min_score
     )
-    
-    # Save video_map
-    with open(os.path.join(OUTPUT_DIR, "video_map_youtube.json"), "w", encoding='utf-8') as f:
-        json.dump(video_map, f, indent=2, ensure_ascii=False)
-        
-    # Save shards
-    shards = defaultdict(dict)
-    for lemma, entries in taught_index.items():
-        # Deduplicate
-        entries = deduplicate_occurrences(entries)
         
-        first_char = lemma[0] if lemma[0].isalpha() else "others"
-        shards[first_char][lemma] = entries
+    # Deduplicate
+    deduplicated_index = {lemma: deduplicate_occurrences(entries) for lemma, entries in taught_index.items()}
+    
+    # Context tables (rewrites entry "x" positions, so before the shards)
+    contexts.save(deduplicated_index, keep_videos=video_map)
+    index_state.reset(raw_index, contexts)
         
-    for char, data in shards.items():
-        with open(os.path.join(OUTPUT_DIR, f"index_youtube_{char}.json"), "w", encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+    # Size-balanced prefix-range shards, serialized in parallel and published
+    # with one atomic manifest swap (the routing table goes into the manifest)
+    shards, routing = plan_index(deduplicated_index, args.shard_target_kb * 1024)
+    publish_shards(OUTPUT_DIR, "index_youtube", shards, routing=routing, target_bytes=args.shard_target_kb * 1024,
+                   binary=args.binary_shards, contexts=contexts)
             
     print(f"✅ Saved video_map_youtube.json and index shards.")
 
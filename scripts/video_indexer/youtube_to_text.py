@@ -1,9 +1,12 @@
 import os
 import argparse
 import re
-from youtube_indexer import download_audio_youtube, TEMP_DIR
-from fast_asr_engine import ASREngine
-from indexer_shared import get_transcription_cache_path, load_transcription_cache, save_transcription_cache
+from youtube_indexer import download_youtube, TEMP_DIR
+from youtube_downloader import DEFAULT_WORKERS, scan_downloaded_audio
+from asr_backends import create_engine, add_backend_argument, DEFAULT_BACKEND
+from asr_pool import transcribe_uncached
+from indexer_shared import load_cached_transcript, save_cached_transcript
+from transcript import as_transcript
 
 def sanitize_filename(name):
     # Remove invalid characters
@@ -11,7 +14,8 @@ def sanitize_filename(name):
     s = "".join(c for c in s if c.isprintable())
     return s.strip()
 
-def youtube_to_text(urls, output_file=None, skip_download=False):
+def youtube_to_text(urls, output_file=None, skip_download=False, asr_workers=1, asr_backend=DEFAULT_BACKEND,
+                    download_workers=DEFAULT_WORKERS):
     """
     Download YouTube videos and save transcriptions to local text files.
     """
@@ -21,27 +25,23 @@ def youtube_to_text(urls, output_file=None, skip_download=False):
     # 2. Handle Downloads
     downloaded_files = []
     if not skip_download:
-        for url in urls:
-            results = download_audio_youtube(url, TEMP_DIR)
-            downloaded_files.extend(results)
+        downloaded_files = download_youtube(urls, TEMP_DIR, workers=download_workers)
     else:
-        # Scan dir for wavs if skipping download
-        for f in os.listdir(TEMP_DIR):
-            if f.endswith('.wav'):
-                vid = os.path.splitext(f)[0]
-                downloaded_files.append({
-                    "success": True,
-                    "title": f"Existing {vid}",
-                    "id": vid,
-                    "filename": f,
-                    "path": os.path.join(TEMP_DIR, f)
-                })
+        # Scan dir for downloaded audio if skipping download
+        downloaded_files = scan_downloaded_audio(TEMP_DIR)
 
     if not downloaded_files:
         print("❌ No videos to process.")
         return
 
     # 3. Transcribe & Save to Text
+    if asr_workers > 1:
+        transcribe_uncached(
+            [(item['path'], {"title": item['title']})
+             for item in downloaded_files if item.get("success")],
+            workers=asr_workers, model_size="medium", backend=asr_backend
+        )
+
     asr = None  # Lazy load
     
     for idx, item in enumerate(downloaded_files):
@@ -55,8 +55,7 @@ def youtube_to_text(urls, output_file=None, skip_download=False):
         print(f"\nProcessing [{idx+1}/{len(downloaded_files)}] {title} ({video_id})")
         
         # Check Cache
-        cache_path = get_transcription_cache_path(file_path)
-        cached_data = load_transcription_cache(cache_path)
+        cached_data = load_cached_transcript(file_path, asr_backend, "medium")
         
         words = []
         if cached_data:
@@ -65,11 +64,11 @@ def youtube_to_text(urls, output_file=None, skip_download=False):
         else:
             if asr is None:
                 print("  🤖 Loading Whisper...")
-                asr = ASREngine(model_size="medium")
+                asr = create_engine(asr_backend, model_size="medium")
             
             print("  🗣️  Transcribing...")
             words = asr.transcribe(file_path)
-            save_transcription_cache(cache_path, words, {"title": title})
+            save_cached_transcript(file_path, words, {"title": title}, asr_backend, "medium")
         
         # Determine Output Filename
         if output_file and len(downloaded_files) == 1:
@@ -88,12 +87,7 @@ def youtube_to_text(urls, output_file=None, skip_download=False):
             f.write("="*60 + "\n\n")
             
             # Combine words into sentences/paragraphs (simple heuristic)
-            current_sentence = []
-            for word_obj in words:
-                word_text = word_obj['word']
-                current_sentence.append(word_text)
-            
-            full_text = " ".join(current_sentence)
+            full_text = " ".join(as_transcript(words).words)
             # Cleanup multiple spaces
             full_text = re.sub(r'\s+', ' ', full_text).strip()
             
@@ -108,11 +102,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='YouTube to Text Downloader')
     parser.add_argument('--urls', nargs='+', help='List of YouTube URLs')
     parser.add_argument('--output', type=str, default=None, help='Output text file (optional, default uses video title)')
-    parser.add_argument('--skip-download', action='store_true', help='Skip download phase, use existing wav files in temp folder')
+    parser.add_argument('--skip-download', action='store_true', help='Skip download phase, use existing audio files in temp folder')
+    parser.add_argument('--download-workers', type=int, default=DEFAULT_WORKERS, metavar='N',
+                        help=f'Download up to N videos at once (in-process yt-dlp only, default: {DEFAULT_WORKERS})')
+    parser.add_argument('--asr-workers', type=int, default=1, metavar='N', help='Transcribe N videos in parallel (default: 1)')
+    add_backend_argument(parser)
     
     args = parser.parse_args()
     
     if not args.urls and not args.skip_download:
         print("❌ Error: No URLs provided. Use --urls or --skip-download")
     else:
-        youtube_to_text(args.urls or [], args.output, args.skip_download)
+        youtube_to_text(args.urls or [], args.output, args.skip_download, args.asr_workers, args.asr_backend,
+                        args.download_workers)
@@ -27,6 +27,7 @@ describe('VideoIndexService', () => {
 
             // Mock chain
             ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: false }) // No manifest
                 .mockResolvedValueOnce({ // Index
                     ok: true,
                     json: async () => mockIndex
@@ -50,6 +51,7 @@ describe('VideoIndexService', () => {
         const mockIndexYT = { "test": [{ "v": "yt_0", "t": 20, "c": "yt context" }] }
 
             ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: false }) // No manifest
                 .mockResolvedValueOnce({ // Index
                     ok: true,
                     json: async () => mockIndexYT
@@ -65,4 +67,232 @@ describe('VideoIndexService', () => {
         expect(global.fetch).toHaveBeenCalledWith('/data/index_youtube_t.json')
         expect(global.fetch).toHaveBeenCalledWith('/data/video_map_youtube.json')
     })
+
+    it('should resolve context references through the video context table', async () => {
+        const mockMap = {
+            "3": { bvid: "BV333", page: 2, title: "Ref Video", filename: "ref.mp4", platform: "bilibili" }
+        }
+        const mockIndex = {
+            "test": [
+                { "v": "3", "t": 10, "x": [0, 1], "s": 3 },
+                { "v": "3", "t": 95, "x": [1, 6] }
+            ]
+        }
+        const mockTable = {
+            "w": 5,
+            "s": ["这个单词 test 意思是", "a b c d e f test g h i j k l"]
+        }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: false }) // No manifest
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockTable })
+
+        const results = await videoIndexService.searchWord('test', 'bilibili')
+        expect(results).toHaveLength(2)
+        expect(results[0].context).toBe('这个单词 test 意思是')
+        expect(results[0].score).toBe(3)
+        expect(results[1].context).toBe('b c d e f test g h i j k')
+        // Manifest, shard, map and one table fetch per video, shared by all of its entries
+        expect(global.fetch).toHaveBeenCalledTimes(4)
+        expect(global.fetch).toHaveBeenCalledWith('/data/context_bilibili_3.json')
+    })
+
+    it('should fall back to an empty context when the table is missing', async () => {
+        const mockMap = {
+            "0": { bvid: "BV123", page: 1, title: "Test Video", filename: "test.mp4", platform: "bilibili" }
+        }
+        const mockIndex = { "test": [{ "v": "0", "t": 10, "x": [0, 0] }] }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: false }) // No manifest
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+                .mockResolvedValueOnce({ ok: false })
+
+        const results = await videoIndexService.searchWord('test', 'bilibili')
+        expect(results).toHaveLength(1)
+        expect(results[0].context).toBe('')
+    })
+
+    it('should load shards through the manifest when one is published', async () => {
+        const mockManifest = {
+            version: 2,
+            indexes: {
+                index_youtube: {
+                    version: 2,
+                    shards: { t: { file: 'shards/index_youtube_t.0123456789abcdef.json', size: 10, sha256: '0123456789abcdef', words: 1 } }
+                }
+            }
+        }
+        const mockMap = {
+            "yt_0": { bvid: "YT123", page: 1, title: "YouTube Video", filename: "yt.mp4", platform: "youtube" }
+        }
+        const mockIndex = { "test": [{ "v": "yt_0", "t": 20, "c": "yt context" }] }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+
+        const results = await videoIndexService.searchWord('test', 'youtube')
+        expect(results).toHaveLength(1)
+        expect(global.fetch).toHaveBeenCalledWith('/data/manifest.json', { cache: 'no-cache' })
+        expect(global.fetch).toHaveBeenCalledWith('/data/shards/index_youtube_t.0123456789abcdef.json')
+        expect(global.fetch).not.toHaveBeenCalledWith('/data/index_youtube_t.json')
+    })
+
+    it('should load context tables through the manifest when it lists them', async () => {
+        const mockManifest = {
+            version: 4,
+            indexes: {
+                index_bilibili: {
+                    version: 4,
+                    shards: { t: { file: 'shards/index_bilibili_t.aaaa.json', size: 10, sha256: 'aaaa', words: 1 } }
+                }
+            },
+            contexts: { bilibili: { "3": 'contexts/context_bilibili_3.dddd.json' } }
+        }
+        const mockMap = {
+            "3": { bvid: "BV333", page: 1, title: "Ref Video", filename: "ref.mp4", platform: "bilibili" }
+        }
+        const mockIndex = { "test": [{ "v": "3", "t": 10, "x": [0, 1] }] }
+        const mockTable = { "w": 5, "s": ["这个单词 test 意思是"] }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockTable })
+
+        const results = await videoIndexService.searchWord('test', 'bilibili')
+        expect(results[0].context).toBe('这个单词 test 意思是')
+        expect(global.fetch).toHaveBeenCalledWith('/data/contexts/context_bilibili_3.dddd.json')
+        expect(global.fetch).not.toHaveBeenCalledWith('/data/context_bilibili_3.json')
+    })
+
+    it('should route words to size-balanced shards through the manifest routing table', async () => {
+        const mockManifest = {
+            version: 3,
+            indexes: {
+                index_bilibili: {
+                    version: 3,
+                    shards: {
+                        '000': { file: 'shards/index_bilibili_000.aaaa.json', size: 10, sha256: 'aaaa', words: 1 },
+                        '001': { file: 'shards/index_bilibili_001.bbbb.json', size: 10, sha256: 'bbbb', words: 1 },
+                        '002': { file: 'shards/index_bilibili_002.cccc.json', size: 10, sha256: 'cccc', words: 1 }
+                    },
+                    routing: [['', '000'], ['sc', '001'], ['st', '002']]
+                }
+            }
+        }
+        const mockMap = {
+            "0": { bvid: "BV123", page: 1, title: "Test Video", filename: "test.mp4", platform: "bilibili" }
+        }
+        const mockIndex = { "school": [{ "v": "0", "t": 10, "c": "school context" }] }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+
+        const results = await videoIndexService.searchWord('school', 'bilibili')
+        expect(results).toHaveLength(1)
+        // "sc" <= "school" < "st"
+        expect(global.fetch).toHaveBeenCalledWith('/data/shards/index_bilibili_001.bbbb.json')
+    })
+
+    it('should answer words missing from the Bloom filter without fetching a shard', async () => {
+        const mockManifest = {
+            version: 4,
+            indexes: {
+                index_bilibili: {
+                    version: 4,
+                    shards: { a: { file: 'shards/index_bilibili_a.aaaa.json', size: 10, sha256: 'aaaa', words: 1 } },
+                    // apple, school, café, well-known (see bloomFilter.test.ts)
+                    bloom: { m: 64, k: 11, n: 4, bits: 'zBci+0Bknog=' }
+                }
+            }
+        }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+
+        const results = await videoIndexService.searchWord('banana', 'bilibili')
+        expect(results).toEqual([])
+        expect(global.fetch).toHaveBeenCalledTimes(1)
+    })
+
+    it('should answer every platform from one merged shard when the manifest has one', async () => {
+        const mockManifest = {
+            version: 7,
+            indexes: {
+                index_bilibili: { version: 5, shards: {} },
+                index_youtube: { version: 6, shards: {} },
+                index_all: {
+                    version: 7,
+                    platforms: ['bilibili', 'youtube'],
+                    shards: { t: { file: 'shards/index_all_t.abcd.json', size: 10, sha256: 'abcd', words: 1 } }
+                }
+            }
+        }
+        const mockIndex = {
+            "test": [
+                { "v": "0", "t": 10, "c": "bili context", "p": 0 },
+                { "v": "yt_0", "t": 20, "c": "yt context", "p": 1 }
+            ]
+        }
+        const mockMap = {
+            "0": { bvid: "BV123", page: 1, title: "Test Video", filename: "test.mp4", platform: "bilibili" }
+        }
+        const mockMapYT = {
+            "yt_0": { bvid: "YT123", page: 1, title: "YouTube Video", filename: "yt.mp4", platform: "youtube" }
+        }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMapYT })
+
+        const bilibili = await videoIndexService.searchWord('test', 'bilibili')
+        const youtube = await videoIndexService.searchWord('test', 'youtube')
+        expect(bilibili.map(r => r.context)).toEqual(['bili context'])
+        expect(youtube.map(r => r.context)).toEqual(['yt context'])
+        // Manifest, one shard and the two video maps
+        expect(global.fetch).toHaveBeenCalledTimes(4)
+        expect(global.fetch).toHaveBeenCalledWith('/data/shards/index_all_t.abcd.json')
+    })
+
+    it('should skip a merged index that is older than the platform index', async () => {
+        const mockManifest = {
+            version: 8,
+            indexes: {
+                index_all: {
+                    version: 7,
+                    platforms: ['bilibili', 'youtube'],
+                    shards: { t: { file: 'shards/index_all_t.abcd.json', size: 10, sha256: 'abcd', words: 1 } }
+                },
+                // Republished by an --incremental run after the merged build
+                index_bilibili: {
+                    version: 8,
+                    shards: { t: { file: 'shards/index_bilibili_t.ef01.json', size: 10, sha256: 'ef01', words: 1 } }
+                }
+            }
+        }
+        const mockMap = {
+            "0": { bvid: "BV123", page: 1, title: "Test Video", filename: "test.mp4", platform: "bilibili" }
+        }
+        const mockIndex = { "test": [{ "v": "0", "t": 10, "c": "new context" }] }
+
+            ; (global.fetch as any)
+                .mockResolvedValueOnce({ ok: true, json: async () => mockManifest })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockIndex })
+                .mockResolvedValueOnce({ ok: true, json: async () => mockMap })
+
+        const results = await videoIndexService.searchWord('test', 'bilibili')
+        expect(results.map(r => r.context)).toEqual(['new context'])
+        expect(global.fetch).toHaveBeenCalledWith('/data/shards/index_bilibili_t.ef01.json')
+    })
 })
@@ -1,3 +1,6 @@
+import { decodeBinaryShard } from '../utils/binaryShard'
+import { bloomHas, BloomFilterData } from '../utils/bloomFilter'
+
 // Video metadata from video_map.json
 interface VideoMapItem {
     bvid: string
@@ -7,6 +10,68 @@ interface VideoMapItem {
     platform?: 'bilibili' | 'youtube'
 }
 
+// Per-video context table (contexts/context_<platform>_<videoId>.<hash>.json,
+// listed in the manifest): overlapping context windows merged into segments,
+// words joined by single spaces
+interface ContextTable {
+    w: number       // Words on each side of an occurrence
+    s: string[]     // Segments
+}
+
+// Raw index entry: context is either inline ("c", older shards) or a
+// [segment id, offset] reference into the video's context table ("x")
+interface IndexEntry {
+    v: string
+    t: number
+    c?: string
+    x?: [number, number]
+    s?: number
+    p?: number      // Merged index only: position of the platform in its "platforms"
+}
+
+// manifest.json written by the indexers' shard publisher: every published
+// shard under a content-addressed name, so it can be cached forever
+interface ShardManifest {
+    version: number
+    indexes: Record<string, {
+        version: number
+        // gzip / br: byte sizes of the precompressed <file>.gz / <file>.br siblings
+        // bin: byte size of the binary encoding (<file> with .bin instead of .json)
+        shards: Record<string, { file: string, size: number, sha256: string, words: number, gzip?: number, br?: number, bin?: number }>
+        // Size-balanced shards: [start prefix, shard key] sorted by prefix
+        routing?: [string, string][]
+        // All lemmas of the index, to answer misses without a shard download
+        bloom?: BloomFilterData
+        // Merged index (unified_indexer.py): platforms its entries' "p" tags refer to
+        platforms?: string[]
+    }>
+    // Context tables by platform and video id, published with the shards that reference them
+    contexts?: Record<string, Record<string, string>>
+}
+
+// Cross-platform index: one shard answers a lookup for every platform
+const MERGED_INDEX = 'index_all'
+
+// Feature flag: read binary shards (binary_shard.py) when the index publishes them
+const USE_BINARY_INDEX = import.meta.env.VITE_BINARY_INDEX === 'true'
+
+// Feature flag: request the precompressed .br/.gz shards. Only for hosts that serve them
+// with a Content-Encoding header (vercel.json); anywhere else json() would get raw bytes
+const USE_PRECOMPRESSED_INDEX = import.meta.env.VITE_PRECOMPRESSED_INDEX === 'true'
+
+// A lemma lives in the last shard whose start prefix is <= the lemma
+// (same code point order as the Python planner's sorted())
+function routeLemma(routing: [string, string][], lemma: string): string {
+    let lo = 0
+    let hi = routing.length - 1
+    while (lo < hi) {
+        const mid = (lo + hi + 1) >> 1
+        if (routing[mid][0] <= lemma) lo = mid
+        else hi = mid - 1
+    }
+    return routing[lo][1]
+}
+
 // Video occurrence in index
 export interface VideoOccurrence {
     bvid: string
@@ -21,14 +86,59 @@ class VideoIndexService {
     // Cache by platform
     private videoMaps: Record<string, Record<string, VideoMapItem>> = {}
     private indexCache: Record<string, any> = {}
+    private contextTables: Record<string, Promise<ContextTable | null>> = {}
+    private manifest: Promise<ShardManifest | null> | null = null
 
     private getVideoMapPath(platform: 'bilibili' | 'youtube') {
         return platform === 'youtube' ? '/data/video_map_youtube.json' : '/data/video_map_bilibili.json'
     }
 
-    private getIndexShardPath(shardKey: string, platform: 'bilibili' | 'youtube') {
-        const prefix = platform === 'youtube' ? 'index_youtube' : 'index_bilibili'
-        return `/data/${prefix}_${shardKey}.json`
+    private loadManifest(): Promise<ShardManifest | null> {
+        if (!this.manifest) {
+            // Revalidated on every load; the shards it points to never change
+            this.manifest = fetch('/data/manifest.json', { cache: 'no-cache' })
+                .then(response => response?.ok ? response.json() as Promise<ShardManifest> : null)
+                .catch(() => null)
+        }
+        return this.manifest
+    }
+
+    // Index a platform is read from: the merged one when it covers the platform
+    // and is not older than the platform's own index (which a later
+    // --incremental run of that platform's indexer republishes alone)
+    private async resolveIndex(platform: 'bilibili' | 'youtube'): Promise<{ prefix: string, tag?: number }> {
+        const own = platform === 'youtube' ? 'index_youtube' : 'index_bilibili'
+        const indexes = (await this.loadManifest())?.indexes
+        const merged = indexes?.[MERGED_INDEX]
+        const tag = merged?.platforms?.indexOf(platform) ?? -1
+        if (merged && tag >= 0 && merged.version >= (indexes?.[own]?.version ?? 0)) {
+            return { prefix: MERGED_INDEX, tag }
+        }
+        return { prefix: own }
+    }
+
+    // False when the manifest's Bloom filter rules the lemma out of the index
+    private async mayContain(lemma: string, prefix: string): Promise<boolean> {
+        const bloom = (await this.loadManifest())?.indexes?.[prefix]?.bloom
+        return !bloom || bloomHas(bloom, lemma)
+    }
+
+    // Shard holding a lemma: routed through the manifest's prefix ranges, or
+    // the first-letter shard for indexes published without a routing table
+    private async locateShard(
+        lemma: string, letterKey: string, prefix: string
+    ): Promise<{ key: string, path: string, binary?: boolean }> {
+        const index = (await this.loadManifest())?.indexes?.[prefix]
+        const key = index?.routing?.length ? routeLemma(index.routing, lemma) : letterKey
+        const shard = index?.shards?.[key]
+        // Indexes published before the manifest existed keep their plain names
+        if (!shard) return { key, path: `/data/${prefix}_${key}.json` }
+        if (USE_BINARY_INDEX && shard.bin) {
+            return { key, path: `/data/${shard.file.replace(/\.json$/, '.bin')}`, binary: true }
+        }
+        if (USE_PRECOMPRESSED_INDEX && shard.br) return { key, path: `/data/${shard.file}.br` }
+        if (USE_PRECOMPRESSED_INDEX && shard.gzip) return { key, path: `/data/${shard.file}.gz` }
+        return { key, path: `/data/${shard.file}` }
     }
 
     async loadVideoMap(platform: 'bilibili' | 'youtube' = 'bilibili'): Promise<Record<string, VideoMapItem>> {
@@ -58,27 +168,61 @@ class VideoIndexService {
         }
     }
 
+    private loadContextTable(videoId: string, platform: 'bilibili' | 'youtube'): Promise<ContextTable | null> {
+        const cacheKey = `${platform}_${videoId}`
+        if (!this.contextTables[cacheKey]) {
+            this.contextTables[cacheKey] = this.loadManifest()
+                // Indexes published before the manifest listed tables keep their plain names
+                .then(manifest => {
+                    const file = manifest?.contexts?.[platform]?.[videoId]
+                    return fetch(file ? `/data/${file}` : `/data/context_${platform}_${videoId}.json`)
+                })
+                .then(response => {
+                    if (!response.ok) throw new Error(`Context table for video ${videoId} not found`)
+                    return response.json() as Promise<ContextTable>
+                })
+                .catch(error => {
+                    console.warn(`Failed to load context table (${platform} ${videoId}):`, error)
+                    delete this.contextTables[cacheKey]
+                    return null
+                })
+        }
+        return this.contextTables[cacheKey]
+    }
+
+    private resolveContext(entry: IndexEntry, table: ContextTable | null | undefined): string {
+        if (entry.c !== undefined) return entry.c
+        if (!entry.x || !table) return ''
+        const [segmentId, offset] = entry.x
+        const tokens = (table.s[segmentId] ?? '').split(' ')
+        return tokens.slice(Math.max(0, offset - table.w), offset + table.w + 1).join(' ')
+    }
+
     async searchWord(word: string, platform: 'bilibili' | 'youtube' = 'bilibili'): Promise<VideoOccurrence[]> {
         const lemma = word.toLowerCase().trim()
         if (!lemma) return []
 
-        // Get first letter for shard lookup
+        // First letter, for indexes without a routing table and the old index path
         const firstChar = lemma[0]
-        const shardKey = /[a-z]/.test(firstChar) ? firstChar : 'others'
+        const letterKey = /[a-z]/.test(firstChar) ? firstChar : 'others'
         // const indexFile = `/data/index_${shardKey}.json` // Old Logic
 
         try {
-            const cacheKey = `${platform}_${shardKey}`
+            const { prefix, tag } = await this.resolveIndex(platform)
+            if (!(await this.mayContain(lemma, prefix))) return []
+
+            const { key: shardKey, path, binary } = await this.locateShard(lemma, letterKey, prefix)
+            // Cached per index, so a merged shard serves every platform's lookups
+            const cacheKey = `${prefix}_${shardKey}`
 
             // Load index shard (with caching)
             if (!this.indexCache[cacheKey]) {
-                const path = this.getIndexShardPath(shardKey, platform)
                 const response = await fetch(path)
 
                 if (!response.ok) {
                     // Compatibility Fallback: try old index path only if bilibili
-                    if (platform === 'bilibili') {
-                        const fallbackPath = `/data/index_${shardKey}.json`
+                    if (prefix === 'index_bilibili') {
+                        const fallbackPath = `/data/index_${letterKey}.json`
                         const fallbackRes = await fetch(fallbackPath)
                         if (fallbackRes.ok) {
                             this.indexCache[cacheKey] = await fallbackRes.json()
@@ -89,12 +233,15 @@ class VideoIndexService {
                         throw new Error(`Index shard ${shardKey} not found`)
                     }
                 } else {
-                    this.indexCache[cacheKey] = await response.json()
+                    this.indexCache[cacheKey] = binary
+                        ? decodeBinaryShard(await response.arrayBuffer())
+                        : await response.json()
                 }
             }
 
             const index = this.indexCache[cacheKey]
-            const entries = index[lemma]
+            const allEntries: IndexEntry[] | undefined = index[lemma]
+            const entries = tag === undefined ? allEntries : allEntries?.filter(entry => entry.p === tag)
 
             if (!entries || entries.length === 0) {
                 return []
@@ -103,6 +250,15 @@ class VideoIndexService {
             // Load video map
             const videoMap = await this.loadVideoMap(platform)
 
+            // Load the context tables of the matched videos (in parallel, cached)
+            const tableIds = [...new Set(
+                entries.filter(entry => entry.x && videoMap[entry.v]).map(entry => String(entry.v))
+            )]
+            const tables: Record<string, ContextTable | null> = {}
+            await Promise.all(tableIds.map(async videoId => {
+                tables[videoId] = await this.loadContextTable(videoId, platform)
+            }))
+
             // Transform entries to VideoOccurrence format
             const occurrences: VideoOccurrence[] = []
 
@@ -114,7 +270,7 @@ class VideoIndexService {
                         page: videoInfo.page,  // ✅ 修复：使用正确的字段名 "page"
                         title: videoInfo.title,
                         startTime: entry.t, // V2.0: t is a single number (seconds)
-                        context: entry.c,
+                        context: this.resolveContext(entry, tables[String(entry.v)]),
                         score: entry.s // Map score from index
                     })
                 }
@@ -130,6 +286,8 @@ class VideoIndexService {
     clearCache() {
         this.indexCache = {}
         this.videoMaps = {}
+        this.contextTables = {}
+        this.manifest = null
     }
 }
 
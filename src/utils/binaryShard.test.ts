@@ -0,0 +1,29 @@
+import { describe, it, expect } from 'vitest'
+import { decodeBinaryShard } from './binaryShard'
+
+// encode_shard({
+//     "test": [{"v": "3", "t": 10.0, "x": [0, 1], "s": 3}, {"v": "3", "t": 9.5, "x": [1, 6], "s": 1}],
+//     "café": [{"v": "yt_0", "t": 200.3, "c": "这个单词 café"}]
+// }) from scripts/video_indexer/binary_shard.py
+const ENCODED = [
+    83, 82, 66, 49, 3, 1, 51, 4, 121, 116, 95, 48, 18, 232, 191, 153, 228, 184, 170, 229, 141, 149, 232, 175,
+    141, 32, 99, 97, 102, 195, 169, 2, 4, 116, 101, 115, 116, 2, 0, 200, 1, 3, 0, 1, 0, 9, 1, 2, 6, 5, 99, 97,
+    102, 195, 169, 1, 1, 166, 31, 0, 5
+]
+
+describe('decodeBinaryShard', () => {
+    it('should decode references, inline contexts, scores and delta timestamps', () => {
+        const shard = decodeBinaryShard(new Uint8Array(ENCODED).buffer)
+        expect(shard).toEqual({
+            test: [
+                { v: '3', t: 10, x: [0, 1], s: 3 },
+                { v: '3', t: 9.5, x: [1, 6], s: 1 }
+            ],
+            café: [{ v: 'yt_0', t: 200.3, c: '这个单词 café' }]
+        })
+    })
+
+    it('should reject data without the magic header', () => {
+        expect(() => decodeBinaryShard(new Uint8Array([123, 125]).buffer)).toThrow('Not a binary index shard')
+    })
+})
@@ -0,0 +1,67 @@
+// Decoder for the binary index shards written by
+// scripts/video_indexer/binary_shard.py (see the layout described there).
+
+export interface BinaryShardEntry {
+    v: string
+    t: number
+    x?: [number, number]
+    c?: string
+    s?: number
+}
+
+const MAGIC = 'SRB1'
+
+export function decodeBinaryShard(buffer: ArrayBuffer): Record<string, BinaryShardEntry[]> {
+    const bytes = new Uint8Array(buffer)
+    const utf8 = new TextDecoder()
+    let pos = 0
+
+    // Unsigned LEB128; values stay far below 2^31, so bitwise math is safe
+    const varint = (): number => {
+        let result = 0
+        let shift = 0
+        let byte: number
+        do {
+            byte = bytes[pos++]
+            result |= (byte & 0x7f) << shift
+            shift += 7
+        } while (byte & 0x80)
+        return result >>> 0
+    }
+
+    const text = (): string => {
+        const length = varint()
+        pos += length
+        return utf8.decode(bytes.subarray(pos - length, pos))
+    }
+
+    if (String.fromCharCode(...bytes.subarray(0, 4)) !== MAGIC) {
+        throw new Error('Not a binary index shard')
+    }
+    pos = 4
+
+    const strings: string[] = new Array(varint())
+    for (let i = 0; i < strings.length; i++) strings[i] = text()
+
+    const shard: Record<string, BinaryShardEntry[]> = {}
+    const lemmaCount = varint()
+    for (let i = 0; i < lemmaCount; i++) {
+        const lemma = text()
+        const entries: BinaryShardEntry[] = new Array(varint())
+        let deciseconds = 0
+        for (let j = 0; j < entries.length; j++) {
+            const v = strings[varint()]
+            const delta = varint()
+            deciseconds += (delta >>> 1) ^ -(delta & 1)
+            const entry: BinaryShardEntry = { v, t: deciseconds / 10 }
+            const score = bytes[pos++]
+            const context = varint()
+            if (context & 1) entry.c = strings[context >>> 1]
+            else entry.x = [context >>> 1, varint()]
+            if (score) entry.s = score
+            entries[j] = entry
+        }
+        shard[lemma] = entries
+    }
+    return shard
+}
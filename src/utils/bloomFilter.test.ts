@@ -0,0 +1,22 @@
+import { describe, it, expect } from 'vitest'
+import { bloomHas, bloomPositions } from './bloomFilter'
+
+// BloomFilter.from_items(["apple", "school", "café", "well-known"]).to_manifest()
+// from scripts/video_indexer/bloom_filter.py
+const FILTER = { m: 64, k: 11, n: 4, bits: 'zBci+0Bknog=' }
+
+describe('bloomFilter', () => {
+    it('should compute the same bit positions as the Python indexer', () => {
+        expect(bloomPositions('café', 64, 11)).toEqual([9, 2, 59, 52, 45, 38, 31, 24, 17, 10, 3])
+        expect(bloomPositions('apple', 1000, 3)).toEqual([167, 742, 317])
+    })
+
+    it('should report every added lemma and reject other words', () => {
+        for (const word of ['apple', 'school', 'café', 'well-known']) {
+            expect(bloomHas(FILTER, word)).toBe(true)
+        }
+        for (const word of ['banana', 'zebra', 'schol']) {
+            expect(bloomHas(FILTER, word)).toBe(false)
+        }
+    })
+})
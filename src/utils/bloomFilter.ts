@@ -0,0 +1,42 @@
+// Bloom filter of an index's lemmas, as published in manifest.json by
+// scripts/video_indexer/bloom_filter.py (same hashing, bit for bit).
+
+export interface BloomFilterData {
+    m: number       // Bits
+    k: number       // Hash functions
+    n: number       // Lemmas added
+    bits: string    // Base64, bit i = byte i >> 3, mask 1 << (i & 7)
+}
+
+const FNV_OFFSET = 0x811c9dc5
+const FNV_PRIME = 0x01000193
+const SECOND_OFFSET = 0x5bd1e995
+
+const utf8 = new TextEncoder()
+const decodedBits = new WeakMap<BloomFilterData, Uint8Array>()
+
+function fnv1a(data: Uint8Array, offset: number): number {
+    let h = offset
+    for (const byte of data) {
+        h = Math.imul(h ^ byte, FNV_PRIME) >>> 0
+    }
+    return h
+}
+
+export function bloomPositions(text: string, m: number, k: number): number[] {
+    const data = utf8.encode(text)
+    const h1 = fnv1a(data, FNV_OFFSET)
+    const h2 = (fnv1a(data, SECOND_OFFSET) | 1) >>> 0
+    const positions: number[] = []
+    for (let i = 0; i < k; i++) {
+        positions.push(((h1 + i * h2) % 0x100000000) % m)
+    }
+    return positions
+}
+
+// false: definitely not in the index; true: probably in it
+export function bloomHas(filter: BloomFilterData, text: string): boolean {
+    const bits = decodedBits.get(filter) ?? Uint8Array.from(atob(filter.bits), char => char.charCodeAt(0))
+    decodedBits.set(filter, bits)
+    return bloomPositions(text, filter.m, filter.k).every(pos => (bits[pos >> 3] & (1 << (pos & 7))) !== 0)
+}